@@ -0,0 +1,7 @@
+"""
+Benchmarks for the blog API.
+
+Each script is runnable from the project root, e.g. `python -m benchmarks.search --posts 100000`.
+They run against a separate SQLite database (benchmarks/bench.sqlite3 by default, see
+benchmarks/settings.py), never the development db.sqlite3.
+"""
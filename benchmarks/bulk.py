@@ -0,0 +1,55 @@
+"""
+Measures post ingest throughput through POST /api/posts/bulk/ versus one POST /api/posts/ per post.
+
+    python -m benchmarks.bulk --posts 50000 --batch-size 1000
+"""
+import argparse
+import time
+
+from benchmarks.common import setup, TextGenerator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=50_000, help='Posts to ingest through the bulk endpoint.')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Posts per bulk request.')
+    parser.add_argument('--single', type=int, default=1000, help='Posts to ingest one request at a time.')
+    args = parser.parse_args(argv)
+
+    setup()
+    from rest_framework.test import APIClient
+    from blog.models import Category
+
+    client = APIClient()
+    text = TextGenerator()
+    categories = list(Category.objects.values_list('pk', flat=True)) or [
+        Category.objects.create(name=f'bench-{i}').pk for i in range(20)
+    ]
+
+    def make_post():
+        return {
+            'title': text.title(),
+            'content': text.paragraph(),
+            'author': text.rng.choice(['alice', 'bob', 'carol']),
+            'categories': text.rng.sample(categories, 2),
+        }
+
+    started = time.perf_counter()
+    for _ in range(args.single):
+        response = client.post('/api/posts/', make_post(), format='json')
+        assert response.status_code == 201, response.data
+    single_rate = args.single / (time.perf_counter() - started)
+
+    batches = [[make_post() for _ in range(args.batch_size)] for _ in range(args.posts // args.batch_size)]
+    started = time.perf_counter()
+    for batch in batches:
+        response = client.post('/api/posts/bulk/', batch, format='json')
+        assert response.status_code == 201, response.data
+    bulk_rate = len(batches) * args.batch_size / (time.perf_counter() - started)
+
+    print(f'one post per request: {single_rate:>10,.0f} posts/s')
+    print(f'bulk ({args.batch_size}/request): {bulk_rate:>10,.0f} posts/s')
+
+
+if __name__ == '__main__':
+    main()
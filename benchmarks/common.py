@@ -0,0 +1,179 @@
+"""
+Shared helpers for the benchmark scripts: Django setup, corpus seeding and timing.
+"""
+import itertools
+import os
+import random
+import statistics
+import time
+
+
+def setup(settings_module='benchmarks.settings'):
+    """
+    Configures Django for a benchmark run and brings the benchmark database up to date.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def make_vocabulary(size=5000, seed=0):
+    """
+    Returns `size` pronounceable pseudo-words and Zipf weights for them (a few very common
+    words, a long tail of rare ones), which is what makes substring vs. index search differ.
+    """
+    rng = random.Random(seed)
+    syllables = [c + v for c in 'bcdfghjklmnprstvwz' for v in 'aeiou']
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(syllables, k=rng.randint(1, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words, zipf_cum_weights(size)
+
+
+def zipf_cum_weights(size, exponent=1.0):
+    """
+    Cumulative Zipf weights for `size` items (for random.choices(cum_weights=...)):
+    item 0 is the most popular, then a long tail.
+    """
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def heavy_tail(rng, alpha, cap):
+    """
+    A non-negative integer from a Pareto distribution: mostly 0-2, occasionally very large.
+    """
+    return min(int(rng.paretovariate(alpha)) - 1, cap)
+
+
+class TextGenerator:
+    """
+    Generates random titles/paragraphs from the shared vocabulary.
+    """
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.words, self.cum_weights = make_vocabulary()
+
+    def words_(self, count):
+        return self.rng.choices(self.words, cum_weights=self.cum_weights, k=count)
+
+    def title(self):
+        return ' '.join(self.words_(self.rng.randint(3, 8))).capitalize()
+
+    def paragraph(self, low=40, high=200):
+        return ' '.join(self.words_(self.rng.randint(low, high))).capitalize() + '.'
+
+
+def seed_posts(total, batch_size=5000, seed=0, stdout=None):
+    """
+    Tops the Post table up to `total` rows with generated titles and content.
+    """
+    from blog.models import Post
+
+    existing = Post.objects.count()
+    text = TextGenerator(seed + existing)
+    rng = text.rng
+    # A few prolific authors, most with a handful of posts
+    authors = [f'author{i}' for i in range(200)]
+    author_weights = zipf_cum_weights(len(authors))
+    started = time.perf_counter()
+    for offset in range(existing, total, batch_size):
+        Post.objects.bulk_create([
+            Post(
+                title=text.title(),
+                content=text.paragraph(),
+                author=rng.choices(authors, cum_weights=author_weights)[0],
+                likes=heavy_tail(rng, 1.2, 100_000),
+                dislikes=heavy_tail(rng, 2.0, 10_000),
+            )
+            for _ in range(min(batch_size, total - offset))
+        ])
+        if stdout:
+            stdout.write(f'\rseeded {min(offset + batch_size, total)}/{total} posts')
+            stdout.flush()
+    if stdout and total > existing:
+        stdout.write(f' in {time.perf_counter() - started:.1f}s\n')
+
+
+def seed_blog(posts, comments, categories, seed=0, stdout=None):
+    """
+    Tops the database up to the given numbers of posts, comments and categories:
+    - posts as in seed_posts(), each in 0-3 categories (a few categories hold most posts)
+    - comments concentrated on a minority of popular posts
+    and brings the denormalized counts in line afterwards.
+    """
+    from django.db.models import Max
+    from blog.counts import refresh_comment_counts, refresh_post_counts
+    from blog.models import Category, Comment, Post
+
+    rng = random.Random(seed)
+    text = TextGenerator(seed)
+
+    existing = Category.objects.count()
+    Category.objects.bulk_create([Category(name=f'category-{i}') for i in range(existing, categories)])
+    category_ids = list(Category.objects.order_by('pk').values_list('pk', flat=True))
+
+    last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    seed_posts(posts, seed=seed, stdout=stdout)
+    if category_ids:
+        Through = Post.categories.through
+        category_weights = zipf_cum_weights(len(category_ids))
+        links = [
+            Through(post_id=pk, category_id=category_id)
+            for pk in Post.objects.filter(pk__gt=last_pk).values_list('pk', flat=True).iterator()
+            for category_id in set(rng.choices(category_ids, cum_weights=category_weights, k=rng.choice((0, 1, 1, 2, 3))))
+        ]
+        Through.objects.bulk_create(links, batch_size=5000)
+
+    existing = Comment.objects.count()
+    # Popularity ranks are assigned at random, so busy posts are spread over the whole feed
+    post_ids = list(Post.objects.order_by('?').values_list('pk', flat=True)[:10_000])
+    post_weights = zipf_cum_weights(len(post_ids), exponent=0.8)
+    started = time.perf_counter()
+    for offset in range(existing, comments if post_ids else 0, 5000):
+        count = min(5000, comments - offset)
+        Comment.objects.bulk_create([
+            Comment(post_id=post_id, content=text.paragraph(5, 60), author=f'reader{rng.randrange(5000)}')
+            for post_id in rng.choices(post_ids, cum_weights=post_weights, k=count)
+        ])
+        if stdout:
+            stdout.write(f'\rseeded {offset + count}/{comments} comments')
+            stdout.flush()
+    if stdout and comments > existing:
+        stdout.write(f' in {time.perf_counter() - started:.1f}s\n')
+
+    # bulk_create() skips the signals that maintain these
+    refresh_comment_counts()
+    refresh_post_counts()
+
+
+def percentiles(timings, points=(50, 95, 99)):
+    """
+    Returns {'p50_ms': ..., ...} for a list of millisecond timings.
+    """
+    if len(timings) < 2:
+        return {f'p{point}_ms': round(timings[0], 3) if timings else None for point in points}
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {f'p{point}_ms': round(cuts[point - 1], 3) for point in points}
+
+
+def measure(func, repeat=5, warmup=1):
+    """
+    Calls func repeatedly and returns latency statistics in milliseconds.
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
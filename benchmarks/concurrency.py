@@ -0,0 +1,153 @@
+"""
+Concurrency benchmark of the read endpoints: the async read path (blog/async_views.py) against
+the sync DRF views, at increasing numbers of requests in flight, all in one process.
+
+    python -m benchmarks.concurrency
+    python -m benchmarks.concurrency --concurrency 1,50,200 --requests 2000
+
+Configurations:
+- asgi-async: ASGI application, read endpoints served by the async views
+- asgi-sync:  ASGI application with BLOG_ASYNC_URLCONF = None (each view run through sync_to_async)
+- wsgi-threads: WSGI application called from a pool with one thread per request in flight
+
+Requests cycle through post list, post detail, category list and comment list (see
+benchmarks/load.py). Reports throughput, p50/p99 latency and the peak number of threads.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import percentiles, seed_blog, setup
+
+SCENARIOS = ['list', 'detail', 'category_list', 'comment_list']
+
+
+class ThreadMonitor:
+    """
+    Samples threading.active_count() in the background and keeps the peak.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def run_asgi(driver, make_request, concurrency, requests):
+    timings = []
+    errors = 0
+
+    async def worker(queue):
+        nonlocal errors
+        for method, path, query, body in queue:
+            started = time.perf_counter()
+            status = await driver.arequest(method, path, query, body)
+            timings.append((time.perf_counter() - started) * 1000)
+            errors += status >= 400
+
+    async def run():
+        batches = [[] for _ in range(concurrency)]
+        for i in range(requests):
+            batches[i % concurrency].append(make_request())
+        await asyncio.gather(*(worker(iter(batch)) for batch in batches))
+
+    started = time.perf_counter()
+    driver.loop.run_until_complete(run())
+    return timings, errors, time.perf_counter() - started
+
+
+def run_wsgi(driver, make_request, concurrency, requests):
+    calls = [make_request() for _ in range(requests)]
+
+    def call(request):
+        started = time.perf_counter()
+        status = driver.request(*request)
+        return (time.perf_counter() - started) * 1000, status >= 400
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, calls))
+    elapsed = time.perf_counter() - started
+    return [timing for timing, _ in results], sum(error for _, error in results), elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,10,50,100', help='Comma-separated requests in flight.')
+    parser.add_argument('--requests', type=int, default=1000, help='Timed requests per configuration and level.')
+    parser.add_argument('--configurations', default='asgi-async,asgi-sync,wsgi-threads', help='Comma-separated.')
+    parser.add_argument('--posts', type=int, default=10_000, help='Posts to seed (total).')
+    parser.add_argument('--comments', type=int, default=50_000, help='Comments to seed (total).')
+    parser.add_argument('--categories', type=int, default=30, help='Categories to seed (total).')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for data and request mix.')
+    args = parser.parse_args(argv)
+
+    setup()
+    from django.conf import settings
+    from django.core.handlers.asgi import ASGIHandler
+    from benchmarks.load import ASGIDriver, Scenarios, WSGIDriver
+
+    seed_blog(args.posts, args.comments, args.categories, seed=args.seed, stdout=sys.stderr)
+    # Measure the handlers, not the response cache
+    settings.BLOG_RESPONSE_CACHE = None
+    scenarios = Scenarios(seed=args.seed)
+    generators = itertools.cycle([getattr(scenarios, f'scenario_{name}') for name in SCENARIOS])
+
+    def make_request():
+        return next(generators)()
+
+    async_urlconf = settings.BLOG_ASYNC_URLCONF
+    results = []
+    for configuration in args.configurations.split(','):
+        # The middleware stack (and so the URL conf switch) is set up when the handler is created
+        settings.BLOG_ASYNC_URLCONF = async_urlconf if configuration == 'asgi-async' else None
+        if configuration == 'wsgi-threads':
+            driver, run = WSGIDriver(), run_wsgi
+        else:
+            driver, run = ASGIDriver(ASGIHandler()), run_asgi
+        run(driver, make_request, 10, 100) # Warm up
+
+        for concurrency in [int(level) for level in args.concurrency.split(',')]:
+            with ThreadMonitor() as monitor:
+                timings, errors, elapsed = run(driver, make_request, concurrency, args.requests)
+            stats = {
+                'configuration': configuration,
+                'concurrency': concurrency,
+                'requests': args.requests,
+                'errors': errors,
+                'throughput_rps': round(args.requests / elapsed, 1),
+                **percentiles(timings),
+                'peak_threads': monitor.peak,
+            }
+            results.append(stats)
+            print(
+                f"{configuration:>13}  c={concurrency:<4}  {stats['throughput_rps']:>8.1f} req/s"
+                f"  p50 {stats['p50_ms']:>8.2f}  p99 {stats['p99_ms']:>8.2f} ms"
+                f"  {stats['peak_threads']:>4} threads  {errors} errors",
+                file=sys.stderr,
+            )
+    settings.BLOG_ASYNC_URLCONF = async_urlconf
+
+    print(json.dumps({'posts': args.posts, 'comments': args.comments, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Measures the live update streams (see blog/live.py) held by one ASGI process: the cost of
+idle subscriptions, how fast an event reaches every stream, and how vote bursts coalesce.
+
+    python -m benchmarks.live --streams 10000
+    python -m benchmarks.live --streams 10000 --broker sqlite
+
+The streams are opened against the ASGI application with no network in between, each
+subscribed to --posts-per-stream posts drawn from --hot-posts posts. Reports:
+
+- connect: time to open every stream and receive its initial counts; memory per stream
+  (growth of the process's peak RSS) and CPU used by the process while they sit idle
+- fan-out: latency from committing a comment on a hot post until every stream subscribed to
+  it has received it (p50/p99 over --comments comments)
+- votes: votes cast in a burst against the vote updates the streams received
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.common import percentiles, seed_blog, setup
+
+
+class Stream:
+    """
+    One client of GET /api/live/, counting what it receives.
+    """
+
+    def __init__(self, application, posts, on_chunk):
+        self.posts = posts
+        self.on_chunk = on_chunk
+        self.connected = asyncio.Event()
+        self.disconnected = asyncio.Event()
+        self.sent_request = False
+        query = f'posts={",".join(map(str, posts))}'
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': '/api/live/', 'raw_path': b'/api/live/',
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'accept', b'text/event-stream')],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        self.task = asyncio.ensure_future(application(scope, self.receive, self.send))
+
+    async def receive(self):
+        if not self.sent_request:
+            self.sent_request = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.body' and message.get('body'):
+            if not self.connected.is_set():
+                self.connected.set()
+            else:
+                self.on_chunk(self, message['body'])
+
+    async def close(self):
+        self.disconnected.set()
+        await self.task
+
+
+def peak_rss_kib():
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+async def run(args, post_ids):
+    from asgiref.sync import sync_to_async
+    from blog import live
+    from blog.counters import AtomicVoteCounter
+    from blog.models import Comment
+    from drf_assess.asgi import application
+
+    rng = random.Random(0)
+    hot = post_ids[:args.hot_posts]
+    received = {'comment': {}, 'votes': 0}
+
+    def on_chunk(stream, chunk):
+        for block in chunk.split(b'\n\n'):
+            if block.startswith(b'event: comment'):
+                content = json.loads(block.split(b'\ndata: ', 1)[1])['content']
+                received['comment'].setdefault(content, []).append(time.perf_counter())
+            elif block.startswith(b'event: votes'):
+                received['votes'] += 1
+
+    report = {'streams': args.streams}
+
+    # Connect, in waves so the initial count queries don't all queue at once
+    rss_before = peak_rss_kib()
+    started = time.perf_counter()
+    streams = []
+    for offset in range(0, args.streams, args.connect_batch):
+        wave = [
+            Stream(application, rng.sample(hot, args.posts_per_stream), on_chunk)
+            for _ in range(min(args.connect_batch, args.streams - offset))
+        ]
+        await asyncio.gather(*(stream.connected.wait() for stream in wave))
+        streams.extend(wave)
+    report['connect'] = {
+        'seconds': round(time.perf_counter() - started, 2),
+        'kib_per_stream': round((peak_rss_kib() - rss_before) / args.streams, 1),
+        'subscribed_posts': len(live.get_hub().subscriptions),
+    }
+    cpu = time.process_time()
+    await asyncio.sleep(args.idle_seconds)
+    report['connect']['idle_cpu_percent'] = round((time.process_time() - cpu) / args.idle_seconds * 100, 1)
+
+    # Fan-out: a comment on a hot post, timed until its last subscriber has it
+    subscribers = {pk: sum(pk in stream.posts for stream in streams) for pk in hot}
+    latencies = []
+    for i in range(args.comments):
+        pk = rng.choice(hot)
+        content = f'Live benchmark {i}'
+        sent = time.perf_counter()
+        await sync_to_async(Comment.objects.create)(post_id=pk, content=content, author='Benchmark')
+        while len(received['comment'].get(content, ())) < subscribers[pk]:
+            await asyncio.sleep(0.001)
+        latencies.append((max(received['comment'][content]) - sent) * 1000)
+    report['fan_out'] = {'mean_subscribers': round(sum(subscribers.values()) / len(hot)), **percentiles(latencies)}
+
+    # Votes: a burst over the hot posts, then one interval for the last updates to go out
+    received['votes'] = 0
+    counter = AtomicVoteCounter()
+
+    def burst():
+        for _ in range(args.votes):
+            counter.increment(rng.choice(hot), rng.choice(('likes', 'dislikes')))
+
+    started = time.perf_counter()
+    await sync_to_async(burst)()
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(args.vote_interval * 2 + 0.5)
+    report['votes'] = {
+        'votes': args.votes,
+        'seconds': round(elapsed, 2),
+        'updates_per_stream': round(received['votes'] / args.streams, 1),
+        'updates_per_stream_uncoalesced': round(args.votes * args.posts_per_stream / len(hot), 1),
+    }
+
+    await asyncio.gather(*(stream.close() for stream in streams))
+    report['subscribed_posts_after_close'] = len(live.get_hub().subscriptions)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--streams', type=int, default=10000, help='Streams held open.')
+    parser.add_argument('--hot-posts', type=int, default=100, help='Posts the streams subscribe to.')
+    parser.add_argument('--posts-per-stream', type=int, default=3)
+    parser.add_argument('--connect-batch', type=int, default=500, help='Streams opened at a time.')
+    parser.add_argument('--idle-seconds', type=float, default=3, help='Idle period measured for CPU use.')
+    parser.add_argument('--comments', type=int, default=50, help='Comments timed for fan-out.')
+    parser.add_argument('--votes', type=int, default=2000, help='Votes in the burst.')
+    parser.add_argument('--vote-interval', type=float, default=1, help='BLOG_LIVE_VOTE_INTERVAL.')
+    parser.add_argument('--broker', choices=['local', 'sqlite'], default='local')
+    parser.add_argument('--posts', type=int, default=1000, help='Posts to seed (total).')
+    args = parser.parse_args(argv)
+
+    setup()
+    from django.conf import settings
+    from django.test import override_settings
+    from blog.models import Post
+
+    seed_blog(posts=args.posts, comments=args.posts, categories=30, stdout=sys.stderr)
+    post_ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+    broker = {'BLOG_LIVE_BROKER': 'blog.live.LocalBroker', 'BLOG_LIVE_BROKER_OPTIONS': {}}
+    if args.broker == 'sqlite':
+        broker = {
+            'BLOG_LIVE_BROKER': 'blog.live.SQLiteBroker',
+            'BLOG_LIVE_BROKER_OPTIONS': {'path': f'{tempfile.mkdtemp()}/live.sqlite3'},
+        }
+    # Every stream comes from one address: lift the per-client caps
+    limits = {
+        'BLOG_LIVE_MAX_STREAMS': args.streams, 'BLOG_LIVE_MAX_CLIENT_STREAMS': args.streams,
+        'REST_FRAMEWORK': {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'read': None}},
+    }
+    with override_settings(
+        **broker, **limits, BLOG_LIVE_VOTE_INTERVAL=args.vote_interval, BLOG_LIVE_MAX_PENDING=1000,
+    ):
+        report = asyncio.run(run(args, post_ids))
+    print(json.dumps({'broker': args.broker, **report}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
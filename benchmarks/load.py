@@ -0,0 +1,346 @@
+"""
+Latency/throughput benchmark of the main blog API endpoints, run in-process against the WSGI
+or ASGI application (drf_assess/wsgi.py, drf_assess/asgi.py) with no network in between.
+
+    python -m benchmarks.load                                   # every scenario, WSGI
+    python -m benchmarks.load --app asgi --scenarios list,detail --requests 1000
+    python -m benchmarks.load --output run.json --baseline benchmarks/baseline.json
+
+For each scenario it reports p50/p95/p99 latency, throughput and database queries per
+request, and writes them as JSON. With --baseline, every scenario is compared with a stored
+run; --fail-on-regression exits non-zero when p95 latency grew by more than --threshold
+percent or a scenario issues more queries per request than before.
+
+The database is seeded (or topped up) first, see `manage.py seed_blog`. Response caching is
+off unless --cache is given, so each request measures the full handler. --no-metrics
+turns off the request metrics middleware (blog/metrics.py), to measure its overhead.
+"""
+import argparse
+import asyncio
+import io
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+from benchmarks.common import percentiles, seed_blog, setup, TextGenerator
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting the queries of every connection it is installed on.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        def add(connection, **kwargs):
+            if self not in connection.execute_wrappers:
+                connection.execute_wrappers.append(self)
+
+        # Connections are per thread (the ASGI handler runs views in a worker thread)
+        connection_created.connect(add, weak=False)
+        for connection in connections.all():
+            add(connection)
+
+
+class WSGIDriver:
+    """
+    Calls the WSGI application directly.
+    """
+    name = 'wsgi'
+
+    def __init__(self):
+        from drf_assess.wsgi import application
+        self.application = application
+
+    def request(self, method, path, query=None, body=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(query or {}, doseq=True),
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_ACCEPT': 'application/json',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(payload)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(payload),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': False,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        status = []
+        result = self.application(environ, lambda status_line, headers, exc_info=None: status.append(status_line))
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return int(status[0].split()[0])
+
+
+class ASGIDriver:
+    """
+    Calls the ASGI application from an event loop owned by the driver.
+    """
+    name = 'asgi'
+
+    def __init__(self, application=None):
+        if application is None:
+            from drf_assess.asgi import application
+        self.application = application
+        self.loop = asyncio.new_event_loop()
+
+    def request(self, method, path, query=None, body=None):
+        return self.loop.run_until_complete(self.arequest(method, path, query, body))
+
+    async def arequest(self, method, path, query, body):
+        payload = json.dumps(body).encode() if body is not None else b''
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': urlencode(query or {}, doseq=True).encode(),
+            'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'accept', b'application/json'),
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(payload)).encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+        disconnected = asyncio.Event()
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            # The handler listens for a client disconnect while the view runs; it never comes
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await self.application(scope, receive, send)
+        disconnected.set()
+        return status[0]
+
+
+DRIVERS = {'wsgi': WSGIDriver, 'asgi': ASGIDriver}
+
+
+class Scenarios:
+    """
+    Request generators, one per scenario: each call returns (method, path, query, body).
+    """
+
+    def __init__(self, seed=0):
+        from blog.models import Category, Post
+
+        self.rng = random.Random(seed)
+        self.post_ids = list(Post.objects.values_list('pk', flat=True))
+        self.authors = sorted(set(Post.objects.values_list('author', flat=True)[:5000]))
+        self.category_ids = list(Category.objects.values_list('pk', flat=True))
+        # Mid-frequency words: common enough to match, rare enough to be selective
+        self.words = TextGenerator(seed).words[10:500]
+        # Posts with comments, for the comment list
+        self.commented_ids = list(
+            Post.objects.filter(comment_count__gt=0).order_by('-comment_count').values_list('pk', flat=True)[:1000]
+        ) or self.post_ids
+
+    def names(self):
+        return [name for name in dir(self) if name.startswith('scenario_')]
+
+    def scenario_list(self):
+        return 'GET', '/api/posts/', {'page': self.rng.randint(1, 50), 'page_size': 20}, None
+
+    def scenario_list_cursor(self):
+        return 'GET', '/api/posts/', {'pagination': 'cursor', 'page_size': 20, 'count': 'false'}, None
+
+    def scenario_search(self):
+        return 'GET', '/api/posts/', {'search': self.rng.choice(self.words), 'page_size': 20}, None
+
+    def scenario_filter(self):
+        query = {'author': self.rng.choice(self.authors), 'page_size': 20}
+        if self.category_ids and self.rng.random() < 0.5:
+            query['categories'] = self.rng.choice(self.category_ids)
+        return 'GET', '/api/posts/', query, None
+
+    def scenario_detail(self):
+        return 'GET', f'/api/posts/{self.rng.choice(self.post_ids)}/', None, None
+
+    def scenario_category_list(self):
+        return 'GET', '/api/categories/', None, None
+
+    def scenario_comment_list(self):
+        return 'GET', f'/api/posts/{self.rng.choice(self.commented_ids)}/comments/', {'page_size': 20}, None
+
+    def scenario_comment_create(self):
+        body = {'content': 'Benchmark comment', 'author': f'bench{self.rng.randrange(100)}'}
+        return 'POST', f'/api/posts/{self.rng.choice(self.post_ids)}/comments/', None, body
+
+    def scenario_like(self):
+        return 'POST', f'/api/posts/{self.rng.choice(self.post_ids)}/like/', None, None
+
+    def scenario_dislike(self):
+        return 'POST', f'/api/posts/{self.rng.choice(self.post_ids)}/dislike/', None, None
+
+
+def run_scenario(driver, counter, make_request, requests, warmup):
+    for _ in range(warmup):
+        driver.request(*make_request())
+    timings = []
+    errors = 0
+    queries_before = counter.count
+    started = time.perf_counter()
+    for _ in range(requests):
+        method, path, query, body = make_request()
+        request_started = time.perf_counter()
+        status = driver.request(method, path, query, body)
+        timings.append((time.perf_counter() - request_started) * 1000)
+        if status >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'errors': errors,
+        **percentiles(timings),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'queries_per_request': round((counter.count - queries_before) / requests, 2),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints each scenario against the baseline and returns the regressions found.
+    """
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            print(f'{name:>16}  (not in baseline)', file=sys.stderr)
+            continue
+        p95_change = (current['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] * 100 if previous['p95_ms'] else 0
+        print(
+            f"{name:>16}  p95 {previous['p95_ms']:>8.2f} -> {current['p95_ms']:>8.2f} ms ({p95_change:+6.1f}%)"
+            f"  queries {previous['queries_per_request']:>5} -> {current['queries_per_request']:>5}",
+            file=sys.stderr,
+        )
+        if p95_change > threshold:
+            regressions.append(f'{name}: p95 latency {p95_change:+.1f}%')
+        if current['queries_per_request'] > previous['queries_per_request']:
+            regressions.append(
+                f"{name}: queries per request {previous['queries_per_request']} -> {current['queries_per_request']}"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', choices=sorted(DRIVERS), default='wsgi', help='Application entry point to call.')
+    parser.add_argument('--scenarios', help='Comma-separated scenario names (default: all).')
+    parser.add_argument('--requests', type=int, default=500, help='Timed requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per scenario.')
+    parser.add_argument('--posts', type=int, default=10_000, help='Posts to seed (total).')
+    parser.add_argument('--comments', type=int, default=50_000, help='Comments to seed (total).')
+    parser.add_argument('--categories', type=int, default=30, help='Categories to seed (total).')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for data and request mix.')
+    parser.add_argument('--cache', action='store_true', help='Keep the response cache enabled.')
+    parser.add_argument('--no-metrics', action='store_true', help='Disable the request metrics middleware.')
+    parser.add_argument('--output', help='Write the JSON results to this file (default: stdout).')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with.')
+    parser.add_argument('--threshold', type=float, default=20, help='Allowed p95 growth in percent.')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on regressions.')
+    args = parser.parse_args(argv)
+
+    setup()
+    from django.conf import settings
+    import django
+
+    seed_blog(args.posts, args.comments, args.categories, seed=args.seed, stdout=sys.stderr)
+    if not args.cache:
+        settings.BLOG_RESPONSE_CACHE = None
+    # Measured as served with metrics on, unless measuring their overhead
+    settings.BLOG_METRICS = not args.no_metrics
+
+    scenarios = Scenarios(seed=args.seed)
+    names = args.scenarios.split(',') if args.scenarios else [name[len('scenario_'):] for name in scenarios.names()]
+    driver = DRIVERS[args.app]()
+    counter = QueryCounter()
+    counter.install()
+
+    results = {
+        'meta': {
+            'app': args.app,
+            'requests': args.requests,
+            'posts': args.posts,
+            'comments': args.comments,
+            'categories': args.categories,
+            'seed': args.seed,
+            'cache': args.cache,
+            'metrics': not args.no_metrics,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+        'scenarios': {},
+    }
+    for name in names:
+        make_request = getattr(scenarios, f'scenario_{name}')
+        stats = run_scenario(driver, counter, make_request, args.requests, args.warmup)
+        results['scenarios'][name] = stats
+        print(
+            f"{name:>16}  p50 {stats['p50_ms']:>8.2f}  p95 {stats['p95_ms']:>8.2f}  p99 {stats['p99_ms']:>8.2f} ms"
+            f"  {stats['throughput_rps']:>8.1f} req/s  {stats['queries_per_request']:>5} queries/req"
+            f"  {stats['errors']} errors",
+            file=sys.stderr,
+        )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.common import seed_blog
+
+
+class Command(BaseCommand):
+    """
+    Fills the benchmark database with posts, comments and categories (see benchmarks.common.seed_blog).
+
+    Only available with the benchmark settings:
+        DJANGO_SETTINGS_MODULE=benchmarks.settings python manage.py seed_blog --posts 100000
+    Counts are totals: running it again only adds what is missing.
+    """
+    help = 'Seed the benchmark database with realistic blog data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument('--comments', type=int, default=50_000)
+        parser.add_argument('--categories', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (same seed, same data).')
+
+    def handle(self, *args, **options):
+        seed_blog(
+            options['posts'], options['comments'], options['categories'],
+            seed=options['seed'], stdout=sys.stderr,
+        )
+        self.stdout.write('Seeded {posts} posts, {comments} comments, {categories} categories.'.format(**options))
@@ -0,0 +1,134 @@
+"""
+Measures read throughput of the post list with reads on the primary alone against reads spread
+over SQLite read replicas (see blog/replicas.py), while writers add comments to the primary and
+the replication stand-in copies it to every replica.
+
+    python -m benchmarks.replicas --replicas 2 --readers 8 --writers 2 --seconds 10
+
+Readers request GET /api/posts/?page=<n> through the full stack (router and middleware
+included, response cache off); writers insert comments, each in a transaction; a replicator
+thread syncs every replica each --sync-interval seconds. Reports reads/s, writes/s and p50/p99
+latency per setup.
+"""
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.common import percentiles, seed_blog, setup
+
+
+def add_replicas(count, directory):
+    """
+    Configures `count` SQLite replica aliases in `directory`; returns their aliases.
+    """
+    from django.db import connections
+    from blog.replicas import sync_sqlite_replica
+
+    aliases = [f'replica{i}' for i in range(1, count + 1)]
+    configured = connections.configure_settings({
+        'default': connections.settings['default'],
+        **{alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'{directory}/{alias}.sqlite3'} for alias in aliases},
+    })
+    for alias in aliases:
+        connections.settings[alias] = configured[alias]
+        sync_sqlite_replica(alias)
+    return aliases
+
+
+def run(replicas, post_ids, pages, readers, writers, seconds, sync_interval):
+    from django.db import connections, transaction
+    from django.test import Client
+    from blog.models import Comment
+    from blog.replicas import sync_sqlite_replica
+
+    stop = threading.Event()
+    results = {'read': [], 'write': []}
+    errors = []
+
+    def read(client, rng):
+        response = client.get(f'/api/posts/?page={rng.randint(1, pages)}')
+        assert response.status_code == 200, response.status_code
+
+    def write(client, rng):
+        with transaction.atomic():
+            Comment.objects.create(post_id=rng.choice(post_ids), content='...', author='Benchmark')
+
+    def worker(kind, func, seed):
+        client = Client()
+        rng = random.Random(seed)
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                func(client, rng)
+                results[kind].append((time.perf_counter() - started) * 1000)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    def replicator():
+        try:
+            while not stop.wait(sync_interval):
+                for alias in replicas:
+                    sync_sqlite_replica(alias)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=('read', read, i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write', write, 1000 + i)) for i in range(writers)]
+    if replicas:
+        threads.append(threading.Thread(target=replicator))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors, repr(errors[0])
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--replicas', type=int, default=2, help='Read replicas (SQLite files).')
+    parser.add_argument('--readers', type=int, default=8, help='Reader threads.')
+    parser.add_argument('--writers', type=int, default=2, help='Writer threads.')
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of each run.')
+    parser.add_argument('--sync-interval', type=float, default=0.5, help='Seconds between replica syncs.')
+    parser.add_argument('--posts', type=int, default=5000, help='Posts to seed (total).')
+    args = parser.parse_args(argv)
+
+    setup()
+    import sys
+    from django.test import override_settings
+    from blog.models import Post
+
+    seed_blog(posts=args.posts, comments=args.posts, categories=30, stdout=sys.stderr)
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    replicas = add_replicas(args.replicas, tempfile.mkdtemp())
+    # The readers page through the first 50 pages of the list
+    pages = 50
+
+    report = []
+    for name, aliases in [('primary only', []), (f'{len(replicas)} replicas', replicas)]:
+        with override_settings(BLOG_READ_REPLICAS=aliases, BLOG_RESPONSE_CACHE=None):
+            results = run(aliases, post_ids, pages, args.readers, args.writers, args.seconds, args.sync_interval)
+        row = {'setup': name}
+        for kind, timings in results.items():
+            if not timings:
+                continue # No threads of this kind
+            row[kind] = {'per_second': round(len(timings) / args.seconds), **percentiles(timings)}
+            print(
+                f'{name:>14} {kind:>5}s {row[kind]["per_second"]:>6}/s  p50 {row[kind]["p50_ms"]:>8} ms'
+                f'  p99 {row[kind]["p99_ms"]:>8} ms'
+            )
+        report.append(row)
+
+    print(json.dumps({'readers': args.readers, 'writers': args.writers, 'seconds': args.seconds, 'results': report}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
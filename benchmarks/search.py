@@ -0,0 +1,57 @@
+"""
+Compares ?search= on /api/posts/ between DRF's LIKE '%term%' filtering and the full-text index.
+
+    python -m benchmarks.search                  # 1M posts (seeding takes a while the first time)
+    python -m benchmarks.search --posts 100000   # smaller corpus
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.common import measure, seed_posts, setup, TextGenerator
+
+BACKENDS = {
+    'icontains': 'blog.search.IcontainsSearchBackend',
+    'fts': 'blog.search.SQLiteFTS5SearchBackend',
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=1_000_000, help='Corpus size (default: 1,000,000).')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed requests per term and backend.')
+    parser.add_argument('--page-size', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    setup()
+    from django.test import override_settings
+    from rest_framework.test import APIRequestFactory
+    from blog.views import PostViewSet
+
+    seed_posts(args.posts, stdout=sys.stderr)
+
+    # A common word, a mid-frequency word, a rare word and a two-word query
+    words = TextGenerator().words
+    terms = [words[0], words[50], words[3000], f'{words[1]} {words[20]}']
+
+    view = PostViewSet.as_view({'get': 'list'})
+    factory = APIRequestFactory()
+    results = []
+    for term in terms:
+        for name, backend in BACKENDS.items():
+            def request():
+                response = view(factory.get('/api/posts/', {'search': term, 'page_size': args.page_size}))
+                assert response.status_code == 200, response.data
+                return response
+
+            with override_settings(BLOG_SEARCH_BACKEND=backend):
+                count = request().data['count']
+                stats = measure(request, repeat=args.repeat)
+            results.append({'term': term, 'backend': name, 'matches': count, **stats})
+            print(f'{term!r:>24} {name:>10} {count:>9} matches  median {stats["median_ms"]:>10.2f} ms')
+
+    print(json.dumps({'posts': args.posts, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
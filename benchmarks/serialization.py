@@ -0,0 +1,78 @@
+"""
+Measures a 500-item list page of each serializer: fetching, serializing and rendering it the
+DRF way (model instances, ModelSerializer, JSONRenderer) against the .values() path
+(blog/values.py) and FastJSONRenderer (orjson). Every configuration must produce the same bytes.
+
+    python -m benchmarks.serialization --page-size 500 --repeat 20
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.common import measure, seed_blog, setup
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per configuration.')
+    args = parser.parse_args(argv)
+
+    setup()
+    from rest_framework.renderers import JSONRenderer
+    from blog.models import Category, Comment, Post
+    from blog.renderers import FastJSONRenderer, orjson
+    from blog.serializers import CategorySerializer, CommentSerializer, PostSerializer
+    from blog.values import ValuesPlan
+
+    size = args.page_size
+    seed_blog(posts=size, comments=size, categories=size, stdout=sys.stderr)
+    pages = [
+        ('posts', PostSerializer, Post.objects.prefetch_related('categories').order_by('-created_at')),
+        ('comments', CommentSerializer, Comment.objects.order_by('-created_at')),
+        ('categories', CategorySerializer, Category.objects.order_by('name')),
+    ]
+
+    results = []
+    for name, serializer_class, queryset in pages:
+        plan = ValuesPlan(serializer_class())
+
+        def drf(renderer_class=JSONRenderer):
+            data = serializer_class(list(queryset[:size]), many=True).data
+            return renderer_class().render(data)
+
+        def values():
+            rows = list(plan.get_queryset(queryset)[:size])
+            return FastJSONRenderer().render(plan.serialize(rows, plan.load_related(rows)))
+
+        # The same work once the page has been fetched: serializing and rendering only
+        objects = list(queryset[:size])
+        rows = list(plan.get_queryset(queryset)[:size])
+        related = plan.load_related(rows)
+        groups = {
+            'fetch + serialize + render': [
+                ('ModelSerializer + JSONRenderer', drf),
+                ('ModelSerializer + FastJSONRenderer', lambda: drf(FastJSONRenderer)),
+                ('.values() + FastJSONRenderer', values),
+            ],
+            'serialize + render': [
+                ('ModelSerializer + JSONRenderer', lambda: JSONRenderer().render(serializer_class(objects, many=True).data)),
+                ('.values() + FastJSONRenderer', lambda: FastJSONRenderer().render(plan.serialize(rows, related))),
+            ],
+        }
+        expected = drf()
+        for stage, configurations in groups.items():
+            baseline = None
+            for label, func in configurations:
+                assert func() == expected, f'{name}: {label} output differs'
+                stats = measure(func, repeat=args.repeat)
+                baseline = baseline or stats['median_ms']
+                speedup = round(baseline / stats['median_ms'], 2)
+                results.append({'page': name, 'stage': stage, 'configuration': label, 'speedup': speedup, **stats})
+                print(f'{name:>10} {stage:>26} {label:>36}  median {stats["median_ms"]:>8.2f} ms  {speedup:>5.2f}x')
+
+    print(json.dumps({'page_size': size, 'orjson': orjson is not None, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
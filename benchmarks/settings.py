@@ -0,0 +1,25 @@
+"""
+Settings for the benchmark scripts: the project settings with a throwaway database and no throttling.
+"""
+import os
+
+from drf_assess.settings import *  # noqa: F401,F403
+from drf_assess.settings import BASE_DIR, INSTALLED_APPS, REST_FRAMEWORK
+
+DEBUG = False
+# Provides `manage.py seed_blog`
+INSTALLED_APPS = [*INSTALLED_APPS, "benchmarks"]
+ALLOWED_HOSTS = ["testserver", "localhost"]
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("BENCH_DB", BASE_DIR / "benchmarks" / "bench.sqlite3"),
+    }
+}
+
+# Benchmarks fire far more requests than any real client; a None rate disables the throttle
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_THROTTLE_RATES": {"user": None, "read": None, "write": None, "vote": None},
+}
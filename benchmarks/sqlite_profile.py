@@ -0,0 +1,128 @@
+"""
+Measures concurrent readers and writers on one SQLite file with SQLite's defaults (rollback
+journal, a new connection per request, deferred transactions) against the production
+profile of drf_assess.settings (WAL and the BLOG_SQLITE_PRAGMAS, persistent connections,
+immediate transactions; see blog/sqlite.py).
+
+    python -m benchmarks.sqlite_profile --readers 8 --writers 4 --seconds 10
+
+Each thread runs "requests" back to back, closing or keeping its connection at the end of
+each one as Django does (close_old_connections()):
+- readers: a 20-post page ordered by -created_at, with its categories
+- writers: alternately a comment (insert plus comment_count update) and a like, each in a transaction
+Reports reads/s, writes/s, p50/p99 latency and the requests that failed ("database is locked").
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from benchmarks.common import percentiles, seed_blog, setup
+
+
+def run(post_ids, readers, writers, seconds):
+    from django.db import close_old_connections, connections, transaction
+    from blog.counters import AtomicVoteCounter
+    from blog.models import Comment, Post
+
+    stop = threading.Event()
+    results = {'read': ([], []), 'write': ([], [])}
+
+    def read(rng):
+        list(Post.objects.prefetch_related('categories').order_by('-created_at')[:20])
+
+    def write(rng):
+        post_id = rng.choice(post_ids)
+        if rng.random() < 0.5:
+            with transaction.atomic():
+                Comment.objects.create(post_id=post_id, content='...', author='Benchmark')
+        else:
+            AtomicVoteCounter().increment(post_id, 'likes')
+
+    def worker(kind, func, seed):
+        rng = random.Random(seed)
+        timings, errors = results[kind]
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    func(rng)
+                    timings.append((time.perf_counter() - started) * 1000)
+                except Exception as exc:
+                    errors.append(str(exc))
+                finally:
+                    # The end of a request: closes the connection unless it is persistent
+                    close_old_connections()
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=('read', read, i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write', write, 1000 + i)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8, help='Reader threads.')
+    parser.add_argument('--writers', type=int, default=4, help='Writer threads.')
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of each run.')
+    parser.add_argument('--posts', type=int, default=5000, help='Posts to seed (total).')
+    args = parser.parse_args(argv)
+
+    setup()
+    import sys
+    from django.db import connections
+    from django.test import override_settings
+    from drf_assess import settings as project
+
+    seed_blog(posts=args.posts, comments=args.posts, categories=30, stdout=sys.stderr)
+    from blog.models import Post
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+
+    production = {**project.DATABASES['default'], **project.DATABASE_PROFILES['production']}
+    profiles = [
+        ('sqlite defaults', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}}, {}),
+        ('production profile', {
+            key: production[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')
+        }, project.BLOG_SQLITE_PRAGMAS),
+    ]
+
+    report = []
+    database = connections.settings['default']
+    for name, options, pragmas in profiles:
+        connections.close_all()
+        database.update(options)
+        with override_settings(BLOG_SQLITE_PRAGMAS=pragmas):
+            # journal_mode is stored in the file: switch it explicitly for each profile
+            with connections['default'].cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode = {pragmas.get('journal_mode', 'DELETE')}")
+            connections.close_all()
+            results = run(post_ids, args.readers, args.writers, args.seconds)
+
+        row = {'profile': name}
+        for kind, (timings, errors) in results.items():
+            if not timings and not errors:
+                continue # No threads of this kind
+            row[kind] = {
+                'per_second': round(len(timings) / args.seconds),
+                'errors': len(errors),
+                **percentiles(timings),
+            }
+            print(
+                f'{name:>18} {kind:>5}s {row[kind]["per_second"]:>6}/s  p50 {row[kind]["p50_ms"]:>8} ms'
+                f'  p99 {row[kind]["p99_ms"]:>8} ms  errors {len(errors)}'
+            )
+        report.append(row)
+
+    print(json.dumps({'readers': args.readers, 'writers': args.writers, 'seconds': args.seconds, 'results': report}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
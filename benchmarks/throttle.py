@@ -0,0 +1,73 @@
+"""
+Measures the per-request cost of the throttle check: DRF's UserRateThrottle (timestamp history
+in the cache) against BlogRateThrottle with each algorithm and store.
+
+    python -m benchmarks.throttle --checks 20000 --clients 100
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+MEMORY = {'BLOG_THROTTLE_STORE': 'blog.throttling.MemoryThrottleStore', 'BLOG_THROTTLE_STORE_OPTIONS': {}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=20_000, help='Throttle checks per configuration.')
+    parser.add_argument('--clients', type=int, default=100, help='Distinct clients the checks are spread over.')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+    from django.core.cache import cache
+    from django.test import override_settings
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.throttling import UserRateThrottle
+    from blog.throttling import BlogRateThrottle, get_throttle_store
+
+    # High enough that nothing is ever throttled: we time the bookkeeping, not the rejections
+    rates = {'user': '1000000/day', 'read': '1000000/day', 'write': '1000000/day', 'vote': '1000000/day'}
+    factory = APIRequestFactory()
+    requests = [
+        Request(factory.get('/api/posts/', REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}'))
+        for i in range(args.clients)
+    ]
+    view = object()
+
+    directory = tempfile.mkdtemp()
+    configurations = [
+        ('UserRateThrottle (locmem history)', UserRateThrottle, {}),
+        ('gcra / memory', BlogRateThrottle, MEMORY),
+        ('fixed / memory', BlogRateThrottle, {**MEMORY, 'BLOG_THROTTLE_ALGORITHM': 'fixed'}),
+        ('gcra / sqlite', BlogRateThrottle, {}),
+        ('fixed / sqlite', BlogRateThrottle, {'BLOG_THROTTLE_ALGORITHM': 'fixed'}),
+    ]
+    results = []
+    for name, throttle_class, overrides in configurations:
+        settings = {
+            'BLOG_THROTTLE_STORE': 'blog.throttling.SQLiteThrottleStore',
+            'BLOG_THROTTLE_STORE_OPTIONS': {'path': f'{directory}/throttle.sqlite3'},
+            'BLOG_THROTTLE_ALGORITHM': 'gcra',
+            **overrides,
+        }
+        with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': rates}, **settings):
+            UserRateThrottle.THROTTLE_RATES = rates # Captured at import by DRF
+            cache.clear()
+            get_throttle_store().clear()
+            started = time.perf_counter()
+            for i in range(args.checks):
+                assert throttle_class().allow_request(requests[i % args.clients], view)
+            elapsed = time.perf_counter() - started
+        per_check = elapsed / args.checks * 1e6
+        results.append({'throttle': name, 'checks': args.checks, 'us_per_check': round(per_check, 2)})
+        print(f'{name:>36}  {per_check:>8.1f} us/check')
+
+    print(json.dumps({'clients': args.clients, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
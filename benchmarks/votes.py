@@ -0,0 +1,89 @@
+"""
+Measures like/dislike throughput of each vote counter (blog/counters.py) with several threads
+voting at once on a few hot posts, each thread on its own database connection.
+
+    python -m benchmarks.votes --threads 8 --votes 500
+
+Counters: atomic (one UPDATE per vote), sharded (one shard UPSERT per vote) and buffered
+(one append to the write-behind buffer per vote). Sharded and buffered votes are folded into
+Post afterwards (not timed); every counter must end with the same counts.
+"""
+import argparse
+import json
+import tempfile
+import threading
+import time
+
+from benchmarks.common import percentiles, setup
+
+
+def run(counter, post_ids, threads, votes):
+    from django.db import connections
+
+    timings = []
+    errors = []
+
+    def worker(index):
+        try:
+            for i in range(votes):
+                started = time.perf_counter()
+                counter.increment(post_ids[(index + i) % len(post_ids)], 'likes' if i % 4 else 'dislikes')
+                timings.append((time.perf_counter() - started) * 1000)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return timings, errors, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help='Threads voting at once.')
+    parser.add_argument('--votes', type=int, default=500, help='Votes per thread.')
+    parser.add_argument('--posts', type=int, default=4, help='Hot posts the votes are spread over.')
+    args = parser.parse_args(argv)
+
+    setup()
+    from blog.counters import AtomicVoteCounter, BufferedVoteCounter, ShardedVoteCounter, VoteBuffer
+    from blog.models import Post
+
+    post_ids = [
+        Post.objects.create(title=f'Hot post {i}', content='...', author='Benchmark').pk
+        for i in range(args.posts)
+    ]
+    buffer = VoteBuffer(tempfile.mkdtemp() + '/votes.sqlite3')
+    counters = [
+        ('atomic', AtomicVoteCounter()),
+        ('sharded', ShardedVoteCounter()),
+        # Flushed once at the end; the staleness bound would otherwise flush mid-run
+        ('buffered', BufferedVoteCounter(buffer=buffer, max_delay=3600, flush_thread=False)),
+    ]
+
+    results = []
+    try:
+        for name, counter in counters:
+            Post.objects.filter(pk__in=post_ids).update(likes=0, dislikes=0)
+            timings, errors, elapsed = run(counter, post_ids, args.threads, args.votes)
+            counter.fold()
+            counts = list(Post.objects.filter(pk__in=post_ids).order_by('pk').values_list('likes', 'dislikes'))
+            total = args.threads * args.votes
+            assert not errors, f'{name}: {errors[0]!r}'
+            assert sum(likes + dislikes for likes, dislikes in counts) == total, f'{name}: votes lost'
+            votes_per_second = round(total / elapsed)
+            results.append({'counter': name, 'votes_per_second': votes_per_second, **percentiles(timings)})
+            print(f'{name:>9}  {votes_per_second:>7} votes/s  p50 {results[-1]["p50_ms"]:>7.3f} ms  p99 {results[-1]["p99_ms"]:>7.3f} ms')
+    finally:
+        Post.objects.filter(pk__in=post_ids).delete()
+
+    print(json.dumps({'threads': args.threads, 'votes_per_thread': args.votes, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "blog"
+
+    def ready(self):
+        # Connect the signal receivers (see blog/signals.py) and the SQLite tuning (blog/sqlite.py)
+        from . import signals, sqlite  # noqa: F401
@@ -0,0 +1,287 @@
+"""
+Async read path for the blog API under ASGI.
+
+DRF views are synchronous, so under ASGI Django runs each of them in a worker thread via
+sync_to_async. For the read-heavy endpoints (see `async_routes` in blog/urls.py) this
+module serves GET/HEAD requests from coroutines instead, reusing the DRF view classes
+for everything that doesn't touch the database (content negotiation, filters, serializers,
+rendering, exception handling) and the async ORM, cache and throttle APIs for the rest:
+
+- AsyncReadMixin gives a view `adispatch()` plus async `alist()` / `aretrieve()`
+  (responses cached by CachedResponseMixin's `acached_response()` when present).
+- AsyncURLConfMiddleware switches ASGI requests to BLOG_ASYNC_URLCONF, in which those
+  routes point at the coroutine views built by `async_urlpatterns()`. Under WSGI it
+  removes itself and nothing changes.
+
+Other methods, the browsable API and Basic-authenticated requests are handed to the
+sync view unchanged. Responses are the same bytes as the sync views produce.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, ValidationError
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.urls import URLPattern, URLResolver
+from django_filters.filters import QuerySetRequestMixin
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.response import Response
+
+
+class UseSyncView(Exception):
+    """
+    Raised by the async path for requests it doesn't handle; the sync view serves them instead.
+    """
+
+
+class AsyncReadMixin:
+    """
+    Async GET handlers for a DRF generic view or viewset (see module docstring).
+
+    The view's permission classes must decide without database queries (the user is
+    resolved beforehand); throttles with an aallow_request() are awaited.
+    """
+    # Renderers the async path produces; other formats (e.g. the browsable API) use the sync view
+    async_renderer_formats = ('json',)
+
+    async def adispatch(self, request, action, *args, **kwargs):
+        """
+        APIView.dispatch() with async authentication, permission and throttle checks and `a<action>()` as handler.
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            response = await getattr(self, f'a{action}')(request, *args, **kwargs)
+        except UseSyncView:
+            raise
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        """
+        APIView.initial() for async views.
+        """
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+        if request.accepted_renderer.format not in self.async_renderer_formats:
+            raise UseSyncView
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        await self.acheck_permissions(request)
+        await self.acheck_throttles(request)
+
+    async def aperform_authentication(self, request):
+        # Load the session user without blocking; SessionAuthentication then reads it as-is
+        django_request = request._request
+        if hasattr(django_request, 'auser'):
+            django_request.user = await django_request.auser()
+        request.user
+
+    async def acheck_permissions(self, request):
+        for permission in self.get_permissions():
+            if hasattr(permission, 'ahas_permission'):
+                allowed = await permission.ahas_permission(request, self)
+            else:
+                allowed = permission.has_permission(request, self)
+            if not allowed:
+                self.permission_denied(
+                    request,
+                    message=getattr(permission, 'message', None),
+                    code=getattr(permission, 'code', None)
+                )
+
+    async def acheck_throttles(self, request):
+        throttle_durations = []
+        for throttle in self.get_throttles():
+            if hasattr(throttle, 'aallow_request'):
+                allowed = await throttle.aallow_request(request, self)
+            else:
+                allowed = throttle.allow_request(request, self)
+            if not allowed:
+                throttle_durations.append(throttle.wait())
+
+        if throttle_durations:
+            durations = [duration for duration in throttle_durations if duration is not None]
+            self.throttled(request, max(durations, default=None))
+
+    async def afilter_queryset(self, queryset):
+        """
+        filter_queryset() for async views. Filter backends only build the query, except that
+        django-filter validates model choices (e.g. ?categories=<id>) against the database;
+        when the request carries such a parameter the filters run on the database thread.
+        """
+        if self.filters_query_database(queryset):
+            return await sync_to_async(self.filter_queryset)(queryset)
+        return self.filter_queryset(queryset)
+
+    def filters_query_database(self, queryset):
+        params = self.request.query_params
+        for backend in self.filter_backends:
+            if not issubclass(backend, DjangoFilterBackend):
+                continue
+            filterset_class = backend().get_filterset_class(self, queryset)
+            if filterset_class is None:
+                continue
+            for name, filter_ in filterset_class.base_filters.items():
+                if isinstance(filter_, QuerySetRequestMixin) and name in params:
+                    return True
+        return False
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        if not hasattr(self.paginator, 'apaginate_queryset'):
+            return await sync_to_async(self.paginate_queryset)(queryset)
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+    async def aget_object(self):
+        """
+        GenericAPIView.get_object() through the async ORM.
+        """
+        queryset = await self.afilter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        assert lookup_url_kwarg in self.kwargs, (
+            'Expected view %s to be called with a URL keyword argument '
+            'named "%s". Fix your URL conf, or set the `.lookup_field` '
+            'attribute on the view correctly.' %
+            (self.__class__.__name__, lookup_url_kwarg)
+        )
+        filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        try:
+            obj = await aget_object_or_404(queryset, **filter_kwargs)
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def alist(self, request, *args, **kwargs):
+        """
+        ListModelMixin.list() through the async ORM.
+        """
+        queryset = await self.afilter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer([obj async for obj in queryset.aiterator()], many=True)
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        """
+        RetrieveModelMixin.retrieve() through the async ORM.
+        """
+        instance = await self.aget_object()
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+
+def rendered_response(response):
+    """
+    Renders a DRF response into a plain HttpResponse, so the handler doesn't render it
+    again in a worker thread.
+    """
+    if not hasattr(response, 'render'):
+        return response
+    response.render()
+    rendered = HttpResponse(response.content, status=response.status_code)
+    rendered.headers = response.headers
+    rendered.cookies = response.cookies
+    return rendered
+
+
+def as_async_view(callback, action):
+    """
+    Wraps the view function of a DRF view (as returned by as_view()) in a coroutine view that
+    answers GET/HEAD with `a<action>()` and hands every other request to the original view.
+    """
+    cls, initkwargs = callback.cls, callback.initkwargs
+    # Set for viewsets: {method: action}
+    actions = getattr(callback, 'actions', None)
+    sync_view = sync_to_async(callback)
+
+    async def view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or 'HTTP_AUTHORIZATION' in request.META:
+            return await sync_view(request, *args, **kwargs)
+
+        # Set up the view instance as as_view() does (the handlers it binds give the Allow header)
+        self = cls(**initkwargs)
+        if actions is None:
+            self.setup(request, *args, **kwargs)
+        else:
+            self.action_map = {'head': actions['get'], **actions}
+            for method, name in self.action_map.items():
+                setattr(self, method, getattr(self, name))
+            self.request = request
+        try:
+            response = await self.adispatch(request, action, *args, **kwargs)
+        except UseSyncView:
+            return await sync_view(request, *args, **kwargs)
+        return rendered_response(response)
+
+    view.__name__ = callback.__name__
+    view.__module__ = callback.__module__
+    view.__doc__ = callback.__doc__
+    view.cls = cls
+    view.initkwargs = initkwargs
+    if actions is not None:
+        view.actions = actions
+    view.csrf_exempt = True
+    return view
+
+
+def async_urlpatterns(patterns, routes):
+    """
+    Copies a URL configuration, replacing the views of the routes named in `routes`
+    ({url_name: action}) with their async versions.
+    """
+    copied = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            copied.append(URLResolver(
+                pattern.pattern,
+                async_urlpatterns(pattern.url_patterns, routes),
+                pattern.default_kwargs,
+                pattern.app_name,
+                pattern.namespace,
+            ))
+        elif pattern.name in routes:
+            copied.append(URLPattern(
+                pattern.pattern,
+                as_async_view(pattern.callback, routes[pattern.name]),
+                pattern.default_args,
+                pattern.name,
+            ))
+        else:
+            copied.append(pattern)
+    return copied
+
+
+class AsyncURLConfMiddleware:
+    """
+    Serves ASGI requests from BLOG_ASYNC_URLCONF (see module docstring). Not used under WSGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.urlconf = getattr(settings, 'BLOG_ASYNC_URLCONF', None)
+        if not iscoroutinefunction(get_response) or not self.urlconf:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        request.urlconf = self.urlconf
+        return await self.get_response(request)
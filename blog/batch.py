@@ -0,0 +1,143 @@
+"""
+Comments of many posts in one request: GET /api/comments/?posts=1,2,3&limit=5.
+
+A feed page otherwise needs a request (and its queries) per post to show each post's latest
+comments. Here every requested post gets its newest ?limit=<n> comments (default
+`batch_limit`, at most `max_batch_limit`), grouped by post in the order the posts were
+asked for, from one query ranking the comments of all of them with a window function
+(ROW_NUMBER() OVER (PARTITION BY post_id ORDER BY created_at DESC, id DESC)).
+
+"Load more" uses the keyset cursors of the nested comment list (blog/pagination.py):
+
+- each group's `next` link asks for the post's following comments (`posts=<id>:<cursor>`)
+- a post can carry a cursor in any request, so one request loads more for several posts:
+  ?posts=1:<cursor>,2:<cursor>,3
+- the cursors are those of /api/posts/<id>/comments/?pagination=cursor, so either endpoint
+  can continue where the other stopped
+
+Posts without comments (or that don't exist) get an empty group.
+"""
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .pagination import KeysetPagination, positive_int
+
+
+class CommentBatchMixin:
+    """
+    View mixin serving `list` as comments grouped by post (see module docstring), from
+    `.values()` rows (see blog/values.py). Goes after CachedResponseMixin, so the responses
+    are cached as usual, and before ValuesListMixin and AsyncReadMixin, whose list handlers
+    it replaces. get_queryset() gives every comment, ordered newest first.
+    """
+    posts_query_param = 'posts'
+    limit_query_param = 'limit'
+    batch_limit = 5
+    max_batch_limit = 50
+    max_batch_posts = 100
+    keyset_class = KeysetPagination
+
+    def get_batch(self):
+        """
+        Returns [(post ID, cursor position or None), ...] for this request.
+        """
+        if not hasattr(self, '_batch'):
+            self._batch = self.parse_batch()
+        return self._batch
+
+    def parse_batch(self):
+        params = self.request.query_params
+        errors = {}
+        try:
+            self.limit = positive_int(params.get(self.limit_query_param, self.batch_limit), self.max_batch_limit)
+        except ValueError:
+            errors[self.limit_query_param] = ['A positive integer is required.']
+
+        keyset = self.get_keyset()
+        batch = {}
+        for item in (item.strip() for item in params.get(self.posts_query_param, '').split(',')):
+            if not item:
+                continue
+            pk, _, cursor = item.partition(':')
+            try:
+                pk = positive_int(pk)
+            except ValueError:
+                errors.setdefault(self.posts_query_param, []).append(f'Invalid post ID: "{pk}".')
+                continue
+            position = None
+            if cursor:
+                position, reverse = keyset.parse_cursor(keyset.model, cursor)
+                if reverse:
+                    # Groups only load forward ("previous" cursors of the nested list)
+                    raise NotFound(keyset.invalid_cursor_message)
+            batch[pk] = position
+        if not batch and self.posts_query_param not in errors:
+            errors[self.posts_query_param] = ['At least one post ID is required.']
+        elif len(batch) > self.max_batch_posts:
+            errors[self.posts_query_param] = [f'At most {self.max_batch_posts} posts per request.']
+        if errors:
+            raise serializers.ValidationError(errors)
+        return list(batch.items())
+
+    def get_keyset(self):
+        """
+        The keyset paginator whose cursors the groups use, set up for get_queryset()'s ordering.
+        """
+        if not hasattr(self, '_keyset'):
+            queryset = self.get_queryset()
+            keyset = self._keyset = self.keyset_class()
+            keyset.model = queryset.model
+            keyset.ordering = keyset.get_ordering(queryset)
+            keyset.fields = [name for name, _ in keyset.ordering]
+        return self._keyset
+
+    def get_batch_queryset(self, plan):
+        """
+        The .values() rows of the batch: the first `limit` + 1 comments of each post after its
+        cursor (the extra one tells whether the post has more), by post, newest first.
+        """
+        keyset = self.get_keyset()
+        batch = self.get_batch()
+        condition = Q(post_id__in=[pk for pk, position in batch if position is None])
+        for pk, position in batch:
+            if position is not None:
+                condition |= Q(post_id=pk) & keyset.after(position, False)
+        ordering = keyset.order_by(False)
+        ranked = self.filter_queryset(self.get_queryset()).filter(condition).annotate(
+            batch_rank=Window(
+                RowNumber(), partition_by=F('post_id'),
+                order_by=[F(name[1:]).desc() if name.startswith('-') else F(name) for name in ordering],
+            )
+        ).filter(batch_rank__lte=self.limit + 1).order_by('post', *ordering)
+        # The plan's .values() rows include the ordering columns: the post and the cursor fields
+        return plan.get_queryset(ranked)
+
+    def batch_response(self, plan, rows):
+        grouped = {}
+        for row, item in zip(rows, plan.serialize(rows, {})):
+            grouped.setdefault(row['post'], []).append((row, item))
+
+        keyset = self.get_keyset()
+        url = self.request.build_absolute_uri()
+        results = []
+        for pk, _ in self.get_batch():
+            group = grouped.get(pk, [])
+            next_link = None
+            if len(group) > self.limit:
+                group = group[:self.limit]
+                cursor = keyset.encode_cursor(group[-1][0], False)
+                next_link = replace_query_param(url, self.posts_query_param, f'{pk}:{cursor}')
+            results.append({'post': pk, 'comments': [item for _, item in group], 'next': next_link})
+        return Response({'results': results})
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_values_plan()
+        return self.batch_response(plan, list(self.get_batch_queryset(plan)))
+
+    async def alist(self, request, *args, **kwargs):
+        plan = self.get_values_plan()
+        return self.batch_response(plan, [row async for row in self.get_batch_queryset(plan)])
@@ -0,0 +1,289 @@
+"""
+Response caching for the blog API.
+
+List and retrieve responses are cached (as response data) under keys built from the host and
+path, every query parameter (filters, search, ordering, page, ...), the negotiated format and
+the current *version* of each scope the response depends on:
+
+- 'posts'                 post lists
+- 'post:<pk>'             one post's detail
+- 'comments:<post_pk>'    a post's comment list and comment details
+- 'categories'            category list and details
+
+Writes never delete entries; blog/signals.py bumps the affected scope versions instead, so
+stale entries simply stop being addressed and expire. Votes are the exception to bumping every
+scope a change touches: they bump the voted post's scope, but 'posts' at most once every
+BLOG_VOTE_LIST_INTERVAL seconds across the workers, or steady voting would orphan every list
+page as soon as it is cached. Vote counts (and likes orderings) in lists may therefore lag by
+that interval, or, after the last votes of a burst, until the entries expire. Versions are nanosecond timestamps,
+which also gives cached resources a Last-Modified time without touching the database.
+
+The cache alias is set by BLOG_RESPONSE_CACHE (None disables caching). It must be shared by
+every worker (e.g. the file-based "files" alias, memcached, Redis): with a per-process cache
+(LocMemCache) a worker never sees the versions bumped by the others and keeps serving stale
+responses until they expire. The system check blog.W001 warns about it.
+"""
+import datetime
+import hashlib
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from . import replicas
+
+VERSION_PREFIX = 'blog:version:'
+RESPONSE_PREFIX = 'blog:response:'
+# Present while a vote has bumped 'posts' less than BLOG_VOTE_LIST_INTERVAL seconds ago
+VOTE_LIST_KEY = 'blog:vote-list-bumped'
+
+
+def get_response_cache():
+    """
+    Returns the cache backing the response cache, or None when caching is disabled.
+    """
+    alias = getattr(settings, 'BLOG_RESPONSE_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def is_shared(response_cache):
+    """
+    Whether every worker process sees the same entries (False for per-process backends).
+    """
+    return not isinstance(response_cache, (LocMemCache, DummyCache))
+
+
+@checks.register(checks.Tags.caches)
+def check_response_cache(app_configs, **kwargs):
+    response_cache = get_response_cache()
+    if response_cache is None or is_shared(response_cache):
+        return []
+    return [checks.Warning(
+        'BLOG_RESPONSE_CACHE is a per-process cache.',
+        hint='With several workers, a write in one leaves the others serving stale responses until '
+             'they expire. Use a cache shared by the workers (e.g. "files").',
+        id='blog.W001',
+    )]
+
+
+def get_versions(scopes):
+    """
+    Returns {scope: version} for the given scopes, starting a new version for unknown ones.
+    """
+    response_cache = get_response_cache()
+    keys = {VERSION_PREFIX + scope: scope for scope in scopes}
+    found = response_cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, scope in keys.items():
+        if key not in found:
+            # First use (or evicted): any value never handed out before will do
+            response_cache.add(key, time.time_ns(), timeout=None)
+            versions[scope] = response_cache.get(key)
+    return versions
+
+
+async def aget_versions(scopes):
+    """
+    get_versions() through the cache's async API.
+    """
+    response_cache = get_response_cache()
+    keys = {VERSION_PREFIX + scope: scope for scope in scopes}
+    found = await response_cache.aget_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, scope in keys.items():
+        if key not in found:
+            await response_cache.aadd(key, time.time_ns(), timeout=None)
+            versions[scope] = await response_cache.aget(key)
+    return versions
+
+
+def bump(*scopes):
+    """
+    Starts a new version for each scope, orphaning every cached response that depends on it.
+
+    Inside a transaction the bump is repeated after commit, so a response cached by a
+    concurrent request from the not-yet-committed state is orphaned as well.
+    """
+    response_cache = get_response_cache()
+    if response_cache is None or not scopes:
+        return
+    response_cache.set_many({VERSION_PREFIX + scope: time.time_ns() for scope in scopes}, timeout=None)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: response_cache.set_many(
+            {VERSION_PREFIX + scope: time.time_ns() for scope in scopes}, timeout=None
+        ))
+
+
+def post_scopes(post_ids):
+    """
+    Scopes to bump when the given posts change.
+    """
+    return ['posts', *(f'post:{pk}' for pk in post_ids)]
+
+
+def vote_scopes(post_ids):
+    """
+    Scopes to bump when the votes of the given posts change (see module docstring).
+    """
+    scopes = [f'post:{pk}' for pk in post_ids]
+    response_cache = get_response_cache()
+    interval = getattr(settings, 'BLOG_VOTE_LIST_INTERVAL', 10)
+    if response_cache is not None and response_cache.add(VOTE_LIST_KEY, 1, timeout=interval):
+        scopes.append('posts')
+    return scopes
+
+
+class CachedResponseMixin:
+    """
+    View mixin caching `list` and `retrieve` responses (see module docstring).
+
+    Views declare the scopes their responses depend on in get_cache_scopes(). With
+    conditional_cache = True, retrieve responses also carry ETag/Last-Modified headers and
+    matching conditional requests get a 304 without touching the database or the serializer.
+    """
+    conditional_cache = False
+
+    def get_cache_scopes(self):
+        raise NotImplementedError('.get_cache_scopes() must be overridden.')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, conditional=self.conditional_cache, **kwargs
+        )
+
+    # Async read path (see blog/async_views.py)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().aretrieve, request, *args, conditional=self.conditional_cache, **kwargs
+        )
+
+    def get_cache_key(self, request, versions):
+        params = sorted(request.query_params.lists())
+        parts = [
+            request.get_host(),
+            request.path,
+            repr(params),
+            request.accepted_renderer.format,
+            repr(sorted(versions.items())),
+        ]
+        return RESPONSE_PREFIX + hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    def get_cache_timeout(self):
+        timeout = getattr(settings, 'BLOG_RESPONSE_CACHE_TIMEOUT', 300)
+        if replicas.used_replica():
+            # The replica may not have caught up with the current versions (see blog/replicas.py)
+            timeout = min(timeout, getattr(settings, 'BLOG_REPLICA_CACHE_TIMEOUT', 5))
+        return timeout
+
+    def get_last_modified(self, data, versions):
+        """
+        The later of the resource's own updated_at and its newest scope version.
+        """
+        stamps = [datetime.datetime.fromtimestamp(v / 1e9, tz=datetime.timezone.utc) for v in versions.values()]
+        updated_at = parse_datetime(data.get('updated_at') or '') if isinstance(data, dict) else None
+        if updated_at:
+            stamps.append(updated_at)
+        return max(stamps).timestamp()
+
+    def cached_response(self, handler, request, *args, conditional=False, **kwargs):
+        response_cache = get_response_cache()
+        if response_cache is None:
+            return handler(request, *args, **kwargs)
+
+        versions = get_versions(self.get_cache_scopes())
+        key = self.get_cache_key(request, versions)
+        etag = '"%s"' % key[len(RESPONSE_PREFIX):]
+
+        # The ETag only depends on scope versions: a matching If-None-Match needs no lookup at all
+        not_modified = self.get_not_modified(request, etag) if conditional else None
+        if not_modified is not None:
+            return not_modified
+
+        entry = response_cache.get(key)
+        if entry is not None:
+            response = Response(entry['data'])
+            response['X-Cache'] = 'HIT'
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = self.make_entry(response, versions, conditional)
+            response_cache.set(key, entry, timeout=self.get_cache_timeout())
+            response['X-Cache'] = 'MISS'
+        return self.finish_response(request, response, entry, etag, conditional)
+
+    async def acached_response(self, handler, request, *args, conditional=False, **kwargs):
+        """
+        cached_response() for async handlers, through the cache's async API.
+        """
+        response_cache = get_response_cache()
+        if response_cache is None:
+            return await handler(request, *args, **kwargs)
+
+        versions = await aget_versions(self.get_cache_scopes())
+        key = self.get_cache_key(request, versions)
+        etag = '"%s"' % key[len(RESPONSE_PREFIX):]
+
+        not_modified = self.get_not_modified(request, etag) if conditional else None
+        if not_modified is not None:
+            return not_modified
+
+        entry = await response_cache.aget(key)
+        if entry is not None:
+            response = Response(entry['data'])
+            response['X-Cache'] = 'HIT'
+        else:
+            response = await handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = self.make_entry(response, versions, conditional)
+            await response_cache.aset(key, entry, timeout=self.get_cache_timeout())
+            response['X-Cache'] = 'MISS'
+        return self.finish_response(request, response, entry, etag, conditional)
+
+    def get_not_modified(self, request, etag):
+        """
+        A 304 response when the request's If-None-Match already matches `etag`, else None.
+        """
+        if not request.META.get('HTTP_IF_NONE_MATCH'):
+            return None
+        not_modified = get_conditional_response(request._request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+        return not_modified
+
+    def make_entry(self, response, versions, conditional):
+        return {
+            'data': response.data,
+            'last_modified': self.get_last_modified(response.data, versions) if conditional else None,
+        }
+
+    def finish_response(self, request, response, entry, etag, conditional):
+        """
+        Adds the validators to a conditional response (or answers 304 when they match).
+        """
+        if conditional:
+            not_modified = get_conditional_response(
+                request._request, etag=etag, last_modified=int(entry['last_modified'])
+            )
+            if not_modified is not None:
+                not_modified['ETag'] = etag
+                return not_modified
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(int(entry['last_modified']))
+        return response
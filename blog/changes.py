@@ -0,0 +1,167 @@
+"""
+Incremental change feed: GET /api/changes/?updated_since=<seq>.
+
+Every write to a post, comment or category appends a Change row (blog.models.Change) in the
+same transaction, through the receivers in blog/signals.py: saves, deletes, votes, count
+updates, bulk writes. Change.seq is the feed's cursor. A consumer mirrors the blog with:
+
+1. GET /api/changes/?updated_since=0, then follow `next` until it is null
+2. store `cursor`; later, GET /api/changes/?updated_since=<cursor> for what changed since
+
+Each page holds the changes after `updated_since`, in sequence order, each object once (at
+its latest change in the page) with its current representation (the serializer of its
+endpoint) or, when it no longer exists, as a tombstone: {"deleted": true} and no data. Applying
+a page in order is idempotent, so re-reading a page after a failure is safe. A sync costs
+O(changes since the cursor), not O(corpus).
+
+The log starts with one change per object (migration 0009), so a consumer starting from 0 gets
+everything. `manage.py prune_changes` drops changes superseded by a later change of the same
+object, which keeps the log about as large as the number of objects plus tombstones.
+
+The feed only serves changes older than BLOG_CHANGE_FEED_SETTLE_SECONDS:
+
+- A consumer must never see a change after one with a higher sequence number, or it would
+  skip it. SQLite serializes writers, but with concurrent writers (PostgreSQL, ...) a lower
+  number can commit after a higher one; by the end of the window its transaction has
+  committed. Writers don't wait on each other for it.
+- Votes don't each append a change: record_votes() skips the posts that already have a change
+  still held back (less than half the window old), since the consumer will read it after the
+  window with the post's counts as they are by then. A post under steady voting gets about one
+  change per half window rather than one per vote, whatever the counter (ShardedVoteCounter
+  and BufferedVoteCounter already report votes once per post per fold, blog/counters.py).
+
+0 serves changes as soon as they are read (fine for SQLite, but every vote then appends one).
+"""
+import datetime
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Category, Change, Comment, Post
+from .pagination import positive_int
+
+
+def get_settle_seconds():
+    return getattr(settings, 'BLOG_CHANGE_FEED_SETTLE_SECONDS', 5)
+
+
+def record(deleted=False, **object_ids):
+    """
+    Appends a change for each object given as <kind>=[pk, ...] (kinds: post, comment, category),
+    with one INSERT.
+    """
+    rows = [
+        Change(kind=kind, object_id=pk, deleted=deleted)
+        for kind, pks in object_ids.items() for pk in sorted(set(pks))
+    ]
+    if rows:
+        Change.objects.bulk_create(rows)
+
+
+def record_votes(post_ids):
+    """
+    Records that the votes of `post_ids` changed, except for posts with a change that the feed
+    is still holding back (see module docstring): one SELECT, and an INSERT only when needed.
+    """
+    settle = get_settle_seconds()
+    if settle:
+        since = timezone.now() - datetime.timedelta(seconds=settle / 2)
+        pending = set(Change.objects.filter(
+            kind='post', object_id__in=post_ids, deleted=False, created_at__gte=since,
+        ).values_list('object_id', flat=True))
+        post_ids = [pk for pk in post_ids if pk not in pending]
+    record(post=post_ids)
+
+
+class ChangeFeedMixin:
+    """
+    View mixin serving GET as a page of the change feed (see module docstring).
+    `feed_serializers` gives the serializer class of each kind.
+    """
+    # {kind: (model, related objects to prefetch)}
+    feed_models = {
+        'post': (Post, ['categories']),
+        'comment': (Comment, []),
+        'category': (Category, []),
+    }
+    feed_serializers = {}
+    since_query_param = 'updated_since'
+    limit_query_param = 'limit'
+    default_limit = 100
+    max_limit = 1000
+
+    def get(self, request, *args, **kwargs):
+        since, limit = self.parse_feed_params()
+        entries, cursor, has_more = self.read_changes(since, limit)
+        next_link = None
+        if has_more:
+            next_link = replace_query_param(request.build_absolute_uri(), self.since_query_param, cursor)
+        return Response({'cursor': cursor, 'next': next_link, 'changes': entries})
+
+    def parse_feed_params(self):
+        params = self.request.query_params
+        errors = {}
+        since = limit = None
+        try:
+            since = int(params.get(self.since_query_param, 0))
+            if since < 0:
+                raise ValueError(since)
+        except ValueError:
+            errors[self.since_query_param] = ['A change sequence number (a non-negative integer) is required.']
+        try:
+            limit = positive_int(params.get(self.limit_query_param, self.default_limit), self.max_limit)
+        except ValueError:
+            errors[self.limit_query_param] = ['A positive integer is required.']
+        if errors:
+            raise serializers.ValidationError(errors)
+        return since, limit
+
+    def read_changes(self, since, limit):
+        """
+        Returns (entries, last seq read, whether more changes follow).
+        """
+        queryset = Change.objects.filter(seq__gt=since)
+        settle = get_settle_seconds()
+        if settle:
+            # Until lower sequence numbers can no longer be in flight (see module docstring)
+            queryset = queryset.filter(created_at__lt=timezone.now() - datetime.timedelta(seconds=settle))
+        changes = list(queryset.order_by('seq').values_list('seq', 'kind', 'object_id')[:limit + 1])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        cursor = changes[-1][0] if changes else since
+
+        # Each object once, at its latest change in the page
+        latest = {}
+        for seq, kind, object_id in changes:
+            latest.pop((kind, object_id), None)
+            latest[(kind, object_id)] = seq
+
+        data = self.load_objects(latest)
+        entries = []
+        for (kind, object_id), seq in latest.items():
+            item = data[kind].get(object_id)
+            entry = {'seq': seq, 'type': kind, 'id': object_id, 'deleted': item is None}
+            if item is not None:
+                entry['data'] = item
+            entries.append(entry)
+        return entries, cursor, has_more
+
+    def load_objects(self, latest):
+        """
+        Returns {kind: {pk: serialized object}} for the objects of the page that still exist.
+        """
+        pks = {}
+        for kind, object_id in latest:
+            pks.setdefault(kind, []).append(object_id)
+        data = {}
+        for kind, object_ids in pks.items():
+            model, prefetch = self.feed_models[kind]
+            # From the primary, like the log: a lagging read replica would serve data older than the cursor
+            objects = model.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=object_ids).prefetch_related(*prefetch)
+            serialized = self.feed_serializers[kind](objects, many=True, context=self.get_serializer_context()).data
+            data[kind] = {item['id']: item for item in serialized}
+        return data
@@ -0,0 +1,388 @@
+"""
+Like/dislike counters for Posts.
+
+Votes never do a read-modify-write on the Post instance. Two counters are available,
+selected with the BLOG_VOTE_COUNTER setting (a dotted path):
+
+- AtomicVoteCounter (default): a single `UPDATE ... SET likes = likes + 1` per vote.
+- ShardedVoteCounter: each vote increments one of BLOG_VOTE_COUNTER_SHARDS PostVoteShard rows,
+  so concurrent voters don't all contend on the hot blog_post row. `manage.py fold_votes`
+  folds the shards back into Post.likes / Post.dislikes in batches.
+- BufferedVoteCounter (write-behind): each vote is appended to a VoteBuffer, a log in its own
+  SQLite file, and acknowledged without any write to the main database. Flushes (`manage.py
+  fold_votes`, and a background thread with BLOG_VOTE_BUFFER_FLUSH_THREAD) add the buffered
+  votes to Post in one UPDATE per batch. See BufferedVoteCounter for the staleness bound and
+  crash recovery.
+"""
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.module_loading import import_string
+
+from .models import Post, PostVoteShard, VoteBufferCheckpoint
+from .signals import post_votes_changed
+from .trending import score_expression
+
+# Post fields that can be voted on
+VOTE_FIELDS = ('likes', 'dislikes')
+
+# How long (seconds) a vote keeps retrying while SQLite reports the database/table as locked
+LOCK_TIMEOUT = 10
+
+logger = logging.getLogger('blog.counters')
+
+_buffers = {}
+_flushers = set()
+_buffers_lock = threading.Lock()
+
+
+def get_vote_counter():
+    """
+    Returns an instance of the vote counter configured by BLOG_VOTE_COUNTER.
+    """
+    path = getattr(settings, 'BLOG_VOTE_COUNTER', 'blog.counters.AtomicVoteCounter')
+    return import_string(path)()
+
+
+def retry_on_lock(func, *args, **kwargs):
+    """
+    Runs func, retrying with a short randomized backoff while SQLite reports a lock.
+
+    SQLite allows a single writer at a time; under heavy voting other writers get
+    "database is locked" instead of queueing. Retrying is only safe outside an
+    enclosing transaction, so inside one the error is raised as usual.
+    """
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    attempt = 0
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as exc:
+            if 'locked' not in str(exc) or connection.in_atomic_block or time.monotonic() > deadline:
+                raise
+            # Exponential backoff with jitter, capped at 50ms
+            time.sleep(random.uniform(0, min(0.05, 0.001 * 2 ** attempt)))
+            attempt += 1
+
+
+def add_votes(totals):
+    """
+    Adds {post_id: {'likes': n, 'dislikes': n}} to the Post counters (and rescores the posts)
+    with one UPDATE: likes = likes + CASE id WHEN ... END.
+    """
+    new_counts = {
+        field: F(field) + Case(
+            *[When(pk=post_id, then=Value(counts[field])) for post_id, counts in totals.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        for field in VOTE_FIELDS
+    }
+    Post.objects.filter(pk__in=totals).update(**new_counts, trending_score=score_expression(**new_counts))
+
+
+class BaseVoteCounter:
+    """
+    Interface shared by all vote counters.
+    """
+
+    def increment(self, post_id, field):
+        """
+        Records one vote on `field` ('likes' or 'dislikes') of the given post and returns
+        the (possibly approximate) new count. Raises Post.DoesNotExist for unknown posts.
+        """
+        raise NotImplementedError('.increment() must be overridden.')
+
+    def fold(self, batch_size=1000):
+        """
+        Moves buffered votes into Post.likes / Post.dislikes. Returns the number of votes folded.
+        Counters that write to Post directly have nothing to fold.
+        """
+        return 0
+
+
+class AtomicVoteCounter(BaseVoteCounter):
+    """
+    Increments the Post row in place with a single atomic UPDATE.
+    """
+
+    def increment(self, post_id, field):
+        return retry_on_lock(self._increment, post_id, field)
+
+    def _increment(self, post_id, field):
+        with transaction.atomic():
+            # The trending score moves with the count, in the same statement
+            count = F(field) + 1
+            updated = Post.objects.filter(pk=post_id).update(**{
+                field: count, 'trending_score': score_expression(**{field: count}),
+            })
+            if not updated:
+                raise Post.DoesNotExist(f'Post with ID {post_id} not found.')
+            post_votes_changed.send(sender=self.__class__, post_ids=[post_id])
+            # Read back inside the same transaction so the caller sees its own vote
+            return Post.objects.filter(pk=post_id).values_list(field, flat=True).get()
+
+
+class ShardedVoteCounter(BaseVoteCounter):
+    """
+    Spreads votes over PostVoteShard rows; Post itself is only written when shards are folded.
+    """
+
+    def __init__(self, shards=None):
+        self.shards = shards or getattr(settings, 'BLOG_VOTE_COUNTER_SHARDS', 8)
+
+    def increment(self, post_id, field):
+        return retry_on_lock(self._increment, post_id, field)
+
+    def _increment(self, post_id, field):
+        shard = random.randrange(self.shards)
+        shard_rows = PostVoteShard.objects.filter(post_id=post_id, field=field, shard=shard)
+        with transaction.atomic():
+            if not shard_rows.update(count=F('count') + 1):
+                try:
+                    # First vote on this shard; another writer may create it at the same time
+                    with transaction.atomic():
+                        PostVoteShard.objects.create(post_id=post_id, field=field, shard=shard, count=1)
+                except IntegrityError:
+                    shard_rows.update(count=F('count') + 1)
+            # Folded count plus everything still sitting in the shards (one query);
+            # also doubles as the existence check, rolling the vote back for unknown posts
+            pending = (
+                PostVoteShard.objects.filter(post=OuterRef('pk'), field=field)
+                .values('post')
+                .annotate(total=Sum('count'))
+                .values('total')
+            )
+            counts = (
+                Post.objects.filter(pk=post_id)
+                .annotate(pending=Coalesce(Subquery(pending), 0))
+                .values_list(field, 'pending')
+                .first()
+            )
+            if counts is None:
+                raise Post.DoesNotExist(f'Post with ID {post_id} not found.')
+        return counts[0] + counts[1]
+
+    def fold(self, batch_size=1000):
+        folded = 0
+        while True:
+            rows, votes = retry_on_lock(self._fold_batch, batch_size)
+            folded += votes
+            # A short batch means the shards were drained (new votes wait for the next run)
+            if rows < batch_size:
+                return folded
+
+    def _fold_batch(self, batch_size):
+        with transaction.atomic():
+            # Lock the shard rows being folded (Postgres) so increments landing meanwhile aren't deleted
+            shards = list(
+                PostVoteShard.objects.select_for_update()
+                .order_by('pk')
+                .values_list('pk', 'post_id', 'field', 'count')[:batch_size]
+            )
+            if not shards:
+                return 0, 0
+
+            totals = {}
+            for _, post_id, field, count in shards:
+                totals.setdefault(post_id, dict.fromkeys(VOTE_FIELDS, 0))[field] += count
+
+            add_votes(totals)
+            PostVoteShard.objects.filter(pk__in=[shard[0] for shard in shards]).delete()
+            post_votes_changed.send(sender=self.__class__, post_ids=list(totals))
+        return len(shards), sum(shard[3] for shard in shards)
+
+
+def get_vote_buffer():
+    """
+    Returns the (shared, per-process) VoteBuffer at BLOG_VOTE_BUFFER_PATH.
+    """
+    path = str(getattr(settings, 'BLOG_VOTE_BUFFER_PATH', 'votes.sqlite3'))
+    with _buffers_lock:
+        if path not in _buffers:
+            _buffers[path] = VoteBuffer(path)
+        return _buffers[path]
+
+
+class VoteBuffer:
+    """
+    Append-only log of votes in its own SQLite file (WAL mode), shared by every process that opens it.
+
+    Votes are numbered by an AUTOINCREMENT sequence that never reuses a number, so "applied up
+    to N" (VoteBufferCheckpoint) identifies exactly which votes a flush has counted. Each file
+    has a random ID, so a replaced or deleted file never matches the checkpoint of its predecessor.
+    A vote is durable once append() returns, whatever happens to the process afterwards.
+    """
+
+    def __init__(self, path, timeout=5):
+        self.path = str(path)
+        self.timeout = timeout
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS vote (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                post_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS vote_post ON vote (post_id, field);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+            """
+        )
+        self.connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('id', ?)", (uuid.uuid4().hex,))
+        self.id = self.connection.execute("SELECT value FROM meta WHERE key = 'id'").fetchone()[0]
+
+    @property
+    def connection(self):
+        # sqlite3 connections can't be shared between threads; keep one per thread
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Survives the process crashing; a power loss may drop the last few acknowledged votes
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def append(self, post_id, field):
+        self.connection.execute(
+            'INSERT INTO vote (post_id, field, created) VALUES (?, ?, ?)', (post_id, field, time.time())
+        )
+
+    def pending(self, post_id, field):
+        """
+        The number of buffered votes on `field` of the post.
+        """
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM vote WHERE post_id = ? AND field = ?', (post_id, field)
+        ).fetchone()[0]
+
+    def oldest(self):
+        """
+        When the oldest buffered vote was cast (a timestamp), or None if the buffer is empty.
+        """
+        row = self.connection.execute('SELECT created FROM vote ORDER BY seq LIMIT 1').fetchone()
+        return row[0] if row else None
+
+    def batch(self, after, size):
+        """
+        Returns (last sequence number, {post_id: {field: votes}}) for the first `size` votes
+        numbered above `after`, or (after, {}) when there are none.
+        """
+        upto = self.connection.execute(
+            'SELECT MAX(seq) FROM (SELECT seq FROM vote WHERE seq > ? ORDER BY seq LIMIT ?)', (after, size)
+        ).fetchone()[0]
+        if upto is None:
+            return after, {}
+        totals = {}
+        rows = self.connection.execute(
+            'SELECT post_id, field, COUNT(*) FROM vote WHERE seq > ? AND seq <= ? GROUP BY post_id, field',
+            (after, upto),
+        )
+        for post_id, field, count in rows:
+            totals.setdefault(post_id, dict.fromkeys(VOTE_FIELDS, 0))[field] += count
+        return upto, totals
+
+    def discard(self, upto):
+        """
+        Drops the votes numbered up to `upto` (once they are counted in Post).
+        """
+        self.connection.execute('DELETE FROM vote WHERE seq <= ?', (upto,))
+
+    def clear(self):
+        self.connection.execute('DELETE FROM vote')
+
+
+class BufferedVoteCounter(BaseVoteCounter):
+    """
+    Write-behind counter: votes go to the VoteBuffer (see get_vote_buffer()) and reach Post when
+    the buffer is flushed by fold().
+
+    - Responses report Post's count plus the votes still buffered for the post: approximate,
+      as a flush running meanwhile may be counted twice or not at all.
+    - Staleness: Post lags the votes by at most BLOG_VOTE_BUFFER_MAX_DELAY seconds while a
+      flusher runs (`fold_votes --interval`, or the per-process thread started on the first
+      vote when BLOG_VOTE_BUFFER_FLUSH_THREAD is set). Without one, the next vote to find
+      the oldest buffered vote past the bound flushes the buffer itself.
+    - Crash recovery: a flush adds a batch to Post and moves the buffer's checkpoint past it in
+      one transaction, and only then discards the batch from the buffer. Votes a crashed
+      flush counted but didn't discard are below the checkpoint: the next flush drops them
+      without counting them again. Votes it didn't count are still in the buffer.
+    """
+
+    def __init__(self, buffer=None, max_delay=None, flush_thread=None):
+        self.buffer = buffer or get_vote_buffer()
+        self.max_delay = getattr(settings, 'BLOG_VOTE_BUFFER_MAX_DELAY', 5) if max_delay is None else max_delay
+        if flush_thread is None:
+            flush_thread = getattr(settings, 'BLOG_VOTE_BUFFER_FLUSH_THREAD', False)
+        self.flush_thread = flush_thread
+
+    def increment(self, post_id, field):
+        # A read doubles as the existence check; votes on unknown posts are never buffered
+        folded = retry_on_lock(Post.objects.filter(pk=post_id).values_list(field, flat=True).first)
+        if folded is None:
+            raise Post.DoesNotExist(f'Post with ID {post_id} not found.')
+        self.buffer.append(post_id, field)
+        count = folded + self.buffer.pending(post_id, field)
+
+        if self.flush_thread:
+            self.start_flusher()
+        oldest = self.buffer.oldest()
+        if oldest is not None and time.time() - oldest > self.max_delay:
+            self.fold()
+        return count
+
+    def fold(self, batch_size=1000):
+        folded = 0
+        while True:
+            upto, votes = retry_on_lock(self._fold_batch, batch_size)
+            # Counted (now or by an earlier, interrupted flush): safe to drop from the buffer
+            self.buffer.discard(upto)
+            folded += votes
+            if votes < batch_size:
+                return folded
+
+    def _fold_batch(self, batch_size):
+        with transaction.atomic():
+            # Locks the checkpoint row (Postgres) so concurrent flushes take turns
+            checkpoint, _ = VoteBufferCheckpoint.objects.select_for_update().get_or_create(buffer=self.buffer.id)
+            upto, totals = self.buffer.batch(checkpoint.sequence, batch_size)
+            if not totals:
+                return upto, 0
+            add_votes(totals)
+            VoteBufferCheckpoint.objects.filter(pk=checkpoint.pk).update(sequence=upto)
+            post_votes_changed.send(sender=self.__class__, post_ids=list(totals))
+        return upto, sum(sum(counts.values()) for counts in totals.values())
+
+    # --- Background flushing ---
+
+    def start_flusher(self):
+        """
+        Starts this process's flusher thread for the buffer, unless it is already running.
+        """
+        with _buffers_lock:
+            if self.buffer.path in _flushers:
+                return
+            _flushers.add(self.buffer.path)
+        threading.Thread(target=self.run_flusher, name='vote-buffer-flusher', daemon=True).start()
+
+    def run_flusher(self):
+        while True:
+            time.sleep(self.max_delay)
+            try:
+                self.fold()
+            except Exception:
+                logger.exception('Flushing buffered votes failed; retrying in %ss', self.max_delay)
+            finally:
+                connection.close()
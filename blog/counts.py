@@ -0,0 +1,78 @@
+"""
+Denormalized counts: Post.comment_count and Category.post_count.
+
+The receivers in blog/signals.py keep them in step with every write path:
+
+- comment_count moves by exact deltas (one `UPDATE ... SET comment_count = comment_count + n`
+  per write) when comments are created or deleted, singly or in bulk.
+- post_count is recomputed from the post/category link table for the categories whose
+  posts changed, so it stays right whatever mix of add/remove/clear/bulk writes happened.
+
+Post.trending_score (see blog/trending.py) is rewritten in the same UPDATEs as comment_count.
+
+`manage.py repair_counts` recomputes both from scratch and reports the rows that had drifted.
+"""
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Category, Comment, Post
+from .trending import score_expression
+
+
+def adjust_comment_counts(deltas):
+    """
+    Adds deltas ({post_id: n}, n may be negative) to Post.comment_count with one UPDATE.
+    """
+    deltas = {post_id: delta for post_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    comment_count = F('comment_count') + Case(
+        *[When(pk=post_id, then=Value(delta)) for post_id, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    Post.objects.filter(pk__in=deltas).update(
+        comment_count=comment_count, trending_score=score_expression(comment_count=comment_count)
+    )
+
+
+def actual_comment_count():
+    """
+    The number of comments of the post in the outer query.
+    """
+    return Coalesce(Subquery(
+        Comment.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('pk')).values('n'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def actual_post_count():
+    """
+    The number of posts of the category in the outer query.
+    """
+    Through = Post.categories.through
+    return Coalesce(Subquery(
+        Through.objects.filter(category=OuterRef('pk')).order_by().values('category').annotate(n=Count('pk')).values('n'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def refresh_comment_counts(post_ids=None):
+    """
+    Recomputes Post.comment_count (of the given posts, or all). Returns the number of posts fixed.
+    """
+    posts = Post.objects.all() if post_ids is None else Post.objects.filter(pk__in=post_ids)
+    return posts.exclude(comment_count=actual_comment_count()).update(
+        comment_count=actual_comment_count(),
+        trending_score=score_expression(comment_count=actual_comment_count()),
+    )
+
+
+def refresh_post_counts(category_ids=None):
+    """
+    Recomputes Category.post_count (of the given categories, or all). Returns the number of categories fixed.
+    """
+    if category_ids is not None and not category_ids:
+        return 0
+    categories = Category.objects.all() if category_ids is None else Category.objects.filter(pk__in=category_ids)
+    return categories.exclude(post_count=actual_post_count()).update(post_count=actual_post_count())
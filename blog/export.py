@@ -0,0 +1,60 @@
+"""
+Row generators for the streaming exports (GET /api/posts/export/, GET /api/posts/export/comments/
+and `manage.py export_blog`).
+
+Querysets are walked with `.iterator(chunk_size=...)`: a server-side cursor on PostgreSQL,
+fetchmany() batches on SQLite. Categories are prefetched per chunk (comment counts are
+stored on Post), so memory use depends on the chunk size, not the table size.
+"""
+from rest_framework.fields import DateTimeField
+
+# Rows fetched (and categories prefetched) per round trip
+CHUNK_SIZE = 2000
+
+POST_EXPORT_FIELDS = (
+    'id', 'title', 'content', 'author', 'created_at', 'updated_at',
+    'likes', 'dislikes', 'categories', 'category_names', 'comment_count',
+)
+COMMENT_EXPORT_FIELDS = ('id', 'post', 'content', 'author', 'created_at', 'updated_at')
+
+# Same timestamp format as the API responses
+format_datetime = DateTimeField().to_representation
+
+
+def post_rows(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yields one flat dict per post of `queryset` (in its ordering), with its category IDs and
+    names and its number of comments.
+    """
+    queryset = queryset.prefetch_related('categories')
+    for post in queryset.iterator(chunk_size=chunk_size):
+        categories = post.categories.all()
+        yield {
+            'id': post.pk,
+            'title': post.title,
+            'content': post.content,
+            'author': post.author,
+            'created_at': format_datetime(post.created_at),
+            'updated_at': format_datetime(post.updated_at),
+            'likes': post.likes,
+            'dislikes': post.dislikes,
+            'categories': [category.pk for category in categories],
+            'category_names': [category.name for category in categories],
+            'comment_count': post.comment_count,
+        }
+
+
+def comment_rows(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yields one flat dict per comment of `queryset` (in its ordering).
+    """
+    rows = queryset.values_list('pk', 'post_id', 'content', 'author', 'created_at', 'updated_at')
+    for pk, post_id, content, author, created_at, updated_at in rows.iterator(chunk_size=chunk_size):
+        yield {
+            'id': pk,
+            'post': post_id,
+            'content': content,
+            'author': author,
+            'created_at': format_datetime(created_at),
+            'updated_at': format_datetime(updated_at),
+        }
@@ -0,0 +1,20 @@
+from rest_framework import filters
+
+from .search import get_search_backend
+
+
+class PostSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter for Posts that runs ?search=<terms> through the configured full-text
+    backend (see blog/search.py) instead of `LIKE '%term%'` scans over every post.
+
+    Falls back to DRF's own filtering over `search_fields` when the configured
+    backend isn't indexed (IcontainsSearchBackend).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        backend = get_search_backend()
+        if not terms or not backend.indexed:
+            return super().filter_queryset(request, queryset, view)
+        return backend.search(queryset, terms)
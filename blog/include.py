@@ -0,0 +1,213 @@
+"""
+Embedding related objects in GET responses: ?include=categories,comments.
+
+A post page otherwise takes a request for the post, one for its comments and one per
+category. With ?include=, each post carries them instead:
+
+- many-to-many relations (`categories`): the related objects replace their IDs
+- reverse foreign keys (`comments`): the latest ?<name>_limit=<n> objects (default
+  `include_limit`, at most `max_include_limit`), newest first
+
+Each relation costs a fixed number of queries for the whole page, whatever its size:
+two for a many-to-many relation (the through table, then the objects) and one for the
+latest comments of every post, ranked with a window function
+(ROW_NUMBER() OVER (PARTITION BY post_id ORDER BY created_at DESC)).
+"""
+from collections import defaultdict
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .pagination import positive_int
+from .values import EmbeddedField, ValuesPlan
+
+
+class IncludeSerializerMixin:
+    """
+    Serializer side: adds an EmbeddedField for each relation in context['include'] (replacing
+    a field of the same name, e.g. the category IDs).
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in self.context.get('include', ()):
+            fields[name] = EmbeddedField()
+        return fields
+
+
+class IncludeMixin:
+    """
+    View mixin for ?include= on GET list/retrieve (see module docstring). The serializer must
+    include IncludeSerializerMixin; `include_serializers` names the relations that can be
+    embedded and the serializer of each.
+    """
+    include_query_param = 'include'
+    # {relation name: serializer class}
+    include_serializers = {}
+    # Reverse foreign keys: how many objects by default / at most, and which ones come first
+    include_limit = 5
+    max_include_limit = 50
+    include_limit_ordering = ('-created_at', '-pk')
+    include_actions = ('list', 'retrieve')
+
+    def get_includes(self):
+        """
+        Returns {relation name: limit (None for many-to-many relations)} for this request.
+        """
+        if not hasattr(self, '_includes'):
+            self._includes = self.parse_includes()
+        return self._includes
+
+    def parse_includes(self):
+        request = self.request
+        params = request.query_params
+        if (
+            request.method not in ('GET', 'HEAD') or self.include_query_param not in params
+            or getattr(self, 'action', 'list') not in self.include_actions
+        ):
+            return {}
+        model = self.get_queryset().model
+        includes = {}
+        errors = {}
+        for name in (name.strip() for name in params[self.include_query_param].split(',')):
+            if not name:
+                continue
+            if name not in self.include_serializers:
+                errors.setdefault(self.include_query_param, []).append(f'Unknown relation: "{name}".')
+                continue
+            field = model._meta.get_field(name)
+            includes[name] = None
+            if field.one_to_many:
+                limit_param = f'{name}_limit'
+                try:
+                    includes[name] = positive_int(params.get(limit_param, self.include_limit), self.max_include_limit)
+                except ValueError:
+                    errors[limit_param] = ['A positive integer is required.']
+        if errors:
+            raise serializers.ValidationError(errors)
+        return includes
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include'] = tuple(self.get_includes())
+        context['embedded'] = getattr(self, 'embedded', None)
+        return context
+
+    def get_serializer(self, *args, **kwargs):
+        # Serializing instances: load what they embed first (already done on the async path)
+        if args and self.get_includes() and getattr(self, 'embedded', None) is None:
+            instances = args[0] if kwargs.get('many') else [args[0]]
+            self.embedded = self.load_embedded([obj.pk for obj in instances])
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Embedded relations are loaded separately: don't prefetch them as well
+        lookups = queryset._prefetch_related_lookups
+        kept = [lookup for lookup in lookups if getattr(lookup, 'prefetch_to', lookup) not in self.get_includes()]
+        if len(kept) != len(lookups):
+            queryset = queryset.prefetch_related(None).prefetch_related(*kept)
+        return queryset
+
+    # --- Loading ---
+
+    def get_embed_queries(self, pks):
+        """
+        Yields (relation name, model field, query) for the relations to embed for the objects
+        `pks`: (owner pk, target pk) pairs for many-to-many relations, .values() rows otherwise.
+        """
+        model = self.get_queryset().model
+        for name, limit in self.get_includes().items():
+            field = model._meta.get_field(name)
+            if field.many_to_many:
+                through = field.remote_field.through
+                owner = through._meta.get_field(field.m2m_field_name()).attname
+                target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+                pairs = through.objects.filter(**{f'{owner}__in': pks}).order_by(owner, target)
+                yield name, field, pairs.values_list(owner, target)
+            else:
+                owner = field.field.attname
+                ordering = [
+                    F(column[1:]).desc() if column.startswith('-') else F(column)
+                    for column in self.include_limit_ordering
+                ]
+                ranked = field.related_model.objects.filter(**{f'{owner}__in': pks}).annotate(
+                    embed_rank=Window(RowNumber(), partition_by=F(owner), order_by=ordering)
+                ).filter(embed_rank__lte=limit).order_by(owner, 'embed_rank')
+                # The plan's .values() rows include the ordering columns, so the owner too
+                yield name, field, self.get_embed_plan(name).get_queryset(ranked)
+
+    def get_embed_plan(self, name):
+        plans = self.__dict__.setdefault('_embed_plans', {})
+        if name not in plans:
+            plans[name] = ValuesPlan(self.include_serializers[name](context={'request': self.request}))
+        return plans[name]
+
+    def load_embedded(self, pks):
+        """
+        Returns {relation name: {pk: [serialized objects]}} for the objects `pks`.
+        """
+        embedded = {}
+        for name, field, query in self.get_embed_queries(pks) if pks else ():
+            if field.many_to_many:
+                pairs = list(query)
+                rows = list(self.get_embed_targets(name, pairs))
+                embedded[name] = self.group_pairs(name, pairs, rows)
+            else:
+                embedded[name] = self.group_rows(name, list(query), field.field.attname)
+        return embedded
+
+    async def aload_embedded(self, pks):
+        """
+        load_embedded() through the async ORM.
+        """
+        embedded = {}
+        for name, field, query in self.get_embed_queries(pks) if pks else ():
+            if field.many_to_many:
+                pairs = [pair async for pair in query]
+                rows = [row async for row in self.get_embed_targets(name, pairs)]
+                embedded[name] = self.group_pairs(name, pairs, rows)
+            else:
+                embedded[name] = self.group_rows(name, [row async for row in query], field.field.attname)
+        return embedded
+
+    def get_embed_targets(self, name, pairs):
+        plan = self.get_embed_plan(name)
+        return plan.get_queryset(plan.model.objects.filter(pk__in={pk for _, pk in pairs}))
+
+    def group_pairs(self, name, pairs, rows):
+        plan = self.get_embed_plan(name)
+        by_pk = {row[plan.pk_name]: item for row, item in zip(rows, plan.serialize(rows, {}))}
+        grouped = defaultdict(list)
+        for owner, target in pairs:
+            grouped[owner].append(by_pk[target])
+        return grouped
+
+    def group_rows(self, name, rows, owner):
+        grouped = defaultdict(list)
+        for row, item in zip(rows, self.get_embed_plan(name).serialize(rows, {})):
+            grouped[row[owner]].append(item)
+        return grouped
+
+    # --- Handlers ---
+
+    def get_values_related(self, plan, rows):
+        related = super().get_values_related(plan, rows)
+        if self.get_includes():
+            related.update(self.load_embedded([row[plan.pk_name] for row in rows]))
+        return related
+
+    async def aget_values_related(self, plan, rows):
+        related = await super().aget_values_related(plan, rows)
+        if self.get_includes():
+            related.update(await self.aload_embedded([row[plan.pk_name] for row in rows]))
+        return related
+
+    async def aretrieve(self, request, *args, **kwargs):
+        if not self.get_includes():
+            return await super().aretrieve(request, *args, **kwargs)
+        instance = await self.aget_object()
+        self.embedded = await self.aload_embedded([instance.pk])
+        return Response(self.get_serializer(instance).data)
@@ -0,0 +1,648 @@
+"""
+Live updates over ASGI: GET /api/live/?posts=1,2,3 streams Server-Sent Events.
+
+Served by LiveApplication, which drf_assess/asgi.py puts in front of Django; under WSGI the
+endpoint answers 501.
+
+Clients that poll /api/posts/<id>/ to refresh vote counts and comments can instead keep one
+stream open for the posts on screen and get:
+
+- `votes`: {"post": 1, "likes": 12, "dislikes": 3, "delta": {"likes": 2, "dislikes": 0}}, the
+  counts of a post when the stream opens (delta 0), then whenever they change. Bursts of votes
+  are coalesced: a post gets at most one update every BLOG_LIVE_VOTE_INTERVAL seconds, with
+  the counts read from the database (one query per update for all the posts that changed)
+  and the delta since its previous update.
+- `comment`: a new comment, as the comment endpoints serialize it.
+- a `: keepalive` comment line every BLOG_LIVE_HEARTBEAT seconds of silence, so proxies keep
+  idle streams open and dead clients are noticed.
+
+Votes follow Post's stored counts: with ShardedVoteCounter or BufferedVoteCounter they move
+when the votes are folded, not as they are cast.
+
+How events travel:
+
+1. After a write commits, the receivers in blog/signals.py publish an event to the broker
+   (BLOG_LIVE_BROKER, a dotted path, with BLOG_LIVE_BROKER_OPTIONS as kwargs; None disables
+   publishing). A comment is serialized once, by the process that wrote it, and not at all
+   while the broker knows nobody is listening (LocalBroker with no streams, e.g. under WSGI).
+2. The broker delivers every event to every subscribed process:
+   LocalBroker: within the process, for a single worker.
+   SQLiteBroker: through a small SQLite file, a local stand-in for a pub/sub server, shared by
+   the workers on one host.
+3. In each process, LiveHub fans events out to the streams subscribed to their post. Each
+   event is encoded once for all its streams. Idle streams cost two waiting coroutines and a
+   few small objects each (no thread, no timer of their own), so a process holds tens of
+   thousands (see benchmarks/live.py).
+
+A client that falls BLOG_LIVE_MAX_PENDING events behind is disconnected; EventSource clients
+reconnect by themselves (after the `retry` the stream announces) and get fresh counts. Events
+aren't replayed across reconnects: /api/changes/ (blog/changes.py) covers what was missed.
+
+Before subscribing, a stream gets the checks Django would have made: the Host header against
+ALLOWED_HOSTS (400), and BlogRateThrottle's 'read' scope (429). Streams are public, like the
+API's reads, so clients are told apart by address. A client holds at most
+BLOG_LIVE_MAX_CLIENT_STREAMS streams (429), and a process at most BLOG_LIVE_MAX_STREAMS (503).
+
+With several ASGI workers, LocalBroker only reaches the streams of the worker that made the
+write; `manage.py check --deploy` warns about it (blog.W002).
+"""
+import asyncio
+import io
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core import checks
+from django.core.exceptions import DisallowedHost
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections, transaction
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from .models import Post
+from .pagination import positive_int
+from .renderers import FastJSONRenderer
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+# The hub of the running event loop (one per process under an ASGI server)
+_hub = None
+
+
+def get_broker():
+    """
+    Returns the (shared, per-process) instance of the broker configured by BLOG_LIVE_BROKER,
+    or None when live updates are off.
+    """
+    path = getattr(settings, 'BLOG_LIVE_BROKER', 'blog.live.LocalBroker')
+    if path is None:
+        return None
+    options = getattr(settings, 'BLOG_LIVE_BROKER_OPTIONS', {})
+    key = (path, repr(sorted(options.items())))
+    with _brokers_lock:
+        if key not in _brokers:
+            _brokers[key] = import_string(path)(**options)
+        return _brokers[key]
+
+
+def get_vote_interval():
+    return getattr(settings, 'BLOG_LIVE_VOTE_INTERVAL', 1)
+
+
+def get_heartbeat():
+    return getattr(settings, 'BLOG_LIVE_HEARTBEAT', 15)
+
+
+def get_max_pending():
+    return getattr(settings, 'BLOG_LIVE_MAX_PENDING', 100)
+
+
+def get_max_streams():
+    return getattr(settings, 'BLOG_LIVE_MAX_STREAMS', 10000)
+
+
+def get_max_client_streams():
+    return getattr(settings, 'BLOG_LIVE_MAX_CLIENT_STREAMS', 10)
+
+
+@checks.register(deploy=True)
+def check_broker(app_configs, **kwargs):
+    if not isinstance(get_broker(), LocalBroker):
+        return []
+    return [checks.Warning(
+        'BLOG_LIVE_BROKER only delivers events within one process.',
+        hint='With several ASGI workers, streams miss the writes made by the other workers. '
+             'Use a broker shared by the workers (e.g. "blog.live.SQLiteBroker").',
+        id='blog.W002',
+    )]
+
+
+# --- Publishing (called by the receivers in blog/signals.py) ---
+
+def get_listening_broker():
+    """
+    Returns the broker, or None when live updates are off or nobody can be listening.
+    """
+    broker = get_broker()
+    if broker is None or not broker.has_listeners():
+        return None
+    return broker
+
+
+def publish(event):
+    """
+    Hands `event` (JSON-serializable) to the broker once the current transaction commits.
+    """
+    broker = get_listening_broker()
+    if broker is not None:
+        transaction.on_commit(lambda: broker.publish(event))
+
+
+def publish_votes(post_ids):
+    publish({'type': 'votes', 'posts': sorted(set(post_ids))})
+
+
+def publish_comments(comments):
+    if get_listening_broker() is None:
+        return
+    # Imported here: the serializers import blog.signals, which imports this module
+    from .serializers import CommentSerializer
+
+    for comment, data in zip(comments, CommentSerializer(comments, many=True).data):
+        publish({'type': 'comment', 'post': comment.post_id, 'data': data})
+
+
+# --- Brokers ---
+
+class BaseBroker:
+    """
+    Interface shared by all brokers: every event published by any process reaches every
+    callback subscribed in any process, in publication order.
+    """
+
+    def publish(self, event):
+        """
+        Delivers `event` (a JSON-serializable dict) to the subscribers.
+        """
+        raise NotImplementedError('.publish() must be overridden.')
+
+    def subscribe(self, callback):
+        """
+        Calls callback(events) with each batch of events published from now on. Callbacks may
+        be called from any thread and must not block.
+        """
+        raise NotImplementedError('.subscribe() must be overridden.')
+
+    def unsubscribe(self, callback):
+        raise NotImplementedError('.unsubscribe() must be overridden.')
+
+    def has_listeners(self):
+        """
+        Whether a published event may reach a subscriber; when False, publishers skip building
+        events. Brokers shared between processes can't tell, so the default is True.
+        """
+        return True
+
+
+class LocalBroker(BaseBroker):
+    """
+    Delivers events to the callbacks of this process only (a single worker, tests).
+    """
+
+    def __init__(self):
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    def publish(self, event):
+        for callback in list(self.callbacks):
+            callback([event])
+
+    def subscribe(self, callback):
+        with self.lock:
+            self.callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def has_listeners(self):
+        return bool(self.callbacks)
+
+
+class SQLiteBroker(BaseBroker):
+    """
+    Events in their own SQLite file (WAL mode), shared by every process that opens it: a
+    stand-in for a pub/sub server when the workers share a host.
+
+    Publishing is one INSERT. A process with subscribers runs a thread that reads the rows
+    added since its last read every `poll_interval` seconds (SQLite has a single writer, so
+    row IDs grow in commit order and none is skipped). Rows older than `retention` seconds
+    are deleted now and then by every process, publishers included, so the file stays small
+    whether or not anyone subscribes.
+    """
+
+    def __init__(self, path, poll_interval=0.05, retention=60, timeout=5):
+        self.path = str(path)
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.timeout = timeout
+        self.local = threading.local()
+        self.callbacks = []
+        self.lock = threading.Lock()
+        self.poller = None
+        self.swept = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # AUTOINCREMENT: IDs of deleted rows are never reused, so pollers can't miss new ones
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS live_event'
+            ' (id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, payload TEXT NOT NULL)'
+        )
+
+    @property
+    def connection(self):
+        # sqlite3 connections can't be shared between threads; keep one per thread
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Events are transient; losing the last few on power loss is acceptable
+            connection.execute('PRAGMA synchronous=OFF')
+            self.local.connection = connection
+        return connection
+
+    def publish(self, event):
+        self.connection.execute(
+            'INSERT INTO live_event (created, payload) VALUES (?, ?)', (time.time(), json.dumps(event)),
+        )
+        self.sweep()
+
+    def sweep(self):
+        """
+        Deletes the rows older than `retention`, at most twice per retention period per process.
+        """
+        if time.monotonic() - self.swept > self.retention / 2:
+            self.swept = time.monotonic()
+            self.connection.execute('DELETE FROM live_event WHERE created < ?', (time.time() - self.retention,))
+
+    def subscribe(self, callback):
+        with self.lock:
+            self.callbacks.append(callback)
+            if self.poller is None:
+                # Events published from now on
+                last_id = self.connection.execute('SELECT coalesce(max(id), 0) FROM live_event').fetchone()[0]
+                self.poller = threading.Thread(target=self.poll, args=(last_id,), name='live-broker', daemon=True)
+                self.poller.start()
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def poll(self, last_id):
+        try:
+            while True:
+                with self.lock:
+                    callbacks = list(self.callbacks)
+                    if not callbacks:
+                        self.poller = None
+                        return
+                rows = self.connection.execute(
+                    'SELECT id, payload FROM live_event WHERE id > ? ORDER BY id LIMIT 1000', (last_id,),
+                ).fetchall()
+                if rows:
+                    last_id = rows[-1][0]
+                    events = [json.loads(payload) for _, payload in rows]
+                    for callback in callbacks:
+                        callback(events)
+                    if len(rows) == 1000:
+                        continue # More are waiting
+                self.sweep()
+                time.sleep(self.poll_interval)
+        finally:
+            self.connection.close()
+            self.local.connection = None
+
+
+# --- Fan-out ---
+
+KEEPALIVE = b': keepalive\n\n'
+
+
+def encode_event(name, data):
+    """
+    One Server-Sent Event, as the bytes sent to every stream receiving it.
+    """
+    return b'event: ' + name.encode() + b'\ndata: ' + FastJSONRenderer().render(data) + b'\n\n'
+
+
+class Subscription:
+    """
+    One open stream: its posts, and the encoded events waiting to be sent.
+    """
+    __slots__ = ('posts', 'client', 'pending', 'wake', 'active', 'overflowed', 'closed')
+
+    def __init__(self, posts, client=None):
+        self.posts = posts
+        # The address it was opened from (see LiveApplication.admit)
+        self.client = client
+        self.pending = deque()
+        self.wake = asyncio.Event()
+        # Whether something was queued since the last heartbeat
+        self.active = False
+        self.overflowed = False
+        self.closed = False
+
+    def push(self, frame, max_pending):
+        if len(self.pending) >= max_pending:
+            self.overflowed = True
+        else:
+            self.pending.append(frame)
+        self.active = True
+        self.wake.set()
+
+    def close(self):
+        self.closed = True
+        self.wake.set()
+
+
+class LiveHub:
+    """
+    Fans the broker's events out to the streams of one event loop (see module docstring).
+    Its state is only touched from the loop's thread; its queries run on a thread of its own.
+    """
+
+    def __init__(self, loop, broker):
+        self.loop = loop
+        self.broker = broker
+        # {post ID: {Subscription, ...}}
+        self.subscriptions = {}
+        self.streams = set()
+        # {client: number of its open streams}
+        self.clients = {}
+        # {post ID: (likes, dislikes)} as last sent, for the posts with subscriptions
+        self.counts = {}
+        # Posts whose votes changed since the last update
+        self.dirty = set()
+        self.updating = False
+        self.heartbeat = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='live-hub')
+        broker.subscribe(self.receive)
+
+    def close(self):
+        self.broker.unsubscribe(self.receive)
+        self.executor.shutdown(wait=False)
+
+    def receive(self, events):
+        # From the broker, in any thread
+        try:
+            self.loop.call_soon_threadsafe(self.dispatch, events)
+        except RuntimeError:
+            # The loop has closed
+            self.close()
+
+    def dispatch(self, events):
+        max_pending = get_max_pending()
+        for event in events:
+            if event['type'] == 'votes':
+                self.dirty.update(pk for pk in event['posts'] if pk in self.subscriptions)
+            elif event['type'] == 'comment' and event['post'] in self.subscriptions:
+                frame = encode_event('comment', event['data'])
+                for subscription in self.subscriptions[event['post']]:
+                    subscription.push(frame, max_pending)
+        self.schedule_votes()
+
+    def schedule_votes(self):
+        if self.dirty and not self.updating:
+            self.updating = True
+            self.loop.call_later(get_vote_interval(), lambda: self.loop.create_task(self.send_votes()))
+
+    async def send_votes(self):
+        """
+        Sends the counts of the posts whose votes changed, then lets the next update start
+        no sooner than one interval later.
+        """
+        try:
+            post_ids, self.dirty = self.dirty, set()
+            counts = await self.load_counts(post_ids)
+            max_pending = get_max_pending()
+            for pk, (likes, dislikes) in counts.items():
+                previous = self.counts.get(pk)
+                if pk not in self.subscriptions or previous == (likes, dislikes):
+                    continue
+                self.counts[pk] = (likes, dislikes)
+                frame = encode_event('votes', self.votes_data(pk, (likes, dislikes), previous))
+                for subscription in self.subscriptions[pk]:
+                    subscription.push(frame, max_pending)
+        finally:
+            self.updating = False
+            self.schedule_votes()
+
+    async def load_counts(self, post_ids):
+        return await self.loop.run_in_executor(self.executor, self.query_counts, list(post_ids))
+
+    def query_counts(self, post_ids):
+        # A long-lived thread: drop its connection when it's broken or past CONN_MAX_AGE, as requests do
+        close_old_connections()
+        return {
+            pk: (likes, dislikes)
+            for pk, likes, dislikes in Post.objects.filter(pk__in=post_ids).values_list('pk', 'likes', 'dislikes')
+        }
+
+    def votes_data(self, pk, counts, previous=None):
+        previous = previous or counts
+        return {
+            'post': pk, 'likes': counts[0], 'dislikes': counts[1],
+            'delta': {'likes': counts[0] - previous[0], 'dislikes': counts[1] - previous[1]},
+        }
+
+    async def subscribe(self, subscription):
+        """
+        Registers `subscription` and returns the frames it starts with: the counts of its posts.
+        """
+        self.streams.add(subscription)
+        self.clients[subscription.client] = self.clients.get(subscription.client, 0) + 1
+        for pk in subscription.posts:
+            self.subscriptions.setdefault(pk, set()).add(subscription)
+        if self.heartbeat is None:
+            self.heartbeat = self.loop.call_later(get_heartbeat(), self.beat)
+        missing = [pk for pk in subscription.posts if pk not in self.counts]
+        if missing:
+            for pk, counts in (await self.load_counts(missing)).items():
+                # Subscribed posts only (the stream may have closed while the counts loaded)
+                if pk in self.subscriptions:
+                    self.counts.setdefault(pk, counts)
+        return [
+            encode_event('votes', self.votes_data(pk, self.counts[pk]))
+            for pk in subscription.posts if pk in self.counts
+        ]
+
+    def unsubscribe(self, subscription):
+        if subscription not in self.streams:
+            return
+        self.streams.discard(subscription)
+        if self.clients[subscription.client] > 1:
+            self.clients[subscription.client] -= 1
+        else:
+            del self.clients[subscription.client]
+        for pk in subscription.posts:
+            subscriptions = self.subscriptions.get(pk)
+            if subscriptions is None:
+                continue
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[pk]
+                self.counts.pop(pk, None)
+
+    def beat(self):
+        """
+        Queues a keepalive for every stream that had nothing to send since the last beat:
+        one timer for all the streams, rather than one per stream.
+        """
+        self.heartbeat = None
+        if not self.streams:
+            return
+        max_pending = get_max_pending()
+        for subscription in self.streams:
+            if not subscription.active:
+                subscription.push(KEEPALIVE, max_pending)
+            subscription.active = False
+        self.heartbeat = self.loop.call_later(get_heartbeat(), self.beat)
+
+
+def get_hub():
+    """
+    Returns the hub of the running event loop, or None when live updates are off.
+    """
+    global _hub
+    broker = get_broker()
+    if broker is None:
+        return None
+    loop = asyncio.get_running_loop()
+    hub = _hub
+    if hub is None or hub.loop is not loop or hub.broker is not broker:
+        if hub is not None:
+            hub.close()
+        hub = _hub = LiveHub(loop, broker)
+    return hub
+
+
+# --- Serving ---
+
+MAX_LIVE_POSTS = 100
+
+
+class LiveApplication:
+    """
+    ASGI application serving the live streams and handing every other request to `application`
+    (Django's), installed in drf_assess/asgi.py.
+
+    The streams don't go through Django's request handling: a Django request keeps a thread of
+    its own for as long as it is open, which rules out thousands of idle streams per process.
+    A stream here is a coroutine waiting for its next events, and a task waiting for the
+    client to disconnect.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        # The URL of the `live` route (under WSGI, its view explains that it needs ASGI)
+        self.path = reverse('live')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'].removeprefix(scope.get('root_path', '')) == self.path:
+            return await self.serve(scope, receive, send)
+        return await self.application(scope, receive, send)
+
+    async def serve(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            method = scope['method']
+            return await self.respond(send, 405, {'detail': f'Method "{method}" not allowed.'}, [(b'allow', b'GET')])
+        hub = get_hub()
+        if hub is None:
+            return await self.respond(send, 503, {'detail': 'Live updates are disabled.'})
+        posts, errors = self.parse_posts(scope)
+        if errors:
+            return await self.respond(send, 400, {'posts': errors})
+        client, refusal = await self.admit(scope, hub)
+        if refusal is not None:
+            return await self.respond(send, *refusal)
+
+        subscription = Subscription(posts, client)
+        disconnect = asyncio.ensure_future(self.wait_for_disconnect(receive, subscription))
+        try:
+            frames = await hub.subscribe(subscription)
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Unbuffered through nginx
+                (b'x-accel-buffering', b'no'),
+            ]})
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n' + b''.join(frames), 'more_body': True})
+            while True:
+                await subscription.wake.wait()
+                subscription.wake.clear()
+                if subscription.closed or subscription.overflowed:
+                    break
+                frames = b''.join(subscription.pending)
+                subscription.pending.clear()
+                await send({'type': 'http.response.body', 'body': frames, 'more_body': True})
+            if not subscription.closed:
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            hub.unsubscribe(subscription)
+            disconnect.cancel()
+
+    async def admit(self, scope, hub):
+        """
+        Returns (client address, None) when the stream may open, or (None, (status, data, headers)).
+        """
+        # Imported here: the throttle imports blog.metrics, whose middleware loads with the settings
+        from .throttling import BlogRateThrottle
+
+        request = ASGIRequest(scope, io.BytesIO())
+        try:
+            request.get_host()
+        except DisallowedHost:
+            return None, (400, {'detail': 'Invalid Host header.'})
+        request.user = AnonymousUser()
+        throttle = BlogRateThrottle()
+        if not await throttle.aallow_request(request, None):
+            wait = throttle.wait()
+            headers = [] if wait is None else [(b'retry-after', str(math.ceil(wait)).encode())]
+            return None, (429, {'detail': 'Request was throttled.'}, headers)
+        client = throttle.get_ident(request)
+        if hub.clients.get(client, 0) >= get_max_client_streams():
+            return None, (429, {'detail': f'At most {get_max_client_streams()} streams per client.'})
+        if len(hub.streams) >= get_max_streams():
+            return None, (503, {'detail': 'Too many open streams; try again later.'}, [(b'retry-after', b'30')])
+        return client, None
+
+    async def wait_for_disconnect(self, receive, subscription):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscription.close()
+
+    def parse_posts(self, scope):
+        """
+        Returns (post IDs, errors) from the ?posts=<id>,<id>,... parameter.
+        """
+        posts, errors = [], []
+        for values in parse_qs(scope.get('query_string', b'').decode('latin-1')).get('posts', []):
+            for item in (item.strip() for item in values.split(',')):
+                if not item:
+                    continue
+                try:
+                    pk = positive_int(item)
+                except ValueError:
+                    errors.append(f'Invalid post ID: "{item}".')
+                    continue
+                if pk not in posts:
+                    posts.append(pk)
+        if not errors and not posts:
+            errors.append('At least one post ID is required.')
+        elif len(posts) > MAX_LIVE_POSTS:
+            errors.append(f'At most {MAX_LIVE_POSTS} posts per stream.')
+        return tuple(posts), errors
+
+    async def respond(self, send, status, data, headers=()):
+        body = FastJSONRenderer().render(data)
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()), *headers,
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def live_view(request):
+    """
+    GET /api/live/ outside LiveApplication (e.g. under WSGI): the streams need the ASGI application.
+    """
+    return JsonResponse({'detail': 'Live updates are served by the ASGI application (drf_assess/asgi.py).'}, status=501)
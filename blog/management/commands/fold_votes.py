@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.counters import get_vote_counter
+
+
+class Command(BaseCommand):
+    """
+    Folds buffered like/dislike votes into Post.likes / Post.dislikes.
+
+    Only does work for counters that buffer votes (ShardedVoteCounter, BufferedVoteCounter).
+    Run once from cron, or keep it running with --interval.
+    """
+    help = 'Fold buffered like/dislike votes into the Post counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Shard rows folded per transaction.')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep running and fold every INTERVAL seconds (default: fold once and exit).',
+        )
+
+    def handle(self, *args, **options):
+        counter = get_vote_counter()
+        while True:
+            folded = counter.fold(batch_size=options['batch_size'])
+            self.stdout.write(f'Folded {folded} votes.')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,49 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from blog.models import Change
+
+
+class Command(BaseCommand):
+    """
+    Shrinks the change feed log (see blog/changes.py): drops every change followed by a later
+    change of the same object, which consumers get instead, so the log stays about as large as
+    the number of objects plus tombstones. Consumers see the same final state.
+
+    With --tombstone-days, tombstones older than that go too: a consumer syncing less often
+    than that would then keep deleted objects, and must resync from 0.
+
+    Changes are pruned in sequence batches so no single DELETE holds the write lock for long.
+    """
+    help = 'Drop superseded change feed entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Changes examined per DELETE.')
+        parser.add_argument(
+            '--tombstone-days', type=float, default=None,
+            help='Also drop tombstones older than this many days (default: keep them).',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        superseded = Exists(Change.objects.filter(
+            kind=OuterRef('kind'), object_id=OuterRef('object_id'), seq__gt=OuterRef('seq'),
+        ))
+        pruned = 0
+        last_seq = 0
+        while True:
+            seqs = list(Change.objects.filter(seq__gt=last_seq).order_by('seq').values_list('seq', flat=True)[:batch_size])
+            if not seqs:
+                break
+            batch = Change.objects.filter(seq__gte=seqs[0], seq__lte=seqs[-1])
+            pruned += batch.filter(superseded).delete()[0]
+            last_seq = seqs[-1]
+
+        tombstones = 0
+        if options['tombstone_days'] is not None:
+            cutoff = timezone.now() - datetime.timedelta(days=options['tombstone_days'])
+            tombstones = Change.objects.filter(deleted=True, created_at__lt=cutoff).delete()[0]
+        self.stdout.write(f'Pruned {pruned} superseded changes and {tombstones} tombstones.')
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import cache
+from blog.models import Post
+from blog.trending import refresh_trending_scores
+
+
+class Command(BaseCommand):
+    """
+    Recomputes every Post.trending_score (see blog/trending.py) and reports how many had drifted,
+    e.g. after changing BLOG_TRENDING_COMMENT_WEIGHT / BLOG_TRENDING_TIME_SCALE or writing the
+    counts behind the app's back. Run once from cron, or keep it running with --interval.
+
+    Posts are rescored in primary-key batches so no single UPDATE holds the write lock for long.
+    """
+    help = 'Recompute the trending scores of all posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Posts rescored per UPDATE.')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep running and recompute every INTERVAL seconds (default: recompute once and exit).',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            fixed = self.recompute(options['batch_size'])
+            self.stdout.write(f'Fixed trending_score on {fixed} posts.')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def recompute(self, batch_size):
+        fixed = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return fixed
+            batch_fixed = refresh_trending_scores(pks)
+            if batch_fixed:
+                cache.bump('posts')
+            fixed += batch_fixed
+            last_pk = pks[-1]
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from blog import cache, changes
+from blog.counts import refresh_comment_counts, refresh_post_counts
+from blog.models import Category, Post
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the denormalized Post.comment_count and Category.post_count columns
+    (see blog/counts.py) and reports how many rows had drifted.
+
+    Posts are repaired in primary-key batches so no single UPDATE holds the write lock for long.
+    """
+    help = 'Recompute denormalized comment and post counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Posts repaired per UPDATE.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts_fixed = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            fixed = refresh_comment_counts(pks)
+            if fixed:
+                cache.bump(*cache.post_scopes(pks))
+                changes.record(post=pks)
+            posts_fixed += fixed
+            last_pk = pks[-1]
+
+        categories_fixed = refresh_post_counts()
+        if categories_fixed:
+            cache.bump('categories')
+            changes.record(category=Category.objects.values_list('pk', flat=True))
+        self.stdout.write(f'Fixed comment_count on {posts_fixed} posts and post_count on {categories_fixed} categories.')
@@ -0,0 +1,374 @@
+"""
+Per-request instrumentation for the blog API.
+
+RequestMetricsMiddleware records, for every request routed to a blog view:
+
+- the view name (URL name, e.g. 'post-list') and HTTP method
+- database queries and the time spent in them (all connections)
+- serializer time (`.data` and `.is_valid()` of the top-level serializer, see blog/serializers.py)
+- throttle time (BlogRateThrottle checks, see blog/throttling.py)
+- total time and response size
+
+Each response carries them in a `Server-Timing` header, and they are aggregated into
+per-process Prometheus histograms served as text at GET /api/metrics/.
+
+Opt-in profiling: with BLOG_METRICS_PROFILE_THRESHOLD set (milliseconds), a sample of
+requests (BLOG_METRICS_PROFILE_SAMPLE_RATE) runs under cProfile, and the profile of each
+one slower than the threshold is kept (the last BLOG_METRICS_PROFILE_KEEP) and listed at
+GET /api/metrics/profiles/; the response's Server-Timing names the profile ID.
+
+BLOG_METRICS (off by default) turns all of it on. When on, the cost per request is a few
+microseconds plus a perf_counter() pair per query and per timed section. The two endpoints
+expose query counts, timings and profiled code paths, so they answer 403 except to staff users
+and to the addresses in BLOG_METRICS_ALLOWED_IPS (e.g. the Prometheus scraper).
+"""
+import contextlib
+import contextvars
+import cProfile
+import io
+import itertools
+import logging
+import pstats
+import random
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger('blog.metrics')
+
+# Metrics of the request being handled in this context (None outside instrumented requests)
+_current = contextvars.ContextVar('blog_request_metrics', default=None)
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestMetrics:
+    """
+    Numbers collected while handling one request.
+    """
+    __slots__ = ('queries', 'db_time', 'timings')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        # {section: seconds}, e.g. {'serializer': 0.002, 'throttle': 0.0001}
+        self.timings = {}
+
+    def add(self, section, seconds):
+        self.timings[section] = self.timings.get(section, 0.0) + seconds
+
+
+def query_timer(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding each query to the current request's metrics. Installed
+    on every connection; the request is found through a context variable, which follows
+    queries into the threads the async ORM runs them in.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def install_query_timer(connection, **kwargs):
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+@contextlib.contextmanager
+def _timed(metrics, section):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(section, time.perf_counter() - started)
+
+
+def timer(section):
+    """
+    Context manager adding the time spent inside it to `section` of the current request.
+    Does nothing outside instrumented requests.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return contextlib.nullcontext()
+    return _timed(metrics, section)
+
+
+class Histogram:
+    """
+    A Prometheus histogram with one series per label set (cumulative buckets, sum and count).
+    """
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # {labels: [bucket counts..., +Inf count, sum]}
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def render(self, lines):
+        lines.append(f'# HELP {self.name} {self.help_text}')
+        lines.append(f'# TYPE {self.name} histogram')
+        for labels, series in sorted(self.series.items()):
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {round(series[-1], 6)}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+
+
+class MetricsRegistry:
+    """
+    The histograms of this process. Each worker keeps (and serves) its own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {
+            'duration': Histogram('blog_request_duration_seconds', 'Total request time.', DURATION_BUCKETS),
+            'queries': Histogram('blog_request_db_queries', 'Database queries per request.', QUERY_BUCKETS),
+            'db': Histogram('blog_request_db_duration_seconds', 'Time spent in database queries.', DURATION_BUCKETS),
+            'serializer': Histogram(
+                'blog_request_serializer_duration_seconds', 'Time spent in serializers.', DURATION_BUCKETS
+            ),
+            'throttle': Histogram(
+                'blog_request_throttle_duration_seconds', 'Time spent in throttle checks.', DURATION_BUCKETS
+            ),
+            'size': Histogram('blog_response_size_bytes', 'Response body size.', SIZE_BUCKETS),
+        }
+        # {(view, method, status): count}
+        self.requests = {}
+
+    def record(self, view, method, status, total, metrics, size):
+        labels = (('view', view), ('method', method))
+        with self.lock:
+            key = (view, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.histograms['duration'].observe(labels, total)
+            self.histograms['queries'].observe(labels, metrics.queries)
+            self.histograms['db'].observe(labels, metrics.db_time)
+            self.histograms['serializer'].observe(labels, metrics.timings.get('serializer', 0.0))
+            self.histograms['throttle'].observe(labels, metrics.timings.get('throttle', 0.0))
+            if size is not None:
+                self.histograms['size'].observe(labels, size)
+
+    def render(self):
+        """
+        The Prometheus text exposition of every metric.
+        """
+        lines = ['# HELP blog_requests_total Requests handled.', '# TYPE blog_requests_total counter']
+        with self.lock:
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f'blog_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}')
+            for histogram in self.histograms.values():
+                histogram.render(lines)
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self.lock:
+            self.requests.clear()
+            for histogram in self.histograms.values():
+                histogram.series.clear()
+
+
+registry = MetricsRegistry()
+
+
+class ProfileLog:
+    """
+    The most recent profiles of slow requests.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = deque()
+        self.ids = itertools.count(1)
+        # One profiled request at a time: profilers of concurrent threads would skew each other
+        self.profiling = threading.Lock()
+
+    def add(self, summary, profiler):
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(40)
+        with self.lock:
+            profile_id = next(self.ids)
+            self.entries.appendleft((profile_id, summary, output.getvalue()))
+            while len(self.entries) > getattr(settings, 'BLOG_METRICS_PROFILE_KEEP', 20):
+                self.entries.pop()
+        logger.warning('Slow request profiled (#%s): %s', profile_id, summary)
+        return profile_id
+
+    def render(self):
+        with self.lock:
+            entries = list(self.entries)
+        return ''.join(f'=== #{profile_id} {summary}\n{text}\n' for profile_id, summary, text in entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+profiles = ProfileLog()
+
+
+def get_view_name(request):
+    """
+    The URL name of the blog view that handled the request, or None for any other view.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.func.__module__.startswith('blog.views'):
+        return None
+    return match.view_name or match._func_path
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures blog API requests (see module docstring). Place it first in MIDDLEWARE so the
+    total time covers the rest of the stack. Works under WSGI and ASGI; under ASGI a
+    profile covers the event loop thread, where other requests may be interleaved.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'BLOG_METRICS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # Queries are timed by a wrapper on every connection, reporting to the current request
+        connection_created.connect(install_query_timer, dispatch_uid='blog.metrics')
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics, token, profiler, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            total = self.stop(token, profiler, started)
+        return self.finish(request, response, metrics, profiler, total)
+
+    async def __acall__(self, request):
+        metrics, token, profiler, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            total = self.stop(token, profiler, started)
+        return self.finish(request, response, metrics, profiler, total)
+
+    def start(self):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        profiler = self.start_profiler()
+        return metrics, token, profiler, time.perf_counter()
+
+    def stop(self, token, profiler, started):
+        total = time.perf_counter() - started
+        if profiler is not None:
+            profiler.disable()
+            profiles.profiling.release()
+        _current.reset(token)
+        return total
+
+    def finish(self, request, response, metrics, profiler, total):
+        """
+        Records the request and adds its Server-Timing header.
+        """
+        view = get_view_name(request)
+        if view is None:
+            return response
+        size = None if response.streaming else len(response.content)
+        registry.record(view, request.method, response.status_code, total, metrics, size)
+
+        timing = [
+            f'total;dur={total * 1000:.2f}',
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"',
+            *(f'{section};dur={seconds * 1000:.2f}' for section, seconds in metrics.timings.items()),
+            f'view;desc="{view}"',
+        ]
+        if size is not None:
+            timing.append(f'size;desc="{size} bytes"')
+        threshold = getattr(settings, 'BLOG_METRICS_PROFILE_THRESHOLD', None)
+        if profiler is not None and total * 1000 >= threshold:
+            summary = f'{request.method} {request.get_full_path()} {view} {response.status_code} {total * 1000:.1f}ms'
+            timing.append(f'profile;desc="{profiles.add(summary, profiler)}"')
+        response['Server-Timing'] = ', '.join(timing)
+        return response
+
+    def start_profiler(self):
+        """
+        Starts profiling for a sampled request, or returns None.
+        """
+        if getattr(settings, 'BLOG_METRICS_PROFILE_THRESHOLD', None) is None:
+            return None
+        if random.random() >= getattr(settings, 'BLOG_METRICS_PROFILE_SAMPLE_RATE', 0.01):
+            return None
+        if not profiles.profiling.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+
+def check_metrics_access(request):
+    """
+    Raises Http404 with metrics off, PermissionDenied unless the client is a staff user or
+    connects from an address in BLOG_METRICS_ALLOWED_IPS.
+    """
+    if not getattr(settings, 'BLOG_METRICS', False):
+        raise Http404
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return
+    if request.META.get('REMOTE_ADDR') in getattr(settings, 'BLOG_METRICS_ALLOWED_IPS', ()):
+        return
+    raise PermissionDenied
+
+
+def metrics_view(request):
+    """
+    GET /api/metrics/: the Prometheus metrics of this process.
+    """
+    check_metrics_access(request)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def profiles_view(request):
+    """
+    GET /api/metrics/profiles/: the kept profiles of slow requests, newest first.
+    """
+    check_metrics_access(request)
+    return HttpResponse(profiles.render(), content_type='text/plain; charset=utf-8')
@@ -0,0 +1,111 @@
+# Full-text search index for posts (see blog/search.py)
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import blog.models
+
+# Keep the index in sync with every insert/update/delete on blog_post, including bulk ones.
+# SQLite drops these whenever a migration rebuilds blog_post (e.g. adding a NOT NULL column);
+# such migrations must re-create them (see 0006).
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER blog_post_fts_insert AFTER INSERT ON blog_post BEGIN
+        INSERT INTO blog_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER blog_post_fts_delete AFTER DELETE ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    # Only text changes touch the index, so like/dislike updates stay cheap
+    """
+    CREATE TRIGGER blog_post_fts_update AFTER UPDATE OF title, content ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO blog_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+SQLITE_FORWARD = [
+    # External-content FTS5 table: the text lives in blog_post, the index in blog_post_fts
+    """
+    CREATE VIRTUAL TABLE blog_post_fts USING fts5(
+        title, content, content='blog_post', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    *SQLITE_TRIGGERS,
+    # Rank matches with title hits weighted above content hits (exposed as the `rank` column)
+    "INSERT INTO blog_post_fts(blog_post_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    # Index posts that existed before this migration
+    "INSERT INTO blog_post_fts(blog_post_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS blog_post_fts_update",
+    "DROP TRIGGER IF EXISTS blog_post_fts_delete",
+    "DROP TRIGGER IF EXISTS blog_post_fts_insert",
+    "DROP TABLE IF EXISTS blog_post_fts",
+]
+
+# Must match PostgresSearchBackend.vector exactly for the planner to use the index
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX blog_post_search_gin ON blog_post USING GIN (
+        to_tsvector('english'::regconfig, COALESCE(title, '') || ' ' || COALESCE(content, ''))
+    )
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS blog_post_search_gin",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0003_postvoteshard"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            run_for_vendor({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}),
+        ),
+        migrations.CreateModel(
+            name="PostSearchIndex",
+            fields=[
+                (
+                    "post",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_index",
+                        serialize=False,
+                        to="blog.post",
+                    ),
+                ),
+                ("title", models.TextField()),
+                ("content", models.TextField()),
+                ("document", blog.models.FullTextField(db_column="blog_post_fts")),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "blog_post_fts",
+                "managed": False,
+            },
+        ),
+    ]
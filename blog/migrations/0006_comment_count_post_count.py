@@ -0,0 +1,72 @@
+# Generated by Django 5.2 on 2026-10-18 13:49
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+search_index = import_module("blog.migrations.0004_post_search_index")
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Adding (or removing) comment_count rebuilds blog_post on SQLite, dropping the
+    # full-text index triggers
+    if schema_editor.connection.vendor == "sqlite":
+        drop_triggers = [s for s in search_index.SQLITE_BACKWARD if s.startswith("DROP TRIGGER")]
+        for statement in drop_triggers + search_index.SQLITE_TRIGGERS:
+            schema_editor.execute(statement)
+        schema_editor.execute("INSERT INTO blog_post_fts(blog_post_fts) VALUES ('rebuild')")
+
+
+def populate_counts(apps, schema_editor):
+    Category = apps.get_model("blog", "Category")
+    Comment = apps.get_model("blog", "Comment")
+    Post = apps.get_model("blog", "Post")
+    Through = Post.categories.through
+
+    def count(queryset, field):
+        return Coalesce(
+            Subquery(
+                queryset.filter(**{field: OuterRef("pk")})
+                .order_by()
+                .values(field)
+                .annotate(n=Count("pk"))
+                .values("n"),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    Post.objects.update(comment_count=count(Comment.objects, "post"))
+    Category.objects.update(post_count=count(Through.objects, "category"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0005_hot_path_indexes"),
+    ]
+
+    operations = [
+        # Runs last when migrating backwards
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name="category",
+            name="post_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="comment_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["comment_count", "id"], name="blog_post_comments_idx"
+            ),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
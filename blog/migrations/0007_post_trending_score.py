@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-18 14:26
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, Func, IntegerField, Value
+from django.db.models.functions import Abs, Greatest, Log, Sign
+
+counts = import_module("blog.migrations.0006_comment_count_post_count")
+
+# The score as blog/trending.py computed it when this migration was written, frozen (with
+# the default BLOG_TRENDING_* settings) so replaying it always backfills the same values.
+# `manage.py recompute_trending` applies the current formula and settings.
+EPOCH = 1735689600  # 2025-01-01T00:00:00Z
+COMMENT_WEIGHT = 2
+TIME_SCALE = 45000.0  # seconds
+
+
+class Epoch(Func):
+    template = "FLOOR(EXTRACT(EPOCH FROM %(expressions)s))"
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)")
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="FLOOR(UNIX_TIMESTAMP(%(expressions)s))")
+
+
+def populate_scores(apps, schema_editor):
+    Post = apps.get_model("blog", "Post")
+    engagement = F("likes") - F("dislikes") + Value(COMMENT_WEIGHT) * F("comment_count")
+    magnitude = Log(Value(10.0), Greatest(Abs(engagement), Value(1), output_field=FloatField()))
+    age = (Epoch("created_at") - Value(EPOCH)) / Value(TIME_SCALE)
+    Post.objects.update(trending_score=Sign(engagement) * magnitude + age)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0006_comment_count_post_count"),
+    ]
+
+    operations = [
+        # Adding trending_score rebuilds blog_post on SQLite, dropping the full-text index triggers
+        migrations.RunPython(migrations.RunPython.noop, counts.restore_search_triggers),
+        migrations.AddField(
+            model_name="post",
+            name="trending_score",
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["trending_score", "id"], name="blog_post_trending_idx"
+            ),
+        ),
+        migrations.RunPython(counts.restore_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(populate_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0007_post_trending_score"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VoteBufferCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("buffer", models.CharField(max_length=32, unique=True)),
+                ("sequence", models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-18 14:48
+
+from django.db import migrations, models
+
+
+def seed_changes(apps, schema_editor):
+    # One change per existing object, so a consumer starting from sequence 0 gets everything
+    Change = apps.get_model("blog", "Change")
+    for kind, model in [("category", "Category"), ("post", "Post"), ("comment", "Comment")]:
+        pks = apps.get_model("blog", model).objects.order_by("pk").values_list("pk", flat=True)
+        Change.objects.bulk_create([Change(kind=kind, object_id=pk) for pk in pks], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0008_votebuffercheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Change",
+            fields=[
+                ("seq", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("post", "Post"),
+                            ("comment", "Comment"),
+                            ("category", "Category"),
+                        ],
+                        max_length=8,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("deleted", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["kind", "object_id", "seq"],
+                        name="blog_change_object_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
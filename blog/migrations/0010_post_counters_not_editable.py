@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0009_change"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="post",
+            name="dislikes",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="post",
+            name="likes",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
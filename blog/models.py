@@ -1,11 +1,54 @@
 from django.db import models
 
 
+class CounterFieldsMixin:
+    """
+    For models with denormalized counters that are only ever changed with atomic UPDATEs
+    (blog/counters.py, blog/counts.py, blog/trending.py): save() on an existing row leaves `counter_fields`
+    alone, so a stale instance can't write old counts back. Changing a counter on the instance
+    and calling save() raises ValueError instead of being dropped; pass update_fields naming
+    the counter to overwrite it on purpose.
+    """
+    counter_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_counters = instance.get_counters()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_counters = self.get_counters()
+
+    def get_counters(self):
+        # Deferred counters aren't loaded, nor compared
+        return {name: self.__dict__[name] for name in self.counter_fields if name in self.__dict__}
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            loaded = getattr(self, '_loaded_counters', {})
+            changed = [name for name, value in self.get_counters().items() if name in loaded and value != loaded[name]]
+            if changed:
+                raise ValueError(
+                    f'{", ".join(changed)} of {self._meta.object_name} {self.pk} only change through atomic '
+                    f'updates; save(update_fields=[...]) to overwrite them.'
+                )
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_counters = self.get_counters()
 
 
 # Category Model
-class Category(models.Model):
+class Category(CounterFieldsMixin, models.Model):
     name = models.CharField(max_length=100, unique=True) # Category names should be unique
+    # Number of posts in this category (kept up to date by blog/counts.py)
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('post_count',)
 
     class Meta:
         verbose_name_plural = "Categories" # Correct plural name in admin
@@ -16,7 +59,7 @@ class Category(models.Model):
 
 
 # Blog Post Model
-class Post(models.Model):
+class Post(CounterFieldsMixin, models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -25,14 +68,36 @@ class Post(models.Model):
 
    
     # Like/Dislike counts
-    likes = models.PositiveIntegerField(default=0)
-    dislikes = models.PositiveIntegerField(default=0)
+    # (changed by blog/counters.py, not by editing the post)
+    likes = models.PositiveIntegerField(default=0, editable=False)
+    dislikes = models.PositiveIntegerField(default=0, editable=False)
+    # Number of comments on this post (kept up to date by blog/counts.py)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Time-decayed rank over the counts above (kept up to date by blog/trending.py)
+    trending_score = models.FloatField(default=0, editable=False)
 
     # Relationship to Categories
     # related_name allows accessing posts from a category object (e.g., category.posts.all())
     categories = models.ManyToManyField(Category, related_name='posts', blank=True)
     # `blank=True` allows posts to be created without assigning a category initially
 
+    counter_fields = ('likes', 'dislikes', 'comment_count', 'trending_score')
+
+    class Meta:
+        # One index per list ordering (?ordering=...), each ending with `id` so keyset pages
+        # (which always tie-break on the primary key) are read straight off the index
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='blog_post_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='blog_post_updated_idx'),
+            models.Index(fields=['likes', 'id'], name='blog_post_likes_idx'),
+            models.Index(fields=['dislikes', 'id'], name='blog_post_dislikes_idx'),
+            models.Index(fields=['comment_count', 'id'], name='blog_post_comments_idx'),
+            # GET /api/posts/trending/, highest score first
+            models.Index(fields=['trending_score', 'id'], name='blog_post_trending_idx'),
+            # ?author=<name> with the default newest-first ordering
+            models.Index(fields=['author', 'created_at', 'id'], name='blog_post_author_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -51,6 +116,110 @@ class Comment(models.Model):
  
     author = models.CharField(max_length=100)
 
+    class Meta:
+        # A post's comments, newest first (the nested comment list and its keyset pages)
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='blog_comment_post_created_idx'),
+        ]
+
     # String representation of the Comment object
     def __str__(self):
-        return f'Comment by {self.author} on {self.post.title}'
\ No newline at end of file
+        return f'Comment by {self.author} on {self.post.title}'
+
+# Sharded like/dislike counter rows (see blog/counters.py)
+class PostVoteShard(models.Model):
+    # Which Post counter this shard belongs to
+    FIELD_CHOICES = [
+        ('likes', 'Likes'),
+        ('dislikes', 'Dislikes'),
+    ]
+
+    post = models.ForeignKey(Post, related_name='vote_shards', on_delete=models.CASCADE)
+    field = models.CharField(max_length=8, choices=FIELD_CHOICES)
+    # Votes are spread over several rows per post so concurrent writers don't all hit the same row
+    shard = models.PositiveSmallIntegerField()
+    # Votes not yet folded into Post.likes / Post.dislikes
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'field', 'shard'], name='unique_post_vote_shard'),
+        ]
+
+    def __str__(self):
+        return f'{self.field} shard {self.shard} for post {self.post_id}'
+
+
+# How far each write-behind vote buffer has been applied to Post (see blog/counters.py)
+class VoteBufferCheckpoint(models.Model):
+    # Identifies one buffer file (a fresh file gets a new ID, and starts from 0)
+    buffer = models.CharField(max_length=32, unique=True)
+    # Highest buffered vote sequence number already added to Post.likes / Post.dislikes
+    sequence = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'vote buffer {self.buffer} applied up to {self.sequence}'
+
+
+# One entry of the change feed (see blog/changes.py): a post, comment or category was written or deleted
+class Change(models.Model):
+    KIND_CHOICES = [
+        ('post', 'Post'),
+        ('comment', 'Comment'),
+        ('category', 'Category'),
+    ]
+
+    # The change sequence: increases with every change, never reused (AUTOINCREMENT on SQLite)
+    seq = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # A tombstone: the object was deleted
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Finds the earlier changes of an object (`manage.py prune_changes`)
+        indexes = [
+            models.Index(fields=['kind', 'object_id', 'seq'], name='blog_change_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{'deleted' if self.deleted else 'changed'} {self.kind} {self.object_id} (#{self.seq})"
+
+
+# Full-text search support (see blog/search.py)
+class FullTextMatch(models.Lookup):
+    # `document__match='...'` renders as `<table>.<table> MATCH '...'` for an FTS5 table
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class FullTextField(models.TextField):
+    # The hidden column of an FTS5 table that carries its name; only supports `match`
+    pass
+
+
+FullTextField.register_lookup(FullTextMatch)
+
+
+class PostSearchIndex(models.Model):
+    """
+    Read-only view of the blog_post_fts FTS5 table (created and kept in sync by triggers in
+    migration 0004). Joined from Post as `search_index` to match and rank posts.
+    """
+    post = models.OneToOneField(
+        Post, primary_key=True, db_column='rowid', related_name='search_index', on_delete=models.DO_NOTHING
+    )
+    title = models.TextField()
+    content = models.TextField()
+    # FTS5 hidden columns: the table-named column to MATCH against, and the bm25() rank of the match
+    document = FullTextField(db_column='blog_post_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'blog_post_fts'
@@ -0,0 +1,302 @@
+"""
+Pagination for the post and comment feeds.
+
+FeedPagination keeps the familiar page-number responses by default and switches to keyset
+(cursor) pagination when the client asks for it with ?pagination=cursor, or follows a link
+carrying ?cursor=. Keyset pages are fetched with `WHERE (created_at, id) < (last seen)`
+instead of OFFSET, so page N costs the same as page 1.
+
+Every paginator here also has an apaginate_queryset() for the async read path
+(blog/async_views.py) that runs the same queries through the async ORM.
+"""
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+async def afetch(queryset, size):
+    """
+    Evaluates `queryset` (known to hold at most `size` rows) through the async ORM.
+    The chunk is larger than the result, so the rows come back in a single trip to the
+    database thread (plus one for prefetch_related lookups).
+    """
+    return [obj async for obj in queryset.aiterator(chunk_size=size + 1)]
+
+
+def positive_int(value, cutoff=None):
+    """
+    Parses a strictly positive integer, optionally capped at `cutoff`.
+    """
+    value = int(value)
+    if value <= 0:
+        raise ValueError(value)
+    return min(value, cutoff) if cutoff else value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over the queryset's own ordering, with the primary key as tie-breaker.
+
+    - Page size: ?page_size=<n> (capped at max_page_size)
+    - Skip the exact total count: ?count=false ('count' is then null)
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # Used when the queryset carries no explicit ordering
+    default_ordering = ('-created_at',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.prepare(queryset, request)
+        # Exact total over the whole (filtered) feed unless the client opted out
+        self.count = queryset.count() if self.include_count(request) else None
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views, through the async ORM.
+        """
+        page_queryset = self.prepare(queryset, request)
+        self.count = await queryset.acount() if self.include_count(request) else None
+        return self.set_page(await afetch(page_queryset, self.page_size + 1))
+
+    def prepare(self, queryset, request):
+        """
+        Reads the request's page size and cursor; returns the (unevaluated) query for the page.
+        """
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), 'page')
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.fields = [name for name, _ in self.ordering]
+        self.position, self.reverse = self.decode_cursor(queryset.model, request)
+
+        # Fetch one extra row to learn whether another page follows
+        queryset = queryset.order_by(*self.order_by(self.reverse))
+        if self.position is not None:
+            queryset = queryset.filter(self.after(self.position, self.reverse))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        """
+        Trims the fetched rows to the page and works out which links it gets.
+        """
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        # Walking backwards: there is always a next page (the one we came from)
+        self.has_next = has_more or (self.reverse and self.position is not None)
+        self.has_previous = has_more if self.reverse else self.position is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['count', 'results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True, 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    # --- Request parsing ---
+
+    def get_page_size(self, request):
+        try:
+            return positive_int(request.query_params[self.page_size_query_param], cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def include_count(self, request):
+        return request.query_params.get(self.count_query_param, 'true').lower() not in ('0', 'false', 'no')
+
+    def get_ordering(self, queryset):
+        """
+        Returns the ordering as [(field_name, descending), ...], always ending with the primary key
+        so that every row has a unique position.
+        """
+        ordering = [
+            field for field in (queryset.query.order_by or self.default_ordering)
+            if isinstance(field, str)
+        ]
+        ordering = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        pk_name = queryset.model._meta.pk.name
+        if not any(name in ('pk', pk_name) for name, _ in ordering):
+            ordering.append((pk_name, ordering[-1][1] if ordering else False))
+        return ordering
+
+    # --- Keyset queries ---
+
+    def order_by(self, reverse):
+        return [
+            ('-' if descending != reverse else '') + name
+            for name, descending in self.ordering
+        ]
+
+    def after(self, position, reverse):
+        """
+        Builds the row-value comparison `(f1, f2, ...) > (v1, v2, ...)` (respecting each field's
+        direction) as `f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...`.
+        """
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.ordering, position):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        # Bound the leading column too so the planner can use a plain index range scan
+        name, descending = self.ordering[0]
+        lookup = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{name}__{lookup}': position[0]}) & condition
+
+    # --- Cursors ---
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1], False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[0], True))
+
+    def encode_cursor(self, obj, reverse):
+        position = []
+        for name in self.fields:
+            # Model instances, or .values() rows (see blog/values.py)
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            if isinstance(value, (datetime.datetime, datetime.date)):
+                value = value.isoformat() # Full precision, unlike DjangoJSONEncoder
+            position.append(value)
+        payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, model, request):
+        """
+        Returns (position, reverse) for the cursor in the request, or (None, False) on the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        return self.parse_cursor(model, encoded)
+
+    def parse_cursor(self, model, encoded):
+        """
+        Returns (position, reverse) for an encoded cursor (NotFound if it isn't valid for the ordering).
+        """
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            position = payload['p']
+            if len(position) != len(self.fields):
+                raise ValueError(position)
+            return [self.to_python(model, name, value) for name, value in zip(self.fields, position)], bool(payload['r'])
+        except (binascii.Error, TypeError, KeyError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def to_python(self, model, name, value):
+        try:
+            field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value # An annotation; its JSON value is used as-is
+        return field.to_python(value)
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    DRF's PageNumberPagination, plus apaginate_queryset() for the async read path (see blog/async_views.py).
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        PageNumberPagination.paginate_queryset() with the count and the page fetched through the async ORM.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Paginator.count is a cached property: fill it in so the paginator never queries
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            # The browsable API should display pagination controls.
+            self.display_page_controls = True
+
+        self.page.object_list = await afetch(self.page.object_list, page_size)
+        return list(self.page)
+
+
+class FeedPagination(AsyncPageNumberPagination):
+    """
+    Page-number pagination with a client-selectable keyset mode.
+
+    - ?page=<n>&page_size=<n>: classic pages (page_size capped at max_page_size)
+    - ?pagination=cursor: keyset pages; follow the 'next'/'previous' links (?cursor=...)
+    - ?count=false: skip the exact total count in keyset mode
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            self.keyset.max_page_size = self.max_page_size
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            self.keyset.max_page_size = self.max_page_size
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        return await super().apaginate_queryset(queryset, request, view)
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,186 @@
+"""
+In-process registries of small, rarely changing tables (categories).
+
+A registry holds every row of its queryset in memory, loaded with one query, and serves reads
+(CategoryViewSet's list/retrieve, category ID validation on post writes) from that snapshot.
+Each snapshot is stamped with the version of the registry's response cache scope (blog/cache.py),
+which the receivers in blog/signals.py already bump on every change to the table, so:
+
+- while nothing changes, a read costs one version lookup in the response cache and no query
+- after a change in any worker, the next read in every worker sees a new version and reloads
+
+The version only works across workers if the response cache is shared by them, so a
+per-process cache (LocMemCache, which blog.W001 warns about) counts as no cache. The version
+is read before the rows, and bumps are repeated after commit, so a snapshot is never stamped
+with a version newer than its rows. With no (shared) response cache there is no version to
+compare: every read reloads.
+
+IDs missing from a snapshot (a row committed but not yet announced by its bump) are looked up
+in the database before being rejected: by ID validation (blog/serializers.py) and by retrieve.
+"""
+import threading
+from operator import itemgetter
+
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404
+from rest_framework.response import Response
+
+from . import cache
+from .models import Category
+
+
+class Snapshot:
+    """
+    The rows of a registry at one version: `objects` is {pk: model instance} in queryset order.
+    """
+
+    def __init__(self, version, objects):
+        self.version = version
+        self.objects = objects
+        # {serializer class: {pk: serialized row}}, filled on first use
+        self.serialized = {}
+
+    def serialize(self, serializer_class):
+        """
+        Returns {pk: serializer_class's output} for every row, serializing them once per snapshot.
+        """
+        data = self.serialized.get(serializer_class)
+        if data is None:
+            items = serializer_class(list(self.objects.values()), many=True).data
+            data = self.serialized[serializer_class] = {pk: dict(item) for pk, item in zip(self.objects, items)}
+        return data
+
+
+class ModelRegistry:
+    """
+    Every row of `queryset` in memory, reloaded when the cache `scope` version changes
+    (see module docstring).
+    """
+
+    def __init__(self, queryset, scope):
+        self.queryset = queryset
+        self.scope = scope
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # Shared by every copy of the fields using it (serializers deep-copy their fields)
+        return self
+
+    def get(self):
+        """
+        Returns the current Snapshot, reloading it if the table has changed.
+        """
+        version = self.get_version()
+        snapshot = self.snapshot
+        if snapshot is not None and version is not None and snapshot.version == version:
+            return snapshot
+        # One thread reloads; the others wait and use its snapshot
+        with self.lock:
+            snapshot = self.snapshot
+            if snapshot is None or version is None or snapshot.version != version:
+                snapshot = self.snapshot = Snapshot(version, {obj.pk: obj for obj in self.get_queryset()})
+            return snapshot
+
+    async def aget(self):
+        """
+        get() through the async cache and ORM APIs.
+        """
+        version = await self.aget_version()
+        snapshot = self.snapshot
+        if snapshot is None or version is None or snapshot.version != version:
+            snapshot = self.snapshot = Snapshot(version, {obj.pk: obj async for obj in self.get_queryset()})
+        return snapshot
+
+    def get_queryset(self):
+        # From the primary: a lagging read replica would stamp old rows with the new version
+        return self.queryset.using(DEFAULT_DB_ALIAS)
+
+    def get_version(self):
+        if not self.has_shared_versions():
+            return None
+        return cache.get_versions([self.scope])[self.scope]
+
+    async def aget_version(self):
+        if not self.has_shared_versions():
+            return None
+        return (await cache.aget_versions([self.scope]))[self.scope]
+
+    def has_shared_versions(self):
+        # A per-process cache would never show this worker the other workers' changes
+        response_cache = cache.get_response_cache()
+        return response_cache is not None and cache.is_shared(response_cache)
+
+    def clear(self):
+        self.snapshot = None
+
+
+category_registry = ModelRegistry(Category.objects.order_by('name'), 'categories')
+
+
+class RegistryReadMixin:
+    """
+    View mixin serving `list` and `retrieve` from `registry` (serialized once per snapshot)
+    instead of the database. Goes after CachedResponseMixin, so the responses are cached as
+    usual, and before AsyncReadMixin, whose async handlers it also replaces.
+
+    Supports the view's pagination and OrderingFilter (?ordering=) on serializer fields; the
+    registry's queryset order is the default.
+    """
+    registry = None
+
+    def list(self, request, *args, **kwargs):
+        return self.registry_list(self.registry.get())
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = self.get_registry_pk()
+        snapshot = self.registry.get()
+        if pk is not None and pk not in snapshot.objects:
+            return self.registry_miss(self.registry.get_queryset().filter(pk=pk).first())
+        return self.registry_retrieve(snapshot, pk)
+
+    async def alist(self, request, *args, **kwargs):
+        return self.registry_list(await self.registry.aget())
+
+    async def aretrieve(self, request, *args, **kwargs):
+        pk = self.get_registry_pk()
+        snapshot = await self.registry.aget()
+        if pk is not None and pk not in snapshot.objects:
+            return self.registry_miss(await self.registry.get_queryset().filter(pk=pk).afirst())
+        return self.registry_retrieve(snapshot, pk)
+
+    def registry_list(self, snapshot):
+        items = self.order_items(list(snapshot.serialize(self.get_serializer_class()).values()))
+        # Paginating a list needs no queries, on the async path too
+        page = self.paginate_queryset(items)
+        return Response(items) if page is None else self.get_paginated_response(page)
+
+    def get_registry_pk(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return self.registry.queryset.model._meta.pk.to_python(self.kwargs[lookup_url_kwarg])
+        except (KeyError, ValidationError):
+            return None
+
+    def registry_retrieve(self, snapshot, pk):
+        data = snapshot.serialize(self.get_serializer_class())
+        if pk not in data:
+            raise Http404(f'No {self.registry.queryset.model._meta.object_name} matches the given query.')
+        return Response(data[pk])
+
+    def registry_miss(self, obj):
+        # Not in the snapshot: committed since, but its bump not seen yet, so read from the database
+        if obj is None:
+            raise Http404(f'No {self.registry.queryset.model._meta.object_name} matches the given query.')
+        return Response(self.get_serializer(obj).data)
+
+    def order_items(self, items):
+        ordering = None
+        for backend in self.filter_backends:
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(self.request, self.registry.queryset, self)
+        # Stable sorts, last key first; ties keep the registry's order
+        for name in reversed(ordering or ()):
+            items.sort(key=itemgetter(name.lstrip('-')), reverse=name.startswith('-'))
+        return items
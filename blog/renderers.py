@@ -0,0 +1,164 @@
+"""
+Renderers and parsers for the blog API.
+
+FastJSONRenderer / FastJSONParser are drop-in replacements for DRF's JSONRenderer /
+JSONParser (see REST_FRAMEWORK in settings) backed by orjson when it is installed, and
+by DRF's own stdlib implementation otherwise.
+
+The streaming renderers serve the export endpoints (see blog/export.py). Each can either
+render a complete list of rows (used for error responses) or `stream()` rows one at a time,
+yielding text in buffered chunks so that a StreamingHttpResponse never holds more than
+`buffer_size` characters of output.
+"""
+import csv
+import io
+import json
+import re
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+else:
+    # Datetimes and dataclasses go through DRF's encoder, as with JSONRenderer
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+# Integers beyond 64 bits have at least 19 digits
+LONG_NUMBER = re.compile(rb'\d{19}')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer producing the same bytes with orjson.
+
+    Types orjson doesn't handle the way DRF does (datetimes, Decimal, lazy strings, ...) go
+    through DRF's encoder; indented output and anything orjson rejects (e.g. integers over
+    64 bits) are rendered by JSONRenderer itself. Floats are the exception: exponents are
+    spelled differently (1e16 rather than 1e+16) and NaN/Infinity render as null instead of
+    raising. The blog API renders no floats.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped by JSONRenderer so the output is also valid JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser parsing UTF-8 bodies with orjson. Bodies orjson rejects are parsed again by
+    JSONParser, so invalid JSON gets the same error message and the stdlib's leniencies
+    (e.g. lone surrogate escapes) still apply. So are bodies with 19+ digit runs, which may
+    hold integers orjson would turn into floats.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if LONG_NUMBER.search(body) is None:
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Base class for renderers that can write an unbounded iterable of flat dicts.
+    """
+    charset = 'utf-8'
+    # Characters collected before a chunk is handed to the response
+    buffer_size = 64 * 1024
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(self.stream(rows)).encode(self.charset)
+
+    def stream(self, rows, fields=None):
+        """
+        Yields the rendered text of `rows` in chunks of about `buffer_size` characters.
+        `fields` fixes the columns (and their order); by default the first row's keys are used.
+        """
+        buffer = io.StringIO()
+        write_row = self.get_writer(buffer, fields)
+        for row in rows:
+            write_row(row)
+            if buffer.tell() >= self.buffer_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def get_writer(self, buffer, fields):
+        """
+        Returns a function writing one row to `buffer`.
+        """
+        raise NotImplementedError('.get_writer() must be overridden.')
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """
+    Newline-delimited JSON: one object per line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def get_writer(self, buffer, fields):
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+        def write_row(row):
+            if fields is not None:
+                row = {field: row.get(field) for field in fields}
+            buffer.write(encode(row))
+            buffer.write('\n')
+
+        return write_row
+
+
+class CSVRenderer(StreamingRenderer):
+    """
+    CSV with a header line. List values (e.g. category IDs) are joined with `list_separator`.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    list_separator = '|'
+
+    def get_writer(self, buffer, fields):
+        writer = csv.writer(buffer)
+        columns = None
+
+        def write_row(row):
+            nonlocal columns
+            if columns is None:
+                # Header line, written with the first row
+                columns = list(fields) if fields is not None else list(row)
+                writer.writerow(columns)
+            writer.writerow([self.format_value(row.get(column)) for column in columns])
+
+        return write_row
+
+    def format_value(self, value):
+        if isinstance(value, (list, tuple)):
+            return self.list_separator.join(str(item) for item in value)
+        if isinstance(value, dict):
+            return json.dumps(value, ensure_ascii=False)
+        return value
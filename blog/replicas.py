@@ -0,0 +1,180 @@
+"""
+Read replicas: reads of the blog's tables go to a replica, writes to the primary.
+
+With BLOG_READ_REPLICAS set to database aliases (copies of `default` kept up to date by the
+database's replication), ReplicaRouter sends the queries of GET/HEAD requests on posts,
+categories and comments to one of the replicas, picked at random once per request (so one
+response never mixes replicas that lag by different amounts), and everything else to the
+primary (`default`):
+
+- every write, and every read of a request that isn't a GET/HEAD (validation reads before a
+  write must see the primary)
+- reads after a write in the same request, and inside transactions
+- reads of other tables (votes being folded, sessions, ...) and outside requests (commands,
+  the flusher thread, ...)
+
+Replicas lag behind the primary, so a client that has just written is pinned to the primary
+for BLOG_REPLICA_STICKY_SECONDS: the response to a write sets a cookie that routes that
+client's reads to the primary until it expires (read-your-own-writes). Responses cached from
+a replica read expire after BLOG_REPLICA_CACHE_TIMEOUT (see blog/cache.py), since the replica
+may not have caught up with the write that bumped their scope version yet.
+
+Routing state lives in ReplicaRoutingMiddleware, which must come before anything that reads
+the database. Without replicas the middleware removes itself and every query goes to `default`.
+
+sync_sqlite_replica() is a local stand-in for replication between SQLite files (for tests and
+benchmarks): it copies the primary into a replica with SQLite's backup API.
+"""
+import contextvars
+import random
+import sqlite3
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# The routing state of the current request (None outside requests)
+_current = contextvars.ContextVar('blog_replica_routing', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'BLOG_READ_REPLICAS', [])
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'BLOG_REPLICA_STICKY_SECONDS', 5)
+
+
+def get_cookie_name():
+    return getattr(settings, 'BLOG_REPLICA_COOKIE_NAME', 'blog_primary')
+
+
+class RoutingState:
+    """
+    How the current request's reads are routed. Shared by the threads serving the request
+    (sync_to_async copies the context, not the object).
+    """
+
+    def __init__(self, use_primary):
+        self.use_primary = use_primary
+        self.wrote = False
+        # The replica this request reads from, picked on its first replica read
+        self.replica = None
+
+
+def used_replica():
+    """
+    Whether the current request has read from a replica.
+    """
+    state = _current.get()
+    return state is not None and state.replica is not None
+
+
+class ReplicaRouter:
+    """
+    Database router for the read replicas (see module docstring). In DATABASE_ROUTERS.
+    """
+    # Tables whose reads may go to a replica (model labels; the post/category link table included)
+    replica_models = {'blog.post', 'blog.category', 'blog.comment', 'blog.post_categories'}
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if state is None or state.use_primary or model._meta.label_lower not in self.replica_models:
+            return None
+        replicas = get_replicas()
+        if not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        # Objects related to one loaded from the primary come from the primary too
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == DEFAULT_DB_ALIAS:
+            return None
+        if state.replica not in replicas:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            # The rest of the request reads its own writes
+            state.use_primary = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return False if db in get_replicas() else None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sets up the routing state of each request and the sticky cookie after writes (see module
+    docstring). Works under WSGI and ASGI; not used without BLOG_READ_REPLICAS.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(response, state)
+
+    def start(self, request):
+        state = RoutingState(use_primary=request.method not in ('GET', 'HEAD') or self.is_sticky(request))
+        return state, _current.set(state)
+
+    def is_sticky(self, request):
+        try:
+            return float(request.COOKIES[get_cookie_name()]) > time.time()
+        except (KeyError, ValueError):
+            return False
+
+    def finish(self, response, state):
+        if state.wrote and response.status_code < 400:
+            sticky = get_sticky_seconds()
+            response.set_cookie(
+                get_cookie_name(), str(time.time() + sticky), max_age=sticky, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+def sync_sqlite_replica(alias, source=DEFAULT_DB_ALIAS):
+    """
+    Replication stand-in: copies the committed state of SQLite database `source` over the
+    SQLite replica `alias` (schema included).
+    """
+    connection = connections[source]
+    connection.ensure_connection()
+    target = sqlite3.connect(str(connections.settings[alias]['NAME']), uri=True)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
@@ -0,0 +1,115 @@
+"""
+Full-text search backends for Posts.
+
+PostSearchFilter (blog/filters.py) hands the ?search= terms to the backend configured by the
+BLOG_SEARCH_BACKEND setting (a dotted path). Indexed backends filter through the database's
+full-text index and annotate each post with `search_rank`, ordering the best matches first.
+
+- SQLiteFTS5SearchBackend: the blog_post_fts FTS5 table (kept in sync by triggers, see
+  migration 0004), joined through PostSearchIndex and ranked with bm25().
+- PostgresSearchBackend: a GIN expression index over to_tsvector(title || content),
+  ranked with ts_rank_cd().
+- IcontainsSearchBackend: DRF's plain `LIKE '%term%'` filtering, unranked.
+"""
+import re
+
+from django.conf import settings
+from django.db.models import BooleanField, F, FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Annotation holding each matching post's relevance
+RANK_FIELD = 'search_rank'
+
+
+def get_search_backend():
+    """
+    Returns an instance of the search backend configured by BLOG_SEARCH_BACKEND.
+    """
+    path = getattr(settings, 'BLOG_SEARCH_BACKEND', 'blog.search.SQLiteFTS5SearchBackend')
+    return import_string(path)()
+
+
+class BaseSearchBackend:
+    """
+    Interface shared by all search backends.
+    """
+    # False for backends that only emulate DRF's SearchFilter (see PostSearchFilter)
+    indexed = True
+
+    def search(self, queryset, terms):
+        """
+        Returns `queryset` narrowed to posts matching every term, annotated with `search_rank`
+        and ordered best match first (ties keep the queryset's existing ordering).
+        """
+        raise NotImplementedError('.search() must be overridden.')
+
+    def order_by_rank(self, queryset, descending):
+        ordering = ['-' + RANK_FIELD if descending else RANK_FIELD]
+        return queryset.order_by(*ordering, *queryset.query.order_by)
+
+
+class IcontainsSearchBackend(BaseSearchBackend):
+    """
+    DRF's SearchFilter behaviour: every term must appear (case-insensitively) in the title or content.
+    """
+    indexed = False
+
+
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+    """
+    Matches against the blog_post_fts FTS5 index (joined as Post.search_index);
+    each term matches words starting with it.
+    """
+
+    def search(self, queryset, terms):
+        query = self.build_query(terms)
+        if query is None:
+            return queryset.none()
+        # The FTS5 `rank` column is bm25() with the weights configured in migration 0004
+        queryset = queryset.filter(search_index__document__match=query).annotate(
+            **{RANK_FIELD: F('search_index__rank')}
+        )
+        # bm25() scores are negative; lower is better
+        return self.order_by_rank(queryset, descending=False)
+
+    def build_query(self, terms):
+        """
+        Turns search terms into an FTS5 query such as `"foo"* AND "bar"*`.
+        Terms are quoted, so FTS5 operators typed by the client are matched literally.
+        """
+        words = [word for term in terms for word in re.findall(r'\w+', term)]
+        if not words:
+            return None
+        return ' AND '.join('"%s"*' % word for word in words)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Matches against the blog_post_search_gin expression index (see migration 0004).
+    The tsvector expression must stay identical to the indexed one for the index to be used.
+    """
+    config = 'english'
+    vector = (
+        "to_tsvector('english'::regconfig, "
+        "COALESCE(blog_post.title, '') || ' ' || COALESCE(blog_post.content, ''))"
+    )
+
+    def search(self, queryset, terms):
+        query = self.build_query(terms)
+        if query is None:
+            return queryset.none()
+        tsquery = f"to_tsquery('{self.config}'::regconfig, %s)"
+        matches = RawSQL(f'{self.vector} @@ {tsquery}', [query], output_field=BooleanField())
+        rank = RawSQL(f'ts_rank_cd({self.vector}, {tsquery})', [query], output_field=FloatField())
+        queryset = queryset.filter(matches).annotate(**{RANK_FIELD: rank})
+        return self.order_by_rank(queryset, descending=True)
+
+    def build_query(self, terms):
+        """
+        Turns search terms into a tsquery such as `foo:* & bar:*` (prefix matches, all required).
+        """
+        words = [word for term in terms for word in re.findall(r'\w+', term)]
+        if not words:
+            return None
+        return ' & '.join(f'{word}:*' for word in words)
@@ -1,40 +1,281 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from .models import Post, Comment, Category 
+from .metrics import timer
+from .sparse import SparseSerializerMixin
+from .include import IncludeSerializerMixin
+from .registry import category_registry
+from .signals import objects_bulk_saved
+
+
+# Serializer time reported by the request metrics (see blog/metrics.py)
+class TimedSerializerMixin:
+    """
+    Adds the time spent in `.data` and `.is_valid()` to the current request's 'serializer' timing.
+    Nested serializers don't go through either, so only the top-level serializer is counted.
+    """
+
+    @property
+    def data(self):
+        with timer('serializer'):
+            return super().data
+
+    def is_valid(self, *args, **kwargs):
+        with timer('serializer'):
+            return super().is_valid(*args, **kwargs)
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """
+    ListSerializer for many=True reads and writes, timed like its child serializer.
+    """
+
+
+# Related field that validates a whole list of primary keys at once
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """
+    ManyRelatedField that looks up every submitted primary key with a single
+    `in_bulk()` query instead of one `.get()` per ID.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for item in data:
+            if isinstance(item, bool):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+            try:
+                pks.append(pk_field.to_python(item))
+            except ValidationError:
+                child.fail('incorrect_type', data_type=type(item).__name__)
+
+        # One query for the whole list, or none when a batch serializer has already
+        # looked up every ID in the batch (see BulkListSerializer.preload) or the
+        # objects are in a registry (see blog/registry.py)
+        found = self.context.get('preloaded', {}).get(queryset.model)
+        if found is None and child.registry is None:
+            found = queryset.in_bulk(pks)
+        else:
+            if found is None:
+                found = child.registry.get().objects
+            # IDs the snapshot predates (committed, bump not seen yet) are checked in the database
+            missing = [pk for pk in pks if pk not in found]
+            if missing:
+                found = {**found, **queryset.in_bulk(missing)}
+        for pk in pks:
+            if pk not in found:
+                child.fail('does_not_exist', pk_value=pk)
+        return [found[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField whose many=True form validates IDs in bulk (see BulkManyRelatedField),
+    from `registry` (a blog.registry.ModelRegistry over the queryset's model) when given.
+    """
+
+    def __init__(self, registry=None, **kwargs):
+        self.registry = registry
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
 
 # category serializer
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name']
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'name', 'post_count']
+        read_only_fields = ['post_count']
 
 # PostSerializer ---
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(IncludeSerializerMixin, SparseSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     # To show category names instead of IDs (Optional, makes API nicer)
     # Use StringRelatedField for read-only names
     # categories = serializers.StringRelatedField(many=True, read_only=True)
 
-    
-    categories = serializers.PrimaryKeyRelatedField(
+    # Category IDs are validated against the in-process registry (no query while categories
+    # don't change); on reads they come from the view's prefetch_related('categories')
+    categories = BulkPrimaryKeyRelatedField(
         queryset=Category.objects.all(),
+        registry=category_registry,
         many=True,
         required=False # Allow creating/updating posts without categories
     )
 
     class Meta:
         model = Post
+        list_serializer_class = TimedListSerializer
         # Add 'likes', 'dislikes', 'categories' to fields
         fields = [
             'id', 'title', 'content', 'author',
             'created_at', 'updated_at',
             'likes', 'dislikes', # Add counts
+            'comment_count',
             'categories'       # Add categories field
         ]
         # read-only
-        read_only_fields = ['created_at', 'updated_at', 'likes', 'dislikes']
+        read_only_fields = ['created_at', 'updated_at', 'likes', 'dislikes', 'comment_count']
 
 #  CommentSerializer
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Comment
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'content', 'author', 'created_at', 'updated_at', 'post']
-        read_only_fields = ['created_at', 'updated_at', 'post']
\ No newline at end of file
+        read_only_fields = ['created_at', 'updated_at', 'post']
+
+
+# ==============================================================================
+# Batch write serializers (used by the /bulk/ endpoints)
+# ==============================================================================
+
+class BulkListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """
+    ListSerializer for batch writes.
+
+    Unlike ListSerializer, one bad item doesn't reject the whole batch: every item is
+    validated on its own, failures are collected in `item_errors` ({index: errors}) and
+    `validated_data` holds only the valid items (their input positions are in `valid_indexes`).
+    Valid items are written with bulk_create() / bulk_update().
+
+    For updates, pass `instance` as {pk: object}; every item must then carry an 'id'.
+    """
+    max_items = 5000
+    batch_size = 1000
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError(
+                {'non_field_errors': [f'Expected a list of items but got type "{type(data).__name__}".']}
+            )
+        if not data:
+            raise serializers.ValidationError({'non_field_errors': ['This list may not be empty.']})
+        if len(data) > self.max_items:
+            raise serializers.ValidationError(
+                {'non_field_errors': [f'Ensure this list has no more than {self.max_items} items.']}
+            )
+
+        self.preload(data)
+        self.item_errors = {}
+        self.valid_indexes = []
+        self.valid_instances = []
+        validated = []
+        for index, item in enumerate(data):
+            try:
+                instance = self.get_item_instance(item)
+                validated.append(self.child.run_validation(item))
+            except serializers.ValidationError as exc:
+                self.item_errors[index] = exc.detail
+                continue
+            self.valid_indexes.append(index)
+            self.valid_instances.append(instance)
+        return validated
+
+    def get_item_instance(self, item):
+        """
+        Returns the object an update item refers to (None when creating).
+        """
+        if self.instance is None:
+            return None
+        pk = item.get('id') if isinstance(item, dict) else None
+        if pk not in self.instance:
+            raise serializers.ValidationError({'id': [f'{self.child.Meta.model.__name__} with ID {pk} not found.']})
+        return self.instance[pk]
+
+    def preload(self, data):
+        """
+        Hook for looking up related objects of the whole batch at once before validating items.
+        """
+
+    @property
+    def errors_list(self):
+        return [{'index': index, 'errors': errors} for index, errors in sorted(self.item_errors.items())]
+
+
+class PostBulkListSerializer(BulkListSerializer):
+    """
+    Batch create/update of Posts, including their categories.
+    """
+
+    def preload(self, data):
+        # Validate the category IDs of every item against one registry snapshot
+        self.context.setdefault('preloaded', {})[Category] = category_registry.get().objects
+
+    def create(self, validated_data):
+        categories = [item.pop('categories', None) or [] for item in validated_data]
+        with transaction.atomic():
+            posts = Post.objects.bulk_create(
+                [Post(**item) for item in validated_data], batch_size=self.batch_size
+            )
+            self.set_categories(posts, categories)
+            category_ids = {category.pk for post_categories in categories for category in post_categories}
+            objects_bulk_saved.send(sender=Post, instances=posts, created=True, category_ids=category_ids)
+        return posts
+
+    def update(self, instances, validated_data):
+        now = timezone.now()
+        fields = {'updated_at'}
+        posts, categories = [], []
+        for post, item in zip(self.valid_instances, validated_data):
+            if 'categories' in item:
+                categories.append((post, item.pop('categories')))
+            for attr, value in item.items():
+                setattr(post, attr, value)
+            post.updated_at = now # bulk_update() skips auto_now
+            fields.update(item)
+            posts.append(post)
+        with transaction.atomic():
+            Post.objects.bulk_update(posts, sorted(fields), batch_size=self.batch_size)
+            category_ids = set()
+            if categories:
+                links = Post.categories.through.objects.filter(post__in=[post for post, _ in categories])
+                # Categories losing posts as well as those gaining them need their post_count refreshed
+                category_ids.update(links.values_list('category_id', flat=True))
+                category_ids.update(category.pk for _, post_categories in categories for category in post_categories)
+                links.delete()
+                self.set_categories(*zip(*categories))
+            objects_bulk_saved.send(sender=Post, instances=posts, created=False, category_ids=category_ids)
+        return posts
+
+    def set_categories(self, posts, categories):
+        Through = Post.categories.through
+        Through.objects.bulk_create(
+            [
+                Through(post_id=post.pk, category_id=category.pk)
+                for post, post_categories in zip(posts, categories)
+                for category in {c.pk: c for c in post_categories}.values()
+            ],
+            batch_size=self.batch_size,
+        )
+
+
+class CommentBulkListSerializer(BulkListSerializer):
+    """
+    Batch create of Comments on one post (pass post_id=... to save()).
+    """
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            comments = Comment.objects.bulk_create(
+                [Comment(**item) for item in validated_data], batch_size=self.batch_size
+            )
+            objects_bulk_saved.send(sender=Comment, instances=comments, created=True)
+        return comments
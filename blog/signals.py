@@ -0,0 +1,241 @@
+"""
+Signals for the blog app, and the receivers keeping derived state in step with the models.
+
+Connected in BlogConfig.ready().
+"""
+from collections import Counter
+
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import cache, changes, counts, live, trending
+from .models import Category, Comment, Post
+
+# Sent when like/dislike counts stored on Post rows change outside of Post.save()
+# (atomic increments, folded vote shards). Arguments: post_ids
+post_votes_changed = Signal()
+
+# Sent after bulk_create()/bulk_update() writes, which skip post_save and m2m_changed.
+# Arguments: instances, created, and for Posts category_ids (categories that gained or lost posts)
+objects_bulk_saved = Signal()
+
+
+# --- Response cache invalidation (see blog/cache.py) ---
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    cache.bump(*cache.post_scopes([instance.pk]), f'comments:{instance.pk}')
+
+
+@receiver(post_votes_changed)
+def invalidate_voted_posts(sender, post_ids, **kwargs):
+    cache.bump(*cache.vote_scopes(post_ids))
+
+
+@receiver(objects_bulk_saved, sender=Post)
+def invalidate_bulk_posts(sender, instances, category_ids=(), **kwargs):
+    cache.bump(*cache.post_scopes([post.pk for post in instances]))
+    if counts.refresh_post_counts(category_ids):
+        cache.bump('categories')
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def invalidate_post_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        cache.bump(*cache.post_scopes([instance.pk]))
+    elif action == 'pre_clear':
+        # category.posts.clear(): pk_set is empty, so capture the posts before they're detached
+        cache.bump(*cache.post_scopes(instance.posts.values_list('pk', flat=True)))
+    elif pk_set:
+        cache.bump(*cache.post_scopes(pk_set))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    # The post's comment_count changes along with its comments
+    cache.bump(f'comments:{instance.post_id}', *cache.post_scopes([instance.post_id]))
+
+
+@receiver(objects_bulk_saved, sender=Comment)
+def invalidate_bulk_comments(sender, instances, **kwargs):
+    post_ids = {comment.post_id for comment in instances}
+    cache.bump(*(f'comments:{pk}' for pk in post_ids), *cache.post_scopes(post_ids))
+
+
+@receiver(post_save, sender=Category)
+def invalidate_category(sender, instance, **kwargs):
+    cache.bump('categories')
+
+
+@receiver(pre_delete, sender=Category)
+def invalidate_deleted_category(sender, instance, **kwargs):
+    # Deleting a category silently drops it from its posts (no m2m_changed is sent)
+    cache.bump('categories', *cache.post_scopes(instance.posts.values_list('pk', flat=True)))
+
+
+# --- Denormalized counts (see blog/counts.py) ---
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, **kwargs):
+    if created:
+        counts.adjust_comment_counts({instance.post_id: 1})
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, origin=None, **kwargs):
+    # Comments deleted along with their post leave no count to update
+    if isinstance(origin, Post) or (isinstance(origin, QuerySet) and origin.model is Post):
+        return
+    counts.adjust_comment_counts({instance.post_id: -1})
+
+
+@receiver(objects_bulk_saved, sender=Comment)
+def count_bulk_comments(sender, instances, created, **kwargs):
+    if created:
+        counts.adjust_comment_counts(Counter(comment.post_id for comment in instances))
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def count_category_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        # post.categories.clear(): pk_set is empty, so capture the categories before they're detached
+        instance._cleared_category_ids = list(instance.categories.values_list('pk', flat=True))
+        return
+    if action == 'post_clear' and not reverse:
+        category_ids = instance.__dict__.pop('_cleared_category_ids', [])
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        category_ids = [instance.pk] if reverse else pk_set
+    else:
+        return
+    if counts.refresh_post_counts(category_ids):
+        cache.bump('categories')
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_categories(sender, instance, **kwargs):
+    # Deleting a post drops its category links without sending m2m_changed
+    instance._deleted_category_ids = list(instance.categories.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    if counts.refresh_post_counts(instance.__dict__.pop('_deleted_category_ids', [])):
+        cache.bump('categories')
+
+
+# --- Trending scores (see blog/trending.py) ---
+
+@receiver(post_save, sender=Post)
+def score_created_post(sender, instance, created, **kwargs):
+    # Votes and comments rescore a post as they count; a new post needs its first score
+    if created:
+        trending.refresh_trending_scores([instance.pk])
+
+
+@receiver(objects_bulk_saved, sender=Post)
+def score_bulk_posts(sender, instances, created, **kwargs):
+    if created:
+        trending.refresh_trending_scores([post.pk for post in instances])
+
+
+# --- Change feed (see blog/changes.py) ---
+# Connected last, so the receivers above have updated the counts these changes cover
+
+@receiver(post_save, sender=Post)
+def record_post(sender, instance, **kwargs):
+    changes.record(post=[instance.pk])
+
+
+@receiver(pre_delete, sender=Post)
+def record_deleted_post_categories(sender, instance, **kwargs):
+    # Their post_count drops (remember_post_categories has collected them)
+    changes.record(category=getattr(instance, '_deleted_category_ids', []))
+
+
+@receiver(post_delete, sender=Post)
+def record_deleted_post(sender, instance, **kwargs):
+    changes.record(post=[instance.pk], deleted=True)
+
+
+@receiver(post_votes_changed)
+def record_voted_posts(sender, post_ids, **kwargs):
+    changes.record_votes(post_ids)
+
+
+@receiver(objects_bulk_saved, sender=Post)
+def record_bulk_posts(sender, instances, category_ids=(), **kwargs):
+    changes.record(post=[post.pk for post in instances], category=category_ids)
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def record_post_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # The links are about to go: capture both sides (count_category_posts stashed a post's categories)
+        if reverse:
+            changes.record(category=[instance.pk], post=instance.posts.values_list('pk', flat=True))
+        else:
+            changes.record(post=[instance.pk], category=getattr(instance, '_cleared_category_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        if reverse:
+            changes.record(category=[instance.pk], post=pk_set)
+        else:
+            changes.record(post=[instance.pk], category=pk_set)
+
+
+@receiver(post_save, sender=Comment)
+def record_comment(sender, instance, **kwargs):
+    # The post's comment_count changes along with its comments
+    changes.record(comment=[instance.pk], post=[instance.post_id])
+
+
+@receiver(post_delete, sender=Comment)
+def record_deleted_comment(sender, instance, origin=None, **kwargs):
+    changes.record(comment=[instance.pk], deleted=True)
+    # Comments deleted along with their post leave no post to update
+    if not (isinstance(origin, Post) or (isinstance(origin, QuerySet) and origin.model is Post)):
+        changes.record(post=[instance.post_id])
+
+
+@receiver(objects_bulk_saved, sender=Comment)
+def record_bulk_comments(sender, instances, **kwargs):
+    changes.record(comment=[comment.pk for comment in instances], post=[comment.post_id for comment in instances])
+
+
+@receiver(post_save, sender=Category)
+def record_category(sender, instance, **kwargs):
+    changes.record(category=[instance.pk])
+
+
+@receiver(pre_delete, sender=Category)
+def record_deleted_category_posts(sender, instance, **kwargs):
+    # Deleting a category silently drops it from its posts (no m2m_changed is sent)
+    changes.record(post=instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def record_deleted_category(sender, instance, **kwargs):
+    changes.record(category=[instance.pk], deleted=True)
+
+
+# --- Live updates (see blog/live.py) ---
+
+@receiver(post_votes_changed)
+def publish_voted_posts(sender, post_ids, **kwargs):
+    live.publish_votes(post_ids)
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment(sender, instance, created, **kwargs):
+    if created:
+        live.publish_comments([instance])
+
+
+@receiver(objects_bulk_saved, sender=Comment)
+def publish_bulk_comments(sender, instances, created, **kwargs):
+    if created:
+        live.publish_comments(instances)
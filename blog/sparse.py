@@ -0,0 +1,127 @@
+"""
+Sparse fieldsets and content previews for GET responses (lists and details).
+
+- ?fields=id,title: only these fields
+- ?exclude=content,categories: every field but these
+- ?content_preview=<n>: `content` holds only its first n characters
+
+The choice is pushed down into the query: `.only()` loads just the columns of the requested
+fields (plus those the ordering needs), relations left out are not prefetched, and previews
+are cut by the database (`SUBSTR(content, 1, n)`), so unused columns are never read.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.functions import Substr
+from rest_framework import serializers
+
+from .pagination import positive_int
+
+# Annotation holding the truncated content
+PREVIEW_ANNOTATION = 'content_preview'
+
+
+class SparseSerializerMixin:
+    """
+    Serializer side: keeps the fields in context['sparse_fields'] (all when None) and, with
+    context['content_preview'] set, reads `preview_field` from the preview annotation.
+    """
+    preview_field = 'content'
+
+    def get_fields(self):
+        fields = super().get_fields()
+        keep = self.context.get('sparse_fields')
+        if keep is not None:
+            fields = {name: field for name, field in fields.items() if name in keep}
+        if self.context.get('content_preview') and self.preview_field in fields:
+            fields[self.preview_field] = serializers.CharField(source=PREVIEW_ANNOTATION, read_only=True)
+        return fields
+
+
+class SparseFieldsMixin:
+    """
+    View mixin for ?fields= / ?exclude= / ?content_preview= (see module docstring) on GET
+    list/retrieve. The serializer must include SparseSerializerMixin.
+    """
+    fields_query_param = 'fields'
+    exclude_query_param = 'exclude'
+    preview_query_param = 'content_preview'
+    sparse_actions = ('list', 'retrieve')
+
+    def get_sparse_options(self):
+        """
+        Returns (field names to keep or None for all, preview length or None) for this request.
+        """
+        if not hasattr(self, '_sparse_options'):
+            self._sparse_options = self.parse_sparse_options()
+        return self._sparse_options
+
+    def parse_sparse_options(self):
+        request = self.request
+        # Generic views have no `action`: their GET is a list or retrieve
+        if request.method not in ('GET', 'HEAD') or getattr(self, 'action', 'list') not in self.sparse_actions:
+            return None, None
+        params = request.query_params
+        names = list(self.get_serializer_class()().fields)
+
+        keep = None
+        errors = {}
+        for param in (self.fields_query_param, self.exclude_query_param):
+            if param not in params:
+                continue
+            requested = [name.strip() for name in params[param].split(',') if name.strip()]
+            unknown = [name for name in requested if name not in names]
+            if unknown:
+                errors[param] = [f'Unknown field: "{name}".' for name in unknown]
+            elif param == self.fields_query_param:
+                keep = set(requested)
+            else:
+                keep = (set(names) if keep is None else keep) - set(requested)
+
+        preview = None
+        if self.preview_query_param in params:
+            try:
+                preview = positive_int(params[self.preview_query_param])
+            except ValueError:
+                errors[self.preview_query_param] = ['A positive integer is required.']
+        if errors:
+            raise serializers.ValidationError(errors)
+        return keep, preview
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        keep, preview = self.get_sparse_options()
+        context['sparse_fields'] = keep
+        context['content_preview'] = preview
+        return context
+
+    def filter_queryset(self, queryset):
+        return self.sparse_queryset(super().filter_queryset(queryset))
+
+    def sparse_queryset(self, queryset):
+        """
+        Narrows `queryset` to the columns and prefetches the requested fields need.
+        """
+        keep, preview = self.get_sparse_options()
+        if keep is None and preview is None:
+            return queryset
+
+        model = queryset.model
+        serializer = self.get_serializer()
+        sources = {field.source for field in serializer.fields.values()}
+        columns = []
+        for name in [*sources, *(name.lstrip('-') for name in queryset.query.order_by if isinstance(name, str))]:
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue # The preview or another annotation
+            if model_field.concrete and not model_field.many_to_many:
+                columns.append(name)
+        queryset = queryset.only(model._meta.pk.name, *dict.fromkeys(columns))
+
+        lookups = queryset._prefetch_related_lookups
+        kept = [lookup for lookup in lookups if getattr(lookup, 'prefetch_to', lookup).split('__')[0] in sources]
+        if len(kept) != len(lookups):
+            queryset = queryset.prefetch_related(None).prefetch_related(*kept)
+
+        if PREVIEW_ANNOTATION in sources:
+            queryset = queryset.annotate(**{PREVIEW_ANNOTATION: Substr(serializer.preview_field, 1, preview)})
+        return queryset
@@ -0,0 +1,46 @@
+"""
+SQLite connection tuning for the production database profile (see DATABASES in settings).
+
+Every new SQLite connection runs the PRAGMAs in BLOG_SQLITE_PRAGMAS ({name: value}), e.g.:
+
+- journal_mode=WAL: readers and the (single) writer no longer block each other
+- synchronous=NORMAL: with WAL, commits don't wait for fsync (a power loss may drop the
+  last transactions, never corrupts the database)
+- cache_size / mmap_size: page cache per connection, and reads served from a memory map
+- busy_timeout: how long a connection waits for the write lock before "database is locked"
+
+The rest of the profile is plain Django: persistent connections (CONN_MAX_AGE with
+CONN_HEALTH_CHECKS, with BLOG_DB_PROFILE=production under WSGI) so the PRAGMAs run once per
+connection rather than once per request, and
+OPTIONS {"transaction_mode": "IMMEDIATE"} so transactions take the write lock when they begin
+instead of failing to upgrade a read lock halfway through.
+
+Connected in BlogConfig.ready().
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+def get_pragmas():
+    pragmas = getattr(settings, 'BLOG_SQLITE_PRAGMAS', {})
+    for name, value in pragmas.items():
+        # Interpolated into the statement (PRAGMA takes no parameters): names and plain values only
+        if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(str(value)):
+            raise ImproperlyConfigured(f'Invalid SQLite pragma in BLOG_SQLITE_PRAGMAS: {name} = {value!r}')
+    return pragmas
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in get_pragmas().items():
+        # The raw sqlite3 connection: the wrapper's cursor() would re-enter connection setup
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -1,7 +1,104 @@
+import asyncio
+import csv
+import datetime
+import io
+import json
+import math
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework import status
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
-from .models import Post, Comment
+from . import live, replicas
+from .cache import VOTE_LIST_KEY, bump, check_response_cache
+from .counters import AtomicVoteCounter, BufferedVoteCounter, ShardedVoteCounter, VoteBuffer
+from .export import COMMENT_EXPORT_FIELDS
+from .metrics import profiles, registry
+from .models import Category, Change, Post, Comment, PostVoteShard, VoteBufferCheckpoint
+from .registry import category_registry
+from .replicas import sync_sqlite_replica
+from .renderers import FastJSONParser, FastJSONRenderer
+from .serializers import CategorySerializer, CommentSerializer, PostSerializer
+from .sqlite import apply_pragmas
+from .trending import EPOCH
+from .throttling import MemoryThrottleStore, SQLiteThrottleStore, RedisThrottleStore, get_throttle_store
+from .values import ValuesListMixin, ValuesPlan
+
+# Throttle counters stay in memory while testing instead of the shared on-disk store
+throttle_settings = override_settings(BLOG_THROTTLE_STORE='blog.throttling.MemoryThrottleStore', BLOG_THROTTLE_STORE_OPTIONS={})
+# Live events stay in the process
+live_settings = override_settings(BLOG_LIVE_BROKER='blog.live.LocalBroker', BLOG_LIVE_BROKER_OPTIONS={})
+# The shared response cache lives in a temporary directory instead of the project's
+cache_dir = tempfile.TemporaryDirectory()
+cache_settings = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'files': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir.name},
+})
+
+
+def setUpModule():
+    throttle_settings.enable()
+    live_settings.enable()
+    cache_settings.enable()
+
+
+def tearDownModule():
+    cache_settings.disable()
+    live_settings.disable()
+    throttle_settings.disable()
+    cache_dir.cleanup()
+
+
+def clear_caches():
+    """
+    Resets cached responses, throttle history and the category registry.
+    """
+    cache.clear()
+    caches['files'].clear()
+    get_throttle_store().clear()
+    category_registry.clear()
+
+
+class BlogTestMixin:
+    """
+    Starts every test with empty response caches, throttle history and category registry.
+    """
+
+    def setUp(self):
+        super().setUp()
+        clear_caches()
+
+
+class BlogTestCase(BlogTestMixin, APITestCase):
+    pass
+
+
+class BlogTransactionTestCase(BlogTestMixin, TransactionTestCase):
+    pass
+
+
+@override_settings(BLOG_RESPONSE_CACHE=None)
+class UncachedTestCase(BlogTestCase):
+    """
+    BlogTestCase with the response cache off, for tests of what the views compute.
+    """
+
 
 class BlogAPITests(APITestCase):
 
@@ -282,4 +379,2323 @@ class BlogAPITests(APITestCase):
         # Remaining items on page 2 = 16 - 10 = 6
         self.assertEqual(len(response_page2.data['results']), total_expected_posts - page_size)
         self.assertIsNone(response_page2.data['next']) # No next page after page 2
-        self.assertIsNotNone(response_page2.data['previous']) # Should be a link back to page 1
\ No newline at end of file
+        self.assertIsNotNone(response_page2.data['previous']) # Should be a link back to page 1
+
+
+class VoteAPITests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.post = Post.objects.create(title='Vote Post', content='Vote content', author='Voter')
+
+    def test_like_and_dislike(self):
+        """
+        Ensure like/dislike increment the stored counts and report the new value.
+        """
+        like_url = reverse('post-like', kwargs={'pk': self.post.pk})
+        dislike_url = reverse('post-dislike', kwargs={'pk': self.post.pk})
+
+        self.assertEqual(self.client.post(like_url).data, {'status': 'post liked', 'likes': 1})
+        self.assertEqual(self.client.post(like_url).data['likes'], 2)
+        self.assertEqual(self.client.post(dislike_url).data, {'status': 'post disliked', 'dislikes': 1})
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes, self.post.dislikes), (2, 1))
+
+    def test_vote_on_missing_post(self):
+        """
+        Ensure voting on a post that doesn't exist returns 404 and writes nothing.
+        """
+        response = self.client.post(reverse('post-like', kwargs={'pk': self.post.pk + 99}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(BLOG_VOTE_COUNTER='blog.counters.ShardedVoteCounter')
+    def test_sharded_votes_fold_into_post(self):
+        """
+        Ensure sharded votes are reported immediately and folded into Post by `fold_votes`.
+        """
+        like_url = reverse('post-like', kwargs={'pk': self.post.pk})
+        for expected in range(1, 6):
+            self.assertEqual(self.client.post(like_url).data['likes'], expected)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 0) # Still buffered in the shards
+
+        out = io.StringIO()
+        call_command('fold_votes', stdout=out)
+        self.assertEqual(out.getvalue(), 'Folded 5 votes.\n')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 5)
+        self.assertFalse(PostVoteShard.objects.exists())
+
+        response = self.client.post(reverse('post-like', kwargs={'pk': self.post.pk + 99}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(PostVoteShard.objects.exists())
+
+    def buffered(self, **settings):
+        path = tempfile.mkdtemp() + '/votes.sqlite3'
+        return override_settings(**{
+            'BLOG_VOTE_COUNTER': 'blog.counters.BufferedVoteCounter', 'BLOG_VOTE_BUFFER_PATH': path,
+            'BLOG_VOTE_BUFFER_FLUSH_THREAD': False, **settings,
+        })
+
+    def test_buffered_votes_flush_into_post(self):
+        """
+        Ensure buffered votes are acknowledged with approximate counts and flushed by `fold_votes`.
+        """
+        like_url = reverse('post-like', kwargs={'pk': self.post.pk})
+        with self.buffered():
+            for expected in range(1, 4):
+                self.assertEqual(self.client.post(like_url).data['likes'], expected)
+            self.client.post(reverse('post-dislike', kwargs={'pk': self.post.pk}))
+            response = self.client.post(reverse('post-like', kwargs={'pk': self.post.pk + 99}))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+            self.post.refresh_from_db()
+            self.assertEqual((self.post.likes, self.post.dislikes), (0, 0)) # Still buffered
+            self.assertEqual(self.client.get(reverse('post-detail', kwargs={'pk': self.post.pk})).data['likes'], 0)
+
+            out = io.StringIO()
+            call_command('fold_votes', '--batch-size', '2', stdout=out)
+            self.assertEqual(out.getvalue(), 'Folded 4 votes.\n')
+            self.post.refresh_from_db()
+            self.assertEqual((self.post.likes, self.post.dislikes), (3, 1))
+            self.assertEqual(self.client.get(reverse('post-detail', kwargs={'pk': self.post.pk})).data['likes'], 3)
+            self.assertEqual(self.client.post(like_url).data['likes'], 4)
+
+    def test_buffered_votes_survive_interrupted_flushes(self):
+        """
+        Ensure votes are counted exactly once when a flush stops before or after updating Post.
+        """
+        with self.buffered():
+            counter = BufferedVoteCounter()
+            for _ in range(5):
+                counter.increment(self.post.pk, 'likes')
+
+            # Crashes before its transaction commits: nothing counted, nothing lost
+            with mock.patch('blog.counters.add_votes', side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError):
+                    counter.fold()
+            self.post.refresh_from_db()
+            self.assertEqual(self.post.likes, 0)
+
+            # Crashes after committing, before discarding the batch from the buffer
+            with mock.patch.object(VoteBuffer, 'discard', side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError):
+                    counter.fold()
+            self.assertEqual(counter.buffer.pending(self.post.pk, 'likes'), 5)
+
+            counter.increment(self.post.pk, 'likes')
+            self.assertEqual(counter.fold(), 1)
+            self.post.refresh_from_db()
+            self.assertEqual(self.post.likes, 6)
+            self.assertEqual(counter.buffer.pending(self.post.pk, 'likes'), 0)
+            self.assertEqual(VoteBufferCheckpoint.objects.get(buffer=counter.buffer.id).sequence, 6)
+
+    def test_buffered_votes_staleness_bound(self):
+        """
+        Ensure a vote finding buffered votes older than BLOG_VOTE_BUFFER_MAX_DELAY flushes them.
+        """
+        with self.buffered(BLOG_VOTE_BUFFER_MAX_DELAY=60):
+            counter = BufferedVoteCounter()
+            counter.increment(self.post.pk, 'likes')
+            with mock.patch('blog.counters.time.time', return_value=time.time() + 61):
+                counter.increment(self.post.pk, 'likes')
+            self.post.refresh_from_db()
+            self.assertEqual(self.post.likes, 2)
+
+
+class VoteConcurrencyTests(TransactionTestCase):
+    """
+    Fires thousands of votes from parallel threads (each with its own DB connection)
+    and checks that no vote is lost.
+    """
+    threads = 8
+    votes_per_thread = 250
+
+    def vote_in_parallel(self, counter, post):
+        errors = []
+
+        def worker(field):
+            try:
+                for _ in range(self.votes_per_thread):
+                    counter.increment(post.pk, field)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        fields = ['likes', 'dislikes'] * (self.threads // 2)
+        workers = [threading.Thread(target=worker, args=(field,)) for field in fields]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_atomic_counter_loses_no_votes(self):
+        post = Post.objects.create(title='Hot Post', content='...', author='Author')
+        self.vote_in_parallel(AtomicVoteCounter(), post)
+
+        post.refresh_from_db()
+        expected = self.threads // 2 * self.votes_per_thread
+        self.assertEqual((post.likes, post.dislikes), (expected, expected))
+
+    def test_sharded_counter_loses_no_votes(self):
+        post = Post.objects.create(title='Hot Post', content='...', author='Author')
+        counter = ShardedVoteCounter(shards=4)
+        self.vote_in_parallel(counter, post)
+
+        self.assertEqual(counter.fold(batch_size=3), self.threads * self.votes_per_thread)
+        post.refresh_from_db()
+        expected = self.threads // 2 * self.votes_per_thread
+        self.assertEqual((post.likes, post.dislikes), (expected, expected))
+
+    def test_buffered_counter_loses_no_votes(self):
+        post = Post.objects.create(title='Hot Post', content='...', author='Author')
+        buffer = VoteBuffer(tempfile.mkdtemp() + '/votes.sqlite3')
+        counter = BufferedVoteCounter(buffer=buffer, max_delay=60, flush_thread=False)
+        # A concurrent flusher, as the background thread would be
+        stop = threading.Event()
+
+        def flush():
+            try:
+                while not stop.is_set():
+                    counter.fold(batch_size=50)
+            finally:
+                connections.close_all()
+
+        flusher = threading.Thread(target=flush)
+        flusher.start()
+        try:
+            self.vote_in_parallel(counter, post)
+        finally:
+            stop.set()
+            flusher.join()
+
+        counter.fold()
+        post.refresh_from_db()
+        expected = self.threads // 2 * self.votes_per_thread
+        self.assertEqual((post.likes, post.dislikes), (expected, expected))
+
+
+class KeysetPaginationTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.posts = [
+            Post.objects.create(title=f'Feed Post {i}', content='...', author='Feeder', likes=i % 3)
+            for i in range(11)
+        ]
+        # Give several posts the same timestamp so the id tie-breaker matters
+        Post.objects.filter(pk__in=[p.pk for p in self.posts[3:7]]).update(created_at=self.posts[3].created_at)
+
+    def walk(self, url, link='next'):
+        """
+        Follows 'next' (or 'previous') links from url and returns the ids of every page.
+        """
+        pages = []
+        while url:
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([item['id'] for item in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def test_cursor_pages_cover_feed_in_order(self):
+        """
+        Ensure keyset pages return every post exactly once in (-created_at, -id) order.
+        """
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        pages = self.walk(reverse('post-list') + '?pagination=cursor&page_size=3')
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 2])
+        self.assertEqual([pk for page in pages for pk in page], expected)
+
+    def test_previous_links_walk_back(self):
+        """
+        Ensure 'previous' links lead back through the same pages.
+        """
+        forward = self.walk(reverse('post-list') + '?pagination=cursor&page_size=4')
+        response = self.client.get(reverse('post-list') + '?pagination=cursor&page_size=4', format='json')
+        last_url = self.client.get(response.data['next'], format='json').data['next']
+
+        backward = self.walk(last_url, link='previous')
+        self.assertEqual(backward, forward[::-1])
+
+    def test_cursor_follows_ordering_param(self):
+        """
+        Ensure keyset pages honour ?ordering= with the id as tie-breaker.
+        """
+        expected = list(Post.objects.order_by('likes', 'id').values_list('id', flat=True))
+        pages = self.walk(reverse('post-list') + '?pagination=cursor&page_size=5&ordering=likes')
+        self.assertEqual([pk for page in pages for pk in page], expected)
+
+    def test_page_size_cap_and_count_option(self):
+        """
+        Ensure page_size is capped and ?count=false skips the total.
+        """
+        response = self.client.get(reverse('post-list') + '?pagination=cursor&page_size=1000', format='json')
+        self.assertEqual(response.data['count'], 11)
+        self.assertEqual(len(response.data['results']), 11)
+        self.assertIsNone(response.data['next'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('post-list') + '?pagination=cursor&count=false', format='json')
+        self.assertIsNone(response.data['count'])
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+        response = self.client.get(reverse('post-list') + '?page_size=5', format='json')
+        self.assertEqual(len(response.data['results']), 5) # Page-number mode accepts page_size too
+
+    def test_invalid_cursor(self):
+        """
+        Ensure a malformed cursor returns 404.
+        """
+        response = self.client.get(reverse('post-list') + '?cursor=not-a-cursor', format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_comment_cursor_pages(self):
+        """
+        Ensure comment lists support keyset pages.
+        """
+        post = self.posts[0]
+        comments = [Comment.objects.create(post=post, content=f'Comment {i}', author='A') for i in range(5)]
+        url = reverse('comment-list-create', kwargs={'post_pk': post.pk}) + '?pagination=cursor&page_size=2'
+        pages = self.walk(url)
+        self.assertEqual([pk for page in pages for pk in page], [c.pk for c in reversed(comments)])
+
+
+class SearchTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.django = Post.objects.create(title='Django tips', content='Querysets are lazy.', author='A')
+        self.orm = Post.objects.create(title='ORM notes', content='Django querysets and django models.', author='B')
+        self.other = Post.objects.create(title='Gardening', content='Tomatoes need sun.', author='C')
+
+    def search(self, terms, **params):
+        response = self.client.get(reverse('post-list'), {'search': terms, **params}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_ranked_matches(self):
+        """
+        Ensure matches come from the FTS index, title hits ranked first, and all terms are required.
+        """
+        self.assertEqual(self.search('django'), [self.django.pk, self.orm.pk])
+        self.assertEqual(self.search('django models'), [self.orm.pk])
+        self.assertEqual(self.search('tomato'), [self.other.pk]) # Prefix match
+        self.assertEqual(self.search('"unbalanced OR *'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        """
+        Ensure the FTS index is kept in sync by the triggers.
+        """
+        self.other.title = 'Django gardening'
+        self.other.save()
+        self.assertIn(self.other.pk, self.search('django'))
+
+        self.django.delete()
+        self.assertEqual(set(self.search('django')), {self.orm.pk, self.other.pk})
+
+    def test_search_with_cursor_pages(self):
+        """
+        Ensure ranked results can be walked with keyset pagination.
+        """
+        for i in range(5):
+            Post.objects.create(title=f'Django {i}', content='...', author='D')
+        first = self.client.get(reverse('post-list'), {'search': 'django', 'pagination': 'cursor', 'page_size': 3})
+        second = self.client.get(first.data['next'])
+        ids = [item['id'] for item in first.data['results'] + second.data['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(first.data['count'], 7)
+        self.assertEqual(len(ids), 6)
+
+    @override_settings(BLOG_SEARCH_BACKEND='blog.search.IcontainsSearchBackend')
+    def test_icontains_fallback(self):
+        """
+        Ensure the unindexed backend keeps DRF's substring matching.
+        """
+        self.assertEqual(set(self.search('uerys')), {self.django.pk, self.orm.pk})
+
+
+class QueryCountTests(BlogTestCase):
+    """
+    Guards against N+1 queries coming back on the post endpoints.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.categories = [Category.objects.create(name=f'Category {i}') for i in range(5)]
+        for i in range(12):
+            post = Post.objects.create(title=f'Post {i}', content='...', author='Author')
+            post.categories.set(self.categories[:i % 4])
+
+    def test_list_queries_constant_per_page(self):
+        """
+        Ensure listing posts costs the same number of queries whatever the page size:
+        COUNT(*), the page, and one prefetch of the categories.
+        """
+        for page_size in (2, 12):
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse('post-list'), {'page_size': page_size}, format='json')
+            self.assertEqual(len(response.data['results']), page_size)
+
+        with self.assertNumQueries(2): # Keyset page without count: page + prefetch
+            self.client.get(reverse('post-list'), {'pagination': 'cursor', 'count': 'false'}, format='json')
+
+    def test_detail_queries(self):
+        """
+        Ensure retrieving a post costs the row plus one categories query.
+        """
+        post = Post.objects.filter(categories__isnull=False).first()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('post-detail', kwargs={'pk': post.pk}), format='json')
+        self.assertEqual(len(response.data['categories']), post.categories.count())
+
+    def test_category_ids_validated_in_bulk(self):
+        """
+        Ensure submitted category IDs are checked with at most one query, and unknown IDs are rejected.
+        """
+        data = {
+            'title': 'Bulk', 'content': '...', 'author': 'Author',
+            'categories': [c.pk for c in self.categories],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('post-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(response.data['categories']), sorted(c.pk for c in self.categories))
+        # No lookup by ID: the IDs are checked against the category registry, loaded once
+        id_lookups = [q for q in queries.captured_queries if 'FROM "blog_category" WHERE' in q['sql']]
+        self.assertEqual(id_lookups, [])
+        loads = [q for q in queries.captured_queries if q['sql'].startswith('SELECT') and q['sql'].endswith('FROM "blog_category" ORDER BY "blog_category"."name" ASC')]
+        self.assertEqual(len(loads), 1)
+
+        data['categories'] = [self.categories[0].pk, 9999]
+        response = self.client.post(reverse('post-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('9999', str(response.data['categories']))
+
+        data['categories'] = ['abc']
+        response = self.client.post(reverse('post-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class NestedCommentQueryTests(BlogTestCase):
+    """
+    Guards the nested comment endpoints against fetching the parent post.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.post = Post.objects.create(title='Parent', content='x' * 10000, author='Author')
+        self.comment = Comment.objects.create(post=self.post, content='Hi', author='A')
+        self.empty = Post.objects.create(title='Empty', content='...', author='Author')
+        self.missing = self.empty.pk + 100
+
+    def test_comment_reads(self):
+        """
+        Ensure reads cost only the comment queries, with no query on blog_post.
+        """
+        list_url = reverse('comment-list-create', kwargs={'post_pk': self.post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(list_url, format='json')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(queries), 2) # COUNT(*) and the page
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "blog_post"' in q['sql']])
+
+        with self.assertNumQueries(1): # Keyset page without count
+            self.client.get(list_url, {'pagination': 'cursor', 'count': 'false'}, format='json')
+
+        detail_url = reverse('comment-detail', kwargs={'post_pk': self.post.pk, 'comment_pk': self.comment.pk})
+        with self.assertNumQueries(1):
+            response = self.client.get(detail_url, format='json')
+        self.assertEqual(response.data['content'], 'Hi')
+
+    def test_comment_writes(self):
+        """
+        Ensure creating a comment checks the post with an EXISTS instead of loading it.
+        """
+        url = reverse('comment-list-create', kwargs={'post_pk': self.post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'content': 'New', 'author': 'A'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post_reads = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'FROM "blog_post"' in q['sql']]
+        self.assertEqual(len(post_reads), 1)
+        self.assertNotIn('"content"', post_reads[0])
+
+    def test_missing_post_404s(self):
+        """
+        Ensure a missing post still answers 404 with its own message, while an empty post lists fine.
+        """
+        message = f'Post with ID {self.missing} not found.'
+        list_url = reverse('comment-list-create', kwargs={'post_pk': self.missing})
+        self.assertEqual(self.client.get(list_url, format='json').data['detail'], message)
+        self.assertEqual(self.client.post(list_url, {'content': 'New', 'author': 'A'}, format='json').data['detail'], message)
+        detail_url = reverse('comment-detail', kwargs={'post_pk': self.missing, 'comment_pk': self.comment.pk})
+        self.assertEqual(self.client.get(detail_url, format='json').data['detail'], message)
+        self.assertEqual(self.client.delete(detail_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Comment.objects.filter(pk=self.comment.pk).exists())
+
+        # Existing post, but the comment belongs to another post
+        wrong_url = reverse('comment-detail', kwargs={'post_pk': self.empty.pk, 'comment_pk': self.comment.pk})
+        response = self.client.get(wrong_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotEqual(response.data['detail'], f'Post with ID {self.empty.pk} not found.')
+
+        response = self.client.get(reverse('comment-list-create', kwargs={'post_pk': self.empty.pk}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [])
+
+
+class ResponseCacheTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Cached')
+        self.post = Post.objects.create(title='Cached Post', content='...', author='Cacher')
+        self.post.categories.add(self.category)
+        self.list_url = reverse('post-list')
+        self.detail_url = reverse('post-detail', kwargs={'pk': self.post.pk})
+
+    def assertCached(self, url, params=None):
+        self.client.get(url, params, format='json')
+        with self.assertNumQueries(0):
+            response = self.client.get(url, params, format='json')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        return response
+
+    def test_reads_are_cached_per_query(self):
+        """
+        Ensure repeated reads are served from the cache, keyed by every query parameter.
+        """
+        self.assertCached(self.list_url)
+        self.assertCached(self.list_url, {'search': 'cached'})
+        self.assertCached(self.detail_url)
+        self.assertCached(reverse('category-list'))
+        self.assertCached(reverse('comment-list-create', kwargs={'post_pk': self.post.pk}))
+
+        response = self.client.get(self.list_url, {'search': 'nothing'}, format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_writes_invalidate(self):
+        """
+        Ensure model writes and votes invalidate exactly the responses that depend on them.
+        """
+        other = Post.objects.create(title='Other', content='...', author='Other')
+        other_url = reverse('post-detail', kwargs={'pk': other.pk})
+        comments_url = reverse('comment-list-create', kwargs={'post_pk': self.post.pk})
+        for url in (self.list_url, self.detail_url, other_url, comments_url):
+            self.client.get(url, format='json')
+
+        self.client.post(reverse('post-like', kwargs={'pk': self.post.pk}))
+        self.assertEqual(self.client.get(self.detail_url, format='json').data['likes'], 1)
+        self.assertEqual(self.client.get(self.list_url, format='json')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(other_url, format='json')['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(comments_url, format='json')['X-Cache'], 'HIT')
+
+        # Within BLOG_VOTE_LIST_INTERVAL, further votes leave the lists cached
+        self.client.post(reverse('post-like', kwargs={'pk': self.post.pk}))
+        self.assertEqual(self.client.get(self.detail_url, format='json').data['likes'], 2)
+        self.assertEqual(self.client.get(self.list_url, format='json')['X-Cache'], 'HIT')
+        caches['files'].delete(VOTE_LIST_KEY) # The interval has passed
+        self.client.post(reverse('post-like', kwargs={'pk': self.post.pk}))
+        results = self.client.get(self.list_url, format='json').data['results']
+        self.assertEqual({post['id']: post['likes'] for post in results}[self.post.pk], 3)
+
+        self.client.post(comments_url, {'content': 'New', 'author': 'A'}, format='json')
+        self.assertEqual(self.client.get(comments_url, format='json').data['count'], 1)
+
+        self.category.delete()
+        self.assertEqual(self.client.get(self.detail_url, format='json').data['categories'], [])
+
+        Category.objects.create(name='Fresh')
+        self.assertEqual(self.client.get(reverse('category-list'), format='json').data['count'], 1)
+
+    def test_conditional_requests(self):
+        """
+        Ensure post details carry ETag/Last-Modified and unchanged posts answer 304.
+        """
+        response = self.client.get(self.detail_url, format='json')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(self.detail_url, format='json', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(self.detail_url, {'title': 'Edited'}, format='json')
+        response = self.client.get(self.detail_url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Edited')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_file_based_backend(self):
+        """
+        Ensure the file-based cache backend works as the response cache.
+        """
+        with self.settings(BLOG_RESPONSE_CACHE='files'):
+            self.assertCached(self.list_url)
+            Post.objects.create(title='Another', content='...', author='Cacher')
+            self.assertEqual(self.client.get(self.list_url, format='json').data['count'], 2)
+
+    def test_per_process_cache_warns(self):
+        """
+        Ensure a response cache that other workers can't see is reported by the system checks.
+        """
+        with self.settings(BLOG_RESPONSE_CACHE='default'):
+            self.assertEqual([error.id for error in check_response_cache(None)], ['blog.W001'])
+        with self.settings(BLOG_RESPONSE_CACHE='files'):
+            self.assertEqual(check_response_cache(None), [])
+
+
+class BulkWriteTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.categories = [Category.objects.create(name=f'Bulk {i}') for i in range(3)]
+        self.url = reverse('post-bulk')
+
+    def test_bulk_create_posts(self):
+        """
+        Ensure a batch of posts (with categories) is created with a constant number of queries.
+        """
+        data = [
+            {'title': f'Bulk {i}', 'content': '...', 'author': 'Loader', 'categories': [c.pk for c in self.categories[:i % 3]]}
+            for i in range(50)
+        ]
+        # Category lookup, savepoint, post insert, M2M insert, post_count refresh, trending
+        # scores, change feed entries, release, re-read of posts + categories
+        with self.assertNumQueries(10):
+            response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(len(response.data['created']), 50)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(response.data['created'][2]['categories'], [c.pk for c in self.categories[:2]])
+        self.assertEqual(set(Post.objects.get(title='Bulk 2').categories.all()), set(self.categories[:2]))
+
+    def test_per_item_errors(self):
+        """
+        Ensure invalid items are reported by index while valid ones are saved,
+        and that ?atomic=true saves nothing when any item is invalid.
+        """
+        data = [
+            {'title': 'Good', 'content': '...', 'author': 'Loader'},
+            {'title': 'No content', 'author': 'Loader'},
+            {'title': 'Bad category', 'content': '...', 'author': 'Loader', 'categories': [9999]},
+        ]
+        response = self.client.post(self.url + '?atomic=true', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertFalse(Post.objects.exists())
+
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([post['title'] for post in response.data['created']], ['Good'])
+        self.assertIn('content', response.data['errors'][0]['errors'])
+        self.assertEqual(Post.objects.count(), 1)
+
+        response = self.client.post(self.url, {'title': 'Not a list'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_and_delete_posts(self):
+        """
+        Ensure posts can be updated and deleted in batches.
+        """
+        posts = [Post.objects.create(title=f'Old {i}', content='...', author='Loader') for i in range(3)]
+        posts[0].categories.add(self.categories[0])
+        data = [
+            {'id': posts[0].pk, 'title': 'New 0', 'categories': [self.categories[1].pk]},
+            {'id': posts[1].pk, 'content': 'Changed'},
+            {'id': 9999, 'title': 'Missing'},
+        ]
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['errors'][0]['index'], 2)
+        posts[0].refresh_from_db()
+        self.assertEqual(posts[0].title, 'New 0')
+        self.assertEqual(list(posts[0].categories.all()), [self.categories[1]])
+        self.assertGreater(posts[0].updated_at, posts[0].created_at)
+        self.assertEqual(Post.objects.get(pk=posts[1].pk).content, 'Changed')
+
+        response = self.client.delete(self.url, {'ids': [posts[0].pk, posts[1].pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], sorted([posts[0].pk, posts[1].pk]))
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)), [posts[2].pk])
+
+    def test_bulk_comments(self):
+        """
+        Ensure comments can be created and deleted in batches on one post only.
+        """
+        post = Post.objects.create(title='Commented', content='...', author='Loader')
+        other = Post.objects.create(title='Other', content='...', author='Loader')
+        other_comment = Comment.objects.create(post=other, content='Keep', author='A')
+        url = reverse('comment-bulk', kwargs={'post_pk': post.pk})
+
+        response = self.client.post(url, [{'content': f'C{i}', 'author': 'A'} for i in range(20)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(post.comments.count(), 20)
+        self.assertTrue(all(item['post'] == post.pk for item in response.data['created']))
+
+        # Listing reflects the batch (response cache invalidated)
+        list_url = reverse('comment-list-create', kwargs={'post_pk': post.pk})
+        self.assertEqual(self.client.get(list_url, format='json').data['count'], 20)
+
+        ids = list(post.comments.values_list('pk', flat=True)[:5]) + [other_comment.pk]
+        response = self.client.delete(url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(post.comments.count(), 15)
+        self.assertTrue(Comment.objects.filter(pk=other_comment.pk).exists())
+
+        missing = reverse('comment-bulk', kwargs={'post_pk': other.pk + 99})
+        self.assertEqual(self.client.post(missing, [], format='json').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ExportTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.news = Category.objects.create(name='News')
+        self.posts = [
+            Post.objects.create(title=f'Export {i}', content='Line one\nline, "two"', author='alice' if i % 2 else 'bob')
+            for i in range(5)
+        ]
+        self.posts[1].categories.add(self.news)
+        Comment.objects.create(post=self.posts[1], content='First', author='C')
+        Comment.objects.create(post=self.posts[1], content='Second', author='C')
+        Comment.objects.create(post=self.posts[2], content='Other', author='C')
+
+    def read_ndjson(self, response):
+        self.assertTrue(response.streaming)
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_ndjson_export_with_filters(self):
+        """
+        Ensure posts stream as NDJSON with categories and comment counts, honouring the list filters.
+        """
+        url = reverse('post-export')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = self.read_ndjson(response)
+        # Unpaginated, newest first like the list endpoint
+        self.assertEqual([row['id'] for row in rows], [post.pk for post in reversed(self.posts)])
+        row = next(row for row in rows if row['id'] == self.posts[1].pk)
+        self.assertEqual(row['categories'], [self.news.pk])
+        self.assertEqual(row['category_names'], ['News'])
+        self.assertEqual(row['comment_count'], 2)
+        self.assertEqual(row['content'], 'Line one\nline, "two"')
+
+        rows = self.read_ndjson(self.client.get(url, {'author': 'alice', 'categories': self.news.pk}))
+        self.assertEqual([row['id'] for row in rows], [self.posts[1].pk])
+        rows = self.read_ndjson(self.client.get(url, {'search': 'export', 'ordering': 'created_at'}))
+        self.assertEqual(len(rows), 5)
+
+    def test_csv_export_and_comments(self):
+        """
+        Ensure the CSV format and the comment export (limited to the filtered posts) work.
+        """
+        response = self.client.get(reverse('post-export'), {'format': 'csv', 'author': 'alice'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([int(row['id']) for row in rows], [self.posts[3].pk, self.posts[1].pk])
+        self.assertEqual(rows[1]['content'], 'Line one\nline, "two"')
+        self.assertEqual(rows[1]['categories'], str(self.news.pk))
+
+        rows = self.read_ndjson(self.client.get(reverse('post-export-comments'), {'author': 'alice'}))
+        self.assertEqual([row['content'] for row in rows], ['First', 'Second'])
+
+    def test_export_command(self):
+        """
+        Ensure `manage.py export_blog` writes the same rows to a file, in chunks.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/posts.ndjson'
+            call_command('export_blog', 'posts', '--author', 'bob', '--chunk-size', '2', '--output', path)
+            with open(path, encoding='utf-8') as output:
+                rows = [json.loads(line) for line in output]
+        self.assertEqual([row['id'] for row in rows], [self.posts[4].pk, self.posts[2].pk, self.posts[0].pk])
+        self.assertEqual(rows[1]['comment_count'], 1)
+
+        out = io.StringIO()
+        call_command('export_blog', 'comments', '--format', 'csv', stdout=out)
+        self.assertEqual(out.getvalue().splitlines()[0], ','.join(COMMENT_EXPORT_FIELDS))
+
+
+class DenormalizedCountTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.news, self.tech = Category.objects.create(name='News'), Category.objects.create(name='Tech')
+        self.post = Post.objects.create(title='Counted', content='...', author='Counter')
+
+    def assertCounts(self, comment_count=None, news=None, tech=None):
+        if comment_count is not None:
+            self.assertEqual(Post.objects.get(pk=self.post.pk).comment_count, comment_count)
+        if news is not None:
+            self.assertEqual(Category.objects.get(pk=self.news.pk).post_count, news)
+        if tech is not None:
+            self.assertEqual(Category.objects.get(pk=self.tech.pk).post_count, tech)
+
+    def test_comment_count(self):
+        """
+        Ensure comment_count follows single and bulk comment writes and is exposed and orderable.
+        """
+        list_url = reverse('comment-list-create', kwargs={'post_pk': self.post.pk})
+        for i in range(3):
+            self.client.post(list_url, {'content': f'C{i}', 'author': 'A'}, format='json')
+        self.assertCounts(comment_count=3)
+        # The cached detail response reflects the new count
+        detail_url = reverse('post-detail', kwargs={'pk': self.post.pk})
+        self.assertEqual(self.client.get(detail_url, format='json').data['comment_count'], 3)
+
+        comment = self.post.comments.first()
+        self.client.delete(reverse('comment-detail', kwargs={'post_pk': self.post.pk, 'comment_pk': comment.pk}))
+        self.assertCounts(comment_count=2)
+
+        bulk_url = reverse('comment-bulk', kwargs={'post_pk': self.post.pk})
+        self.client.post(bulk_url, [{'content': f'B{i}', 'author': 'A'} for i in range(5)], format='json')
+        self.assertCounts(comment_count=7)
+        ids = list(self.post.comments.values_list('pk', flat=True)[:4])
+        self.client.delete(bulk_url, {'ids': ids}, format='json')
+        self.assertCounts(comment_count=3)
+        self.assertEqual(self.client.get(detail_url, format='json').data['comment_count'], 3)
+
+        quiet = Post.objects.create(title='Quiet', content='...', author='Counter')
+        response = self.client.get(reverse('post-list'), {'ordering': '-comment_count'}, format='json')
+        self.assertEqual([post['id'] for post in response.data['results']], [self.post.pk, quiet.pk])
+
+        # A stale instance saved later doesn't write its old count back
+        stale = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(post=self.post, content='Late', author='A')
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertCounts(comment_count=4)
+
+        # Editing a counter on the instance is refused rather than silently dropped
+        stale.refresh_from_db()
+        stale.likes = 42
+        with self.assertRaisesMessage(ValueError, 'likes of Post'):
+            stale.save()
+        stale.save(update_fields=['likes'])
+        self.assertEqual(Post.objects.get(pk=stale.pk).likes, 42)
+
+        # Deleting the post with its comments goes through cleanly
+        self.post.delete()
+        self.assertFalse(Comment.objects.exists())
+
+    def test_post_count(self):
+        """
+        Ensure post_count follows every way a post can join or leave a category.
+        """
+        response = self.client.post(
+            reverse('post-list'),
+            {'title': 'New', 'content': '...', 'author': 'A', 'categories': [self.news.pk, self.tech.pk]},
+            format='json',
+        )
+        new = Post.objects.get(pk=response.data['id'])
+        self.assertCounts(news=1, tech=1)
+
+        self.post.categories.add(self.news)
+        self.assertCounts(news=2, tech=1)
+        self.client.patch(reverse('post-detail', kwargs={'pk': new.pk}), {'categories': [self.tech.pk]}, format='json')
+        self.assertCounts(news=1, tech=1)
+        self.post.categories.clear()
+        self.assertCounts(news=0, tech=1)
+        self.tech.posts.add(self.post)
+        self.assertCounts(news=0, tech=2)
+        self.tech.posts.clear()
+        self.assertCounts(news=0, tech=0)
+
+        bulk_url = reverse('post-bulk')
+        response = self.client.post(
+            bulk_url, [{'title': f'B{i}', 'content': '...', 'author': 'A', 'categories': [self.news.pk]} for i in range(3)],
+            format='json',
+        )
+        self.assertCounts(news=3, tech=0)
+        bulk_ids = [post['id'] for post in response.data['created']]
+        self.client.patch(bulk_url, [{'id': bulk_ids[0], 'categories': [self.tech.pk]}], format='json')
+        self.assertCounts(news=2, tech=1)
+        self.client.delete(bulk_url, {'ids': bulk_ids[1:]}, format='json')
+        self.assertCounts(news=0, tech=1)
+
+        response = self.client.get(reverse('category-list'), {'ordering': '-post_count'}, format='json')
+        self.assertEqual([(c['name'], c['post_count']) for c in response.data['results']], [('Tech', 1), ('News', 0)])
+
+    def test_repair_command(self):
+        """
+        Ensure `manage.py repair_counts` fixes drifted counts and reports them.
+        """
+        self.post.categories.add(self.news)
+        Comment.objects.create(post=self.post, content='Only', author='A')
+        Post.objects.update(comment_count=42)
+        Category.objects.update(post_count=7)
+
+        out = io.StringIO()
+        call_command('repair_counts', '--batch-size', '1', stdout=out)
+        self.assertIn('comment_count on 1 posts and post_count on 2 categories', out.getvalue())
+        self.assertCounts(comment_count=1, news=1, tech=0)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite-specific')
+class QueryPlanTests(BlogTestCase):
+    """
+    Checks that each list endpoint's main query is read straight off an index (no full table
+    scan, no temporary B-tree for ORDER BY) on a dataset large enough for the planner to care.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [f'author{i}' for i in range(20)]
+        Post.objects.bulk_create([
+            Post(title=f'Post {i}', content='...', author=authors[i % 20], likes=i % 97, dislikes=i % 13)
+            for i in range(3000)
+        ])
+        cls.post = Post.objects.order_by('pk').first()
+        Comment.objects.bulk_create([
+            Comment(post_id=cls.post.pk + i % 30, content='...', author='C') for i in range(3000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertIndexed(self, url, index, params=None):
+        clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The page query is the last one with a LIMIT (the others are COUNT(*) and prefetches)
+        sql = [query['sql'] for query in queries if 'LIMIT' in query['sql']][-1]
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = [row[3] for row in cursor.fetchall()]
+        self.assertIn(f'USING INDEX {index}', ' | '.join(plan), plan)
+        self.assertFalse([step for step in plan if 'TEMP B-TREE' in step], plan)
+
+    def test_post_list_orderings(self):
+        url = reverse('post-list')
+        for ordering, index in [
+            (None, 'blog_post_created_idx'),
+            ('created_at', 'blog_post_created_idx'),
+            ('-updated_at', 'blog_post_updated_idx'),
+            ('-likes', 'blog_post_likes_idx'),
+            ('dislikes', 'blog_post_dislikes_idx'),
+            ('-comment_count', 'blog_post_comments_idx'),
+        ]:
+            params = {'ordering': ordering} if ordering else {}
+            with self.subTest(ordering=ordering):
+                self.assertIndexed(url, index, params)
+                self.assertIndexed(url, index, {**params, 'pagination': 'cursor'})
+
+    def test_post_list_by_author(self):
+        url = reverse('post-list')
+        self.assertIndexed(url, 'blog_post_author_created_idx', {'author': 'author7'})
+        self.assertIndexed(url, 'blog_post_author_created_idx', {'author': 'author7', 'pagination': 'cursor'})
+
+    def test_trending(self):
+        url = reverse('post-trending')
+        self.assertIndexed(url, 'blog_post_trending_idx')
+        self.assertIndexed(url, 'blog_post_trending_idx', {'count': 'false', 'include': 'categories'})
+
+    def test_comment_list(self):
+        url = reverse('comment-list-create', kwargs={'post_pk': self.post.pk})
+        self.assertIndexed(url, 'blog_comment_post_created_idx')
+        self.assertIndexed(url, 'blog_comment_post_created_idx', {'pagination': 'cursor'})
+
+
+class SQLiteProfileTests(APITestCase):
+    """
+    The production SQLite profile (see blog/sqlite.py).
+    """
+
+    def pragma(self, name):
+        return connection.connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+    def test_pragmas_applied_to_connections(self):
+        self.assertEqual(connection.settings_dict['OPTIONS'].get('transaction_mode'), 'IMMEDIATE')
+        # synchronous=NORMAL (1), temp_store=MEMORY (2)
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('cache_size'), -64000)
+        self.assertEqual(self.pragma('busy_timeout'), 10000)
+
+        self.addCleanup(connection.connection.execute, 'PRAGMA busy_timeout = 10000')
+        with override_settings(BLOG_SQLITE_PRAGMAS={'busy_timeout': 1234}):
+            apply_pragmas(sender=None, connection=connection)
+            self.assertEqual(self.pragma('busy_timeout'), 1234)
+        with override_settings(BLOG_SQLITE_PRAGMAS={'busy_timeout': '1; DROP TABLE blog_post'}):
+            with self.assertRaises(ImproperlyConfigured):
+                apply_pragmas(sender=None, connection=connection)
+
+
+@override_settings(REST_FRAMEWORK={
+    'DEFAULT_THROTTLE_RATES': {'read': '3/min', 'write': '2/min', 'vote': '2/min'},
+})
+class ThrottleTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.post = Post.objects.create(title='Throttled', content='...', author='Author')
+
+    def test_scopes_have_separate_budgets(self):
+        """
+        Ensure reads, writes and votes are limited independently, with a Retry-After on 429s.
+        """
+        list_url = reverse('post-list')
+        for _ in range(3):
+            self.assertEqual(self.client.get(list_url, format='json').status_code, status.HTTP_200_OK)
+        response = self.client.get(list_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+        like_url = reverse('post-like', kwargs={'pk': self.post.pk})
+        codes = [self.client.post(like_url).status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+
+        data = {'title': 'New', 'content': '...', 'author': 'Author'}
+        codes = [self.client.post(list_url, data, format='json').status_code for _ in range(3)]
+        self.assertEqual(codes, [201, 201, 429])
+
+    def test_fixed_window_algorithm(self):
+        """
+        Ensure the fixed-window counter enforces the same limits.
+        """
+        url = reverse('post-detail', kwargs={'pk': self.post.pk})
+        with override_settings(BLOG_THROTTLE_ALGORITHM='fixed'):
+            codes = [self.client.get(url, format='json').status_code for _ in range(4)]
+        self.assertEqual(codes, [200, 200, 200, 429])
+
+    def test_store_contract(self):
+        """
+        Ensure every store implements counters and GCRA steps the same way, and that the
+        SQLite store is shared by separate instances (i.e. worker processes) on one file.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/throttle.sqlite3'
+            stores = [MemoryThrottleStore(), SQLiteThrottleStore(path)]
+            try:
+                import fakeredis # noqa: F401 (optional Redis stand-in)
+                stores.append(RedisThrottleStore(client_class='fakeredis.FakeRedis'))
+            except ImportError:
+                pass
+
+            now = time.time()
+            for store in stores:
+                with self.subTest(store=type(store).__name__):
+                    store.clear()
+                    self.assertEqual([store.incr('k', now + 60) for _ in range(3)], [1, 2, 3])
+                    self.assertEqual(store.incr('expired', now - 1), 1)
+                    self.assertEqual(store.incr('expired', now + 60), 1) # Expired counter restarts
+
+                    # 2 requests per 10s: a burst of 2, then one every 5s
+                    steps = [store.gcra('g', at, 5, 10) for at in (now, now, now, now + 5)]
+                    self.assertEqual([allowed for allowed, _ in steps], [True, True, False, True])
+                    self.assertAlmostEqual(steps[2][1], now + 10)
+
+            other_worker = SQLiteThrottleStore(path)
+            self.assertEqual(other_worker.incr('k', now + 60), 4)
+
+
+@override_settings(BLOG_METRICS=True, BLOG_METRICS_ALLOWED_IPS=[])
+class RequestMetricsTests(UncachedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        profiles.clear()
+        self.post = Post.objects.create(title='Measured', content='...', author='Author')
+        Comment.objects.create(post=self.post, content='First', author='Reader')
+
+    def server_timing(self, response):
+        """
+        Returns the Server-Timing header as {name: {'dur': ..., 'desc': ...}}.
+        """
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_server_timing_header(self):
+        """
+        Ensure blog responses report their view, queries, serializer/throttle time and size.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('comment-list-create', kwargs={'post_pk': self.post.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = self.server_timing(response)
+        self.assertEqual(timing['view']['desc'], '"comment-list-create"')
+        self.assertEqual(timing['db']['desc'], f'"{len(queries)} queries"')
+        self.assertEqual(timing['size']['desc'], f'"{len(response.content)} bytes"')
+        for name in ('total', 'db', 'serializer', 'throttle'):
+            self.assertGreaterEqual(float(timing[name]['dur']), 0)
+        self.assertGreaterEqual(float(timing['total']['dur']), float(timing['db']['dur']))
+        # Non-blog views aren't measured
+        self.assertNotIn('Server-Timing', self.client.get(reverse('metrics')))
+
+    def test_prometheus_endpoint(self):
+        """
+        Ensure /api/metrics/ serves per-view request counts and histograms.
+        """
+        for _ in range(3):
+            self.client.get(reverse('post-list'))
+        self.client.get(reverse('post-detail', kwargs={'pk': 0}))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(BLOG_METRICS_ALLOWED_IPS=['127.0.0.1']):
+            response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('blog_requests_total{view="post-list",method="GET",status="200"} 3', text)
+        self.assertIn('blog_requests_total{view="post-detail",method="GET",status="404"} 1', text)
+        self.assertIn('# TYPE blog_request_duration_seconds histogram', text)
+        self.assertIn('blog_request_duration_seconds_bucket{view="post-list",method="GET",le="+Inf"} 3', text)
+        self.assertIn('blog_request_db_queries_count{view="post-list",method="GET"} 3', text)
+        for name in ('db_duration_seconds', 'serializer_duration_seconds', 'throttle_duration_seconds'):
+            self.assertIn(f'blog_request_{name}_sum{{view="post-list",method="GET"}}', text)
+        self.assertIn('blog_response_size_bytes_count{view="post-list",method="GET"} 3', text)
+
+        with override_settings(BLOG_METRICS=False, BLOG_METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_slow_request_profiles(self):
+        """
+        Ensure sampled requests over the threshold keep a profile, named in Server-Timing.
+        """
+        url = reverse('post-list')
+        with override_settings(BLOG_METRICS_PROFILE_THRESHOLD=None):
+            self.assertNotIn('profile', self.server_timing(self.client.get(url)))
+        with override_settings(BLOG_METRICS_PROFILE_THRESHOLD=10_000, BLOG_METRICS_PROFILE_SAMPLE_RATE=1):
+            self.assertNotIn('profile', self.server_timing(self.client.get(url))) # Not slow enough
+        with override_settings(BLOG_METRICS_PROFILE_THRESHOLD=0, BLOG_METRICS_PROFILE_SAMPLE_RATE=1):
+            timing = self.server_timing(self.client.get(url))
+        profile_id = timing['profile']['desc'].strip('"')
+
+        self.assertEqual(self.client.get(reverse('metrics-profiles')).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        text = self.client.get(reverse('metrics-profiles')).content.decode()
+        self.assertIn(f'=== #{profile_id} GET {url} post-list 200', text)
+        self.assertIn('cumulative', text)
+        self.assertIn('paginate_queryset', text)
+
+
+class AsyncReadTests(BlogTestCase):
+    """
+    The async read path served over ASGI (the async test client) against the sync views (the test client).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Async')
+        for i in range(7):
+            self.post = Post.objects.create(title=f'Post {i}', content='Shared words', author=f'Author {i % 2}')
+            self.post.categories.add(self.category)
+            Comment.objects.create(post=self.post, content=f'Comment {i}', author='Reader')
+
+    def async_get(self, url, **headers):
+        return async_to_sync(self.async_client.get)(url, headers=headers)
+
+    def headers(self, response):
+        return {name: value for name, value in response.headers.items() if name != 'Server-Timing'}
+
+    @override_settings(BLOG_RESPONSE_CACHE=None)
+    def test_responses_match_sync_views(self):
+        """
+        Ensure every async endpoint answers with the same status, headers and bytes as its sync view.
+        """
+        post_list = reverse('post-list')
+        urls = [
+            post_list,
+            f'{post_list}?page=2',
+            f'{post_list}?page=9',
+            f'{post_list}?page_size=3&ordering=-created_at',
+            f'{post_list}?pagination=cursor&page_size=2',
+            f'{post_list}?author=Author+1&categories={self.category.pk}',
+            f'{post_list}?categories=0',
+            f'{post_list}?search=post+words',
+            reverse('post-detail', kwargs={'pk': self.post.pk}),
+            reverse('post-detail', kwargs={'pk': 0}),
+            reverse('category-list'),
+            reverse('comment-list-create', kwargs={'post_pk': self.post.pk}),
+            reverse('comment-list-create', kwargs={'post_pk': 0}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                expected = self.client.get(url)
+                response = self.async_get(url)
+                self.assertTrue(iscoroutinefunction(response.resolver_match.func))
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+                self.assertEqual(self.headers(response), self.headers(expected))
+
+        # Keyset links lead to the same pages too
+        next_url = self.client.get(f'{post_list}?pagination=cursor&page_size=2').json()['next']
+        self.assertEqual(self.async_get(next_url).content, self.client.get(next_url).content)
+
+    def test_other_requests_use_sync_views(self):
+        """
+        Ensure writes, the browsable API and unrouted endpoints still work over ASGI.
+        """
+        url = reverse('post-list')
+        response = async_to_sync(self.async_client.post)(
+            url, {'title': 'Async write', 'content': '...', 'author': 'Author'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Post.objects.filter(title='Async write').exists())
+
+        response = self.async_get(url, accept='text/html')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+        comment = Comment.objects.filter(post=self.post).get()
+        response = self.async_get(reverse('comment-detail', kwargs={'post_pk': self.post.pk, 'comment_pk': comment.pk}))
+        self.assertFalse(iscoroutinefunction(response.resolver_match.func))
+        self.assertEqual(response.json()['content'], comment.content)
+
+    @override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'read': '3/min'}}, BLOG_METRICS=True)
+    def test_cache_and_throttling(self):
+        """
+        Ensure the async path shares the response cache (including 304s) and the throttle budgets.
+        """
+        url = reverse('post-detail', kwargs={'pk': self.post.pk})
+        response = self.async_get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        cached = self.client.get(url)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+        response = self.async_get(url, if_none_match=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # The server-side metrics saw the async request's queries
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+        throttled = self.async_get(url)
+        self.assertEqual(throttled.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(throttled['Retry-After']), 0)
+        self.assertEqual(self.client.get(url).content, throttled.content)
+
+
+class FastSerializationTests(UncachedTestCase):
+    """
+    Lists serialized from .values() rows and the orjson renderer/parser against DRF's own.
+    """
+
+    def setUp(self):
+        super().setUp()
+        categories = [Category.objects.create(name=f'Category {i}') for i in range(4)]
+        for i in range(9):
+            post = Post.objects.create(title=f'Post {i}', content=f'Text \u2028 é {i}', author=f'Author {i % 3}')
+            # Added out of ID order; posts without categories too
+            post.categories.add(*categories[i % 4:][::-1][:i % 3])
+            Comment.objects.create(post=post, content=f'Comment {i} 😀', author='Reader')
+        self.post = post
+
+    def get_pair(self, url, get):
+        """
+        The response to `url` with and without the .values() path.
+        """
+        fast = get(url)
+        with mock.patch.object(ValuesListMixin, 'list_from_values', False):
+            expected = self.client.get(url)
+        return fast, expected
+
+    def test_list_output_matches_serializers(self):
+        """
+        Ensure list pages are the same bytes as the serializers give, sync and async.
+        """
+        post_list = reverse('post-list')
+        category = Category.objects.get(name='Category 3')
+        urls = [
+            post_list,
+            f'{post_list}?page=3',
+            f'{post_list}?page_size=100&ordering=title',
+            f'{post_list}?ordering=-likes&author=Author+1',
+            f'{post_list}?categories={category.pk}',
+            f'{post_list}?search=text',
+            f'{post_list}?pagination=cursor&page_size=2&ordering=author',
+            f'{post_list}?pagination=cursor&search=text',
+            f'{reverse("category-list")}?ordering=-post_count',
+            reverse('comment-list-create', kwargs={'post_pk': self.post.pk}),
+            reverse('comment-list-create', kwargs={'post_pk': 0}),
+        ]
+        async_get = lambda url: async_to_sync(self.async_client.get)(url)
+        for url in urls:
+            for get in (self.client.get, async_get):
+                with self.subTest(url=url, get=get):
+                    fast, expected = self.get_pair(url, get)
+                    self.assertEqual(fast.status_code, expected.status_code)
+                    self.assertEqual(fast.content, expected.content)
+
+        # Keyset cursors built from .values() rows lead to the same pages
+        url = f'{post_list}?pagination=cursor&page_size=2&ordering=author'
+        while url:
+            fast, expected = self.get_pair(url, self.client.get)
+            self.assertEqual(fast.content, expected.content)
+            url = fast.json()['next']
+
+    def test_unsupported_fields(self):
+        """
+        Ensure serializers the .values() path can't reproduce are refused.
+        """
+        class TitleSerializer(serializers.ModelSerializer):
+            upper = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Post
+                fields = ['id', 'upper']
+
+            def get_upper(self, post):
+                return post.title.upper()
+
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesPlan(TitleSerializer())
+
+    def test_renderer_and_parser(self):
+        """
+        Ensure FastJSONRenderer/FastJSONParser give JSONRenderer/JSONParser's output, errors
+        included, with and without orjson.
+        """
+        data = self.client.get(f'{reverse("post-list")}?page_size=100').data
+        data['extra'] = {1: 2**70, 'when': self.post.created_at, 'text': 'a\u2029b'}
+        for indent in (None, 'application/json; indent=2'):
+            expected = JSONRenderer().render(data, indent)
+            self.assertEqual(FastJSONRenderer().render(data, indent), expected)
+            with mock.patch('blog.renderers.orjson', None):
+                self.assertEqual(FastJSONRenderer().render(data, indent), expected)
+
+        bodies = [b'{"a": [1, 2.5, "\\u00e9", null]}', b'{"big": 123456789012345678901234}', b'{"n": NaN}', b'{"a"']
+        for body in bodies:
+            with self.subTest(body=body):
+                try:
+                    expected = JSONParser().parse(io.BytesIO(body))
+                except Exception as exc:
+                    with self.assertRaisesMessage(type(exc), str(exc)):
+                        FastJSONParser().parse(io.BytesIO(body))
+                else:
+                    self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), expected)
+
+        # Requests are parsed by FastJSONParser
+        response = self.client.post(
+            reverse('post-list'), {'title': 'é', 'content': '...', 'author': 'A'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['title'], 'é')
+
+
+class SparseFieldsTests(UncachedTestCase):
+    """
+    ?fields= / ?exclude= / ?content_preview= on post and comment reads.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Sparse')
+        for i in range(3):
+            self.post = Post.objects.create(title=f'Post {i}', content='A long article body ' * 20, author='Author')
+            self.post.categories.add(self.category)
+            self.comment = Comment.objects.create(post=self.post, content='A long comment', author='Reader')
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return response.json(), ' '.join(query['sql'] for query in queries.captured_queries)
+
+    def test_fields_and_exclude(self):
+        """
+        Ensure only the requested fields are returned, and only their columns read.
+        """
+        data, sql = self.get(f"{reverse('post-list')}?fields=id,title")
+        self.assertEqual(data['results'][0], {'id': self.post.pk, 'title': 'Post 2'})
+        self.assertNotIn('"content"', sql)
+        self.assertNotIn('blog_post_categories', sql)
+
+        data, sql = self.get(f"{reverse('post-detail', kwargs={'pk': self.post.pk})}?exclude=content,likes")
+        self.assertEqual(data['categories'], [self.category.pk])
+        self.assertNotIn('likes', data)
+        self.assertNotIn('"content"', sql)
+
+        # Keyset pages still get their cursors when the ordering columns aren't requested
+        data, sql = self.get(f"{reverse('post-list')}?pagination=cursor&page_size=1&fields=title&ordering=likes")
+        self.assertEqual(data['results'], [{'title': 'Post 0'}])
+        self.assertEqual(self.get(data['next'])[0]['results'], [{'title': 'Post 1'}])
+
+        comment_url = reverse('comment-detail', kwargs={'post_pk': self.post.pk, 'comment_pk': self.comment.pk})
+        data, sql = self.get(f'{comment_url}?fields=author,post')
+        self.assertEqual(data, {'author': 'Reader', 'post': self.post.pk})
+        self.assertNotIn('"content"', sql)
+
+        response = self.client.get(f"{reverse('post-list')}?fields=id,secret&content_preview=0")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.json()), {'fields', 'content_preview'})
+
+    def test_content_preview(self):
+        """
+        Ensure ?content_preview=<n> returns the first n characters, cut by the database.
+        """
+        data, sql = self.get(f"{reverse('post-list')}?content_preview=6")
+        self.assertEqual(data['results'][0]['content'], 'A long')
+        self.assertEqual(data['results'][0]['categories'], [self.category.pk])
+        self.assertIn('SUBSTR', sql)
+        self.assertNotIn('"blog_post"."content"', sql.replace('SUBSTR("blog_post"."content"', ''))
+
+        data, sql = self.get(f"{reverse('comment-list-create', kwargs={'post_pk': self.post.pk})}?content_preview=1")
+        self.assertEqual(data['results'][0]['content'], 'A')
+        response = async_to_sync(self.async_client.get)(f"{reverse('post-list')}?content_preview=6&fields=content")
+        self.assertEqual(response.json()['results'][0], {'content': 'A long'})
+
+        # Writes still take and return the full content
+        response = self.client.post(
+            f"{reverse('post-list')}?content_preview=1", {'title': 'New', 'content': 'Full', 'author': 'A'}, format='json'
+        )
+        self.assertEqual(response.json()['content'], 'Full')
+
+
+class IncludeTests(BlogTestCase):
+    """
+    ?include=categories,comments on post lists and details.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.categories = [Category.objects.create(name=f'Category {i}') for i in range(3)]
+        self.posts = []
+        for i in range(6):
+            post = Post.objects.create(title=f'Post {i}', content='...', author='Author')
+            post.categories.add(*self.categories[:i % 3 + 1])
+            for j in range(i):
+                Comment.objects.create(post=post, content=f'Comment {j}', author='Reader')
+            self.posts.append(post)
+
+    def test_embedded_relations_match_their_endpoints(self):
+        """
+        Ensure embedded categories and comments are what their own endpoints return.
+        """
+        response = self.client.get(f"{reverse('post-list')}?page_size=6&include=categories,comments&comments_limit=3")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for item in response.json()['results']:
+            post = Post.objects.get(pk=item['id'])
+            self.assertEqual(item['categories'], [
+                self.client.get(reverse('category-detail', kwargs={'pk': category.pk})).json()
+                for category in post.categories.order_by('pk')
+            ])
+            comments = self.client.get(f"{reverse('comment-list-create', kwargs={'post_pk': post.pk})}?page_size=3")
+            self.assertEqual(item['comments'], comments.json()['results'])
+
+        detail_url = f"{reverse('post-detail', kwargs={'pk': self.posts[5].pk})}?include=comments&comments_limit=2"
+        detail = self.client.get(detail_url).json()
+        self.assertEqual([comment['content'] for comment in detail['comments']], ['Comment 4', 'Comment 3'])
+        self.assertEqual(detail['categories'], [category.pk for category in self.categories])
+        self.assertEqual(async_to_sync(self.async_client.get)(detail_url).json(), detail)
+
+        response = self.client.get(f"{reverse('post-list')}?include=author&comments_limit=x")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BLOG_RESPONSE_CACHE=None)
+    def test_fixed_number_of_queries(self):
+        """
+        Ensure embedding costs the same queries for a page of 2 posts as for a page of 6.
+        """
+        url = f"{reverse('post-list')}?include=categories,comments&page_size="
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url + '2')
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url + '6')
+        # Count, page, category links, categories, ranked comments
+        self.assertEqual(len(small), 5)
+        self.assertEqual(len(large), 5)
+
+    def test_embedded_categories_invalidate(self):
+        """
+        Ensure cached responses embedding categories see category changes.
+        """
+        url = f"{reverse('post-list')}?include=categories"
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        category = self.categories[0]
+        category.name = 'Renamed'
+        category.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['categories'][0]['name'], 'Renamed')
+
+
+class TrendingTests(BlogTestCase):
+    """
+    GET /api/posts/trending/ and the stored scores behind it.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.posts = [Post.objects.create(title=f'Post {i}', content='...', author='Author') for i in range(4)]
+
+    def expected_score(self, post, comment_weight=2, time_scale=45000):
+        engagement = post.likes - post.dislikes + comment_weight * post.comment_count
+        magnitude = math.log10(max(abs(engagement), 1))
+        return math.copysign(magnitude, engagement) + (int(post.created_at.timestamp()) - EPOCH) / time_scale
+
+    def assertScored(self, **settings):
+        for post in self.posts:
+            post.refresh_from_db()
+            self.assertAlmostEqual(post.trending_score, self.expected_score(post, **settings))
+
+    def trending_ids(self, url=None):
+        ids = []
+        url = url or f"{reverse('post-trending')}?page_size=3"
+        while url:
+            page = self.client.get(url).json()
+            ids += [item['id'] for item in page['results']]
+            url = page['next']
+        return ids
+
+    def test_scores_follow_votes_and_comments(self):
+        """
+        Ensure votes and comment writes rescore their post, and the endpoint ranks by score.
+        """
+        self.assertScored()
+        first, second, third, _ = self.posts
+        for _ in range(12):
+            self.client.post(reverse('post-like', kwargs={'pk': second.pk}))
+        for _ in range(3):
+            self.client.post(reverse('post-dislike', kwargs={'pk': third.pk}))
+        comments = [Comment.objects.create(post=first, content='...', author='Reader') for _ in range(3)]
+        self.assertScored()
+        self.assertEqual(self.trending_ids()[:2], [second.pk, first.pk])
+        self.assertEqual(self.trending_ids()[-1], third.pk)
+
+        comments[0].delete()
+        self.client.post(
+            reverse('comment-bulk', kwargs={'post_pk': third.pk}),
+            [{'content': '...', 'author': 'Reader'}] * 2, format='json',
+        )
+        self.assertScored()
+        ranked = sorted(self.posts, key=lambda post: (post.trending_score, post.pk), reverse=True)
+        self.assertEqual(self.trending_ids(), [post.pk for post in ranked])
+
+        detail = self.client.get(f"{reverse('post-trending')}?fields=id,comment_count&include=comments").json()
+        self.assertEqual(detail['results'][1], {
+            'id': first.pk, 'comment_count': 2,
+            'comments': self.client.get(reverse('comment-list-create', kwargs={'post_pk': first.pk})).json()['results'],
+        })
+        async_response = async_to_sync(self.async_client.get)(reverse('post-trending'))
+        self.assertEqual(async_response.json(), self.client.get(reverse('post-trending')).json())
+
+    @override_settings(BLOG_VOTE_COUNTER='blog.counters.ShardedVoteCounter')
+    def test_folded_votes_rescore(self):
+        """
+        Ensure sharded votes count towards the score once folded.
+        """
+        for _ in range(5):
+            self.client.post(reverse('post-like', kwargs={'pk': self.posts[0].pk}))
+        self.client.post(reverse('post-dislike', kwargs={'pk': self.posts[1].pk}))
+        out = io.StringIO()
+        call_command('fold_votes', stdout=out)
+        self.assertEqual(out.getvalue(), 'Folded 6 votes.\n')
+        self.assertScored()
+        self.assertEqual(self.trending_ids()[0], self.posts[0].pk)
+
+    def test_newer_posts_rank_higher(self):
+        """
+        Ensure age counts against a post: a day older needs more than ten times the engagement.
+        """
+        old, new = self.posts[:2]
+        Post.objects.filter(pk=old.pk).update(likes=10, created_at=new.created_at - datetime.timedelta(days=1))
+        out = io.StringIO()
+        call_command('recompute_trending', '--batch-size', '1', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Fixed trending_score on 1 posts.')
+        self.assertScored()
+        self.assertLess(self.trending_ids().index(new.pk), self.trending_ids().index(old.pk))
+
+    def test_recompute_after_settings_change(self):
+        """
+        Ensure `recompute_trending` rescores every post with the current settings.
+        """
+        Comment.objects.create(post=self.posts[0], content='...', author='Reader')
+        with override_settings(BLOG_TRENDING_COMMENT_WEIGHT=5, BLOG_TRENDING_TIME_SCALE=1000):
+            out = io.StringIO()
+            call_command('recompute_trending', stdout=out)
+            self.assertEqual(out.getvalue().strip(), f'Fixed trending_score on {len(self.posts)} posts.')
+            self.assertScored(comment_weight=5, time_scale=1000)
+
+
+class CategoryRegistryTests(BlogTestCase):
+    """
+    Category reads and category ID validation served from the in-process registry.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.categories = [Category.objects.create(name=name) for name in ('Beta', 'Alpha', 'Gamma')]
+        self.post = Post.objects.create(title='Post', content='...', author='Author')
+        self.post.categories.add(self.categories[0])
+
+    def category_queries(self, func):
+        """
+        Runs func, returning the queries it ran to look up categories by ID.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        return [query['sql'] for query in queries if 'FROM "blog_category" WHERE' in query['sql']]
+
+    def test_warm_registry_runs_no_queries(self):
+        """
+        Ensure reads and post writes don't query categories while none change.
+        """
+        category_registry.get()
+        # Distinct URLs, so every request misses the response cache
+        urls = [
+            reverse('category-list'),
+            f"{reverse('category-list')}?ordering=-post_count",
+            reverse('category-detail', kwargs={'pk': self.categories[1].pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url), self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        ids = [category.pk for category in self.categories[1:]]
+        self.assertFalse(self.category_queries(lambda: self.assertEqual(self.client.post(
+            reverse('post-list'), {'title': 'New', 'content': '...', 'author': 'Author', 'categories': ids}, format='json',
+        ).status_code, status.HTTP_201_CREATED)))
+        self.assertFalse(self.category_queries(lambda: self.client.post(
+            reverse('post-bulk'), [{'title': 'Bulk', 'content': '...', 'author': 'Author', 'categories': [ids[0]]}], format='json',
+        )))
+
+        response = self.client.post(
+            reverse('post-list'), {'title': 'Bad', 'content': '...', 'author': 'Author', 'categories': [0]}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('categories', response.json())
+
+    def test_changes_reload_registry(self):
+        """
+        Ensure new, renamed and deleted categories and post count changes reach the registry.
+        """
+        url = reverse('category-list')
+        names = lambda: [(item['name'], item['post_count']) for item in self.client.get(url).json()['results']]
+        self.assertEqual(names(), [('Alpha', 0), ('Beta', 1), ('Gamma', 0)])
+
+        Category.objects.create(name='Delta')
+        self.categories[1].name = 'Omega'
+        self.categories[1].save()
+        self.categories[2].delete()
+        self.client.post(reverse('post-list'), {
+            'title': 'New', 'content': '...', 'author': 'Author', 'categories': [self.categories[0].pk],
+        }, format='json')
+        self.assertEqual(names(), [('Beta', 2), ('Delta', 0), ('Omega', 0)])
+
+        # Another worker's change: only the shared version moves
+        snapshot = category_registry.get()
+        Category.objects.filter(pk=self.categories[0].pk).update(name='Zeta')
+        self.assertIs(category_registry.get(), snapshot)
+        bump('categories')
+        self.assertEqual(category_registry.get().objects[self.categories[0].pk].name, 'Zeta')
+
+    def test_unannounced_category(self):
+        """
+        Ensure a category missing from a stale snapshot is still accepted and served, from the database.
+        """
+        snapshot = category_registry.get()
+        category = Category.objects.create(name='Delta')
+        with mock.patch.object(category_registry, 'get', return_value=snapshot), \
+                mock.patch.object(category_registry, 'aget', return_value=snapshot):
+            response = self.client.post(reverse('post-list'), {
+                'title': 'New', 'content': '...', 'author': 'Author', 'categories': [category.pk],
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            detail = reverse('category-detail', kwargs={'pk': category.pk})
+            self.assertEqual(self.client.get(detail).json()['name'], 'Delta')
+            clear_caches()
+            self.assertEqual(async_to_sync(self.async_client.get)(detail).json()['name'], 'Delta')
+            response = self.client.post(reverse('post-list'), {
+                'title': 'Bad', 'content': '...', 'author': 'Author', 'categories': [0],
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BLOG_RESPONSE_CACHE='default')
+    def test_per_process_cache_reloads(self):
+        """
+        Ensure a version stamp other workers can't see is ignored: every read reloads.
+        """
+        snapshot = category_registry.get()
+        self.assertIsNot(category_registry.get(), snapshot)
+        response = self.client.post(reverse('post-list'), {
+            'title': 'New', 'content': '...', 'author': 'Author', 'categories': [self.categories[0].pk],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.get(reverse('category-list')).status_code, status.HTTP_200_OK)
+
+    def test_responses_match_database(self):
+        """
+        Ensure list, ordering, pagination, detail and 404s look as they do when read from the database.
+        """
+        Category.objects.bulk_create([Category(name='Epsilon'), Category(name='Delta')])
+        url = reverse('category-list')
+        response = self.client.get(f'{url}?ordering=-post_count,name').json()
+        self.assertEqual([item['name'] for item in response['results']], ['Beta', 'Alpha', 'Delta', 'Epsilon'])
+        self.assertEqual(response['count'], 5)
+        self.assertIsNotNone(response['next'])
+        self.assertEqual(self.client.get(response['next']).json()['results'], [
+            {'id': self.categories[2].pk, 'name': 'Gamma', 'post_count': 0},
+        ])
+
+        detail = reverse('category-detail', kwargs={'pk': self.categories[0].pk})
+        self.assertEqual(self.client.get(detail).json(), {'id': self.categories[0].pk, 'name': 'Beta', 'post_count': 1})
+        for pk in (0, 'x'):
+            response = self.client.get(reverse('category-detail', kwargs={'pk': pk}))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(response.json(), {'detail': 'No Category matches the given query.'})
+
+        for path in (url, f'{url}?ordering=name', detail, reverse('category-detail', kwargs={'pk': 0})):
+            with self.subTest(path=path):
+                clear_caches()
+                expected = self.client.get(path)
+                clear_caches()
+                response = async_to_sync(self.async_client.get)(path)
+                self.assertTrue(iscoroutinefunction(response.resolver_match.func))
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+
+
+class CommentBatchTests(BlogTestCase):
+    """
+    GET /api/comments/: the latest comments of many posts, grouped by post.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.posts = [Post.objects.create(title=f'Post {i}', content='...', author='Author') for i in range(3)]
+        self.comments = {
+            post.pk: [Comment.objects.create(post=post, content=f'Comment {i}', author='Reader') for i in range(count)]
+            for post, count in zip(self.posts, (7, 1, 0))
+        }
+        self.url = reverse('comment-batch')
+
+    def nested_ids(self, post_pk):
+        url = reverse('comment-list-create', kwargs={'post_pk': post_pk})
+        return [item['id'] for item in self.client.get(url, {'page_size': 100}).json()['results']]
+
+    def test_latest_comments_grouped_by_post(self):
+        """
+        Ensure every post gets its newest comments, in the requested order, from one query.
+        """
+        pks = [self.posts[2].pk, self.posts[0].pk, 999, self.posts[1].pk]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'posts': ','.join(map(str, pks)), 'limit': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        groups = response.json()['results']
+        self.assertEqual([group['post'] for group in groups], pks)
+        self.assertEqual([len(group['comments']) for group in groups], [0, 3, 0, 1])
+        self.assertEqual([group['next'] is not None for group in groups], [False, True, False, False])
+
+        # The same objects, in the same order, as the nested list
+        newest = self.client.get(reverse('comment-list-create', kwargs={'post_pk': self.posts[0].pk})).json()['results']
+        self.assertEqual(groups[1]['comments'], newest[:3])
+
+        # Sparse fieldsets, and the default limit
+        response = self.client.get(self.url, {'posts': self.posts[0].pk, 'fields': 'id'})
+        self.assertEqual(response.json()['results'][0]['comments'], [{'id': pk} for pk in self.nested_ids(self.posts[0].pk)[:5]])
+
+    def test_load_more_with_cursors(self):
+        """
+        Ensure following `next` walks a post's comments, and cursors work across endpoints.
+        """
+        first, second = self.posts[:2]
+        ids = []
+        url = f'{self.url}?posts={first.pk}&limit=3'
+        while url:
+            group = self.client.get(url).json()['results'][0]
+            self.assertEqual(group['post'], first.pk)
+            ids += [item['id'] for item in group['comments']]
+            url = group['next']
+        self.assertEqual(ids, self.nested_ids(first.pk))
+
+        # A cursor from here continues the nested list, and one from the nested list continues here
+        cursor = self.client.get(self.url, {'posts': first.pk, 'limit': 2}).json()['results'][0]['next'].rsplit('%3A', 1)[1]
+        nested = reverse('comment-list-create', kwargs={'post_pk': first.pk})
+        page = self.client.get(nested, {'cursor': cursor, 'page_size': 2}).json()
+        self.assertEqual([item['id'] for item in page['results']], ids[2:4])
+        cursor = page['next'].split('cursor=')[1].split('&')[0]
+        with self.assertNumQueries(1):
+            groups = self.client.get(self.url, {'posts': f'{first.pk}:{cursor},{second.pk}', 'limit': 2}).json()['results']
+        self.assertEqual([item['id'] for item in groups[0]['comments']], ids[4:6])
+        self.assertEqual(len(groups[1]['comments']), 1)
+
+    def test_invalid_requests(self):
+        """
+        Ensure bad post IDs, limits and cursors are rejected.
+        """
+        for params, field in [
+            ({}, 'posts'), ({'posts': 'x,1'}, 'posts'), ({'posts': ','.join(map(str, range(1, 102)))}, 'posts'),
+            ({'posts': '1', 'limit': '0'}, 'limit'),
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(field, response.json())
+        response = self.client.get(self.url, {'posts': f'{self.posts[0].pk}:bogus'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cached_and_async(self):
+        """
+        Ensure responses are cached until a post of the batch gets a comment, and match over ASGI.
+        """
+        params = {'posts': f'{self.posts[0].pk},{self.posts[2].pk}'}
+        self.client.get(self.url, params)
+        with self.assertNumQueries(0):
+            self.client.get(self.url, params)
+        Comment.objects.create(post=self.posts[2], content='New', author='Reader')
+        response = self.client.get(self.url, params).json()
+        self.assertEqual(response['results'][1]['comments'][0]['content'], 'New')
+
+        path = f"{self.url}?posts={self.posts[0].pk},{self.posts[1].pk}&limit=2&content_preview=3"
+        clear_caches()
+        expected = self.client.get(path)
+        clear_caches()
+        response = async_to_sync(self.async_client.get)(path)
+        self.assertTrue(iscoroutinefunction(response.resolver_match.func))
+        self.assertEqual(response.content, expected.content)
+
+
+@override_settings(BLOG_READ_REPLICAS=['replica'], BLOG_RESPONSE_CACHE=None)
+class ReplicaRoutingTests(BlogTransactionTestCase):
+    """
+    Reads from a replica SQLite file, kept in sync by the replication stand-in (see blog/replicas.py).
+    """
+    # Resolved in setUpClass(), once the replica is configured
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = connections.configure_settings({
+            'default': connections.settings['default'],
+            'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'{cls.replica_dir.name}/replica.sqlite3'},
+        })['replica']
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        super().setUp()
+        Post.objects.create(title='Replicated', content='...', author='Author')
+        sync_sqlite_replica('replica')
+        # Not replicated yet
+        Post.objects.create(title='Primary only', content='...', author='Author')
+
+    def post_count(self, client=None):
+        return (client or self.client).get(reverse('post-list')).json()['count']
+
+    @override_settings(BLOG_READ_REPLICAS=['replica', 'other'])
+    def test_one_replica_per_request(self):
+        """
+        Ensure every replica read of a request goes to the same replica.
+        """
+        router = replicas.ReplicaRouter()
+        picked = set()
+        for _ in range(20):
+            token = replicas._current.set(replicas.RoutingState(use_primary=False))
+            try:
+                aliases = {router.db_for_read(model) for model in (Post, Category, Comment) for _ in range(5)}
+            finally:
+                replicas._current.reset(token)
+            self.assertEqual(len(aliases), 1)
+            picked |= aliases
+        self.assertEqual(picked, {'replica', 'other'})
+
+    def test_reads_go_to_replicas(self):
+        """
+        Ensure GETs read posts from the replica, and reads outside requests from the primary.
+        """
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            with CaptureQueriesContext(connection) as primary_queries:
+                self.assertEqual(self.post_count(), 1)
+        self.assertTrue(replica_queries.captured_queries)
+        self.assertFalse([q for q in primary_queries.captured_queries if 'blog_' in q['sql']])
+        self.assertEqual(Post.objects.count(), 2)
+
+        response = async_to_sync(self.async_client.get)(reverse('post-list'))
+        self.assertTrue(iscoroutinefunction(response.resolver_match.func))
+        self.assertEqual(response.json()['count'], 1)
+
+        sync_sqlite_replica('replica')
+        self.assertEqual(self.post_count(), 2)
+
+    def test_writers_read_their_own_writes(self):
+        """
+        Ensure a client that wrote reads from the primary for the sticky window, and others don't.
+        """
+        other = self.client_class()
+        response = self.client.post(reverse('post-list'), {'title': 'New', 'content': '...', 'author': 'Author'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('blog_primary', response.cookies)
+        self.assertEqual(self.post_count(), 3)
+        self.assertEqual(self.post_count(other), 1)
+        sync_sqlite_replica('replica')
+        self.assertEqual(self.post_count(other), 3)
+
+        # Failed writes don't pin, and the pin expires
+        response = other.post(reverse('post-list'), {'title': ''}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('blog_primary', response.cookies)
+        with self.settings(BLOG_REPLICA_STICKY_SECONDS=0):
+            self.client.post(reverse('post-like', kwargs={'pk': Post.objects.first().pk}))
+            Post.objects.create(title='Primary only', content='...', author='Author')
+            self.assertEqual(self.post_count(), 3)
+
+    @override_settings(BLOG_RESPONSE_CACHE='files', BLOG_RESPONSE_CACHE_TIMEOUT=300, BLOG_REPLICA_CACHE_TIMEOUT=5)
+    def test_replica_responses_cached_briefly(self):
+        """
+        Ensure responses built from a replica expire after BLOG_REPLICA_CACHE_TIMEOUT.
+        """
+        self.client.post(reverse('post-list'), {'title': 'New', 'content': '...', 'author': 'Author'}, format='json')
+        with mock.patch.object(caches['files'], 'set', wraps=caches['files'].set) as cache_set:
+            self.client.get(reverse('post-list'))
+            self.client_class().get(reverse('post-list'), {'page': 1})
+        self.assertEqual([call.kwargs['timeout'] for call in cache_set.call_args_list], [300, 5])
+
+
+# Served as soon as written, unless a test says otherwise
+@override_settings(BLOG_CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(BlogTestCase):
+    """
+    GET /api/changes/: incremental sync of posts, comments and categories, with tombstones.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Feed')
+        self.post = Post.objects.create(title='Post', content='...', author='Author')
+        self.url = reverse('change-feed')
+
+    def sync(self, mirror, cursor=0, limit=3):
+        """
+        Applies the feed after `cursor` to `mirror` ({(type, id): data}) page by page; returns the new cursor.
+        """
+        url = f'{self.url}?updated_since={cursor}&limit={limit}'
+        while True:
+            page = self.client.get(url).json()
+            for change in page['changes']:
+                if change['deleted']:
+                    mirror.pop((change['type'], change['id']), None)
+                else:
+                    mirror[(change['type'], change['id'])] = change['data']
+            if page['next'] is None:
+                return page['cursor']
+            url = page['next']
+
+    def current_state(self):
+        state = {}
+        for kind, serializer_class, queryset in [
+            ('post', PostSerializer, Post.objects.prefetch_related('categories')),
+            ('comment', CommentSerializer, Comment.objects.all()),
+            ('category', CategorySerializer, Category.objects.all()),
+        ]:
+            for item in serializer_class(queryset, many=True).data:
+                state[(kind, item['id'])] = json.loads(json.dumps(item))
+        return state
+
+    def changes_since(self, cursor):
+        page = self.client.get(self.url, {'updated_since': cursor}).json()
+        return {(change['type'], change['id']): change for change in page['changes']}, page['cursor']
+
+    def test_changes_and_tombstones(self):
+        """
+        Ensure writes show up once per object with current data, and deletes as tombstones.
+        """
+        _, cursor = self.changes_since(0)
+        response = self.client.post(reverse('post-list'), {
+            'title': 'New', 'content': '...', 'author': 'Author', 'categories': [self.category.pk],
+        }, format='json')
+        post_pk = response.json()['id']
+        comment_pk = self.client.post(
+            reverse('comment-list-create', kwargs={'post_pk': post_pk}), {'content': 'Hi', 'author': 'Reader'}, format='json',
+        ).json()['id']
+        self.client.post(reverse('post-like', kwargs={'pk': post_pk}))
+
+        changes, cursor = self.changes_since(cursor)
+        self.assertEqual(set(changes), {('post', post_pk), ('comment', comment_pk), ('category', self.category.pk)})
+        self.assertEqual(
+            {key: changes[('post', post_pk)]['data'][key] for key in ('likes', 'comment_count', 'categories')},
+            {'likes': 1, 'comment_count': 1, 'categories': [self.category.pk]},
+        )
+        self.assertEqual(changes[('category', self.category.pk)]['data']['post_count'], 1)
+        seqs = [change['seq'] for change in changes.values()]
+        self.assertEqual(seqs, sorted(seqs))
+
+        self.client.delete(reverse('comment-detail', kwargs={'post_pk': post_pk, 'comment_pk': comment_pk}))
+        changes, cursor = self.changes_since(cursor)
+        self.assertEqual(changes[('comment', comment_pk)], {
+            'seq': changes[('comment', comment_pk)]['seq'], 'type': 'comment', 'id': comment_pk, 'deleted': True,
+        })
+        self.assertEqual(changes[('post', post_pk)]['data']['comment_count'], 0)
+
+        self.client.delete(reverse('post-detail', kwargs={'pk': post_pk}))
+        changes, cursor = self.changes_since(cursor)
+        self.assertTrue(changes[('post', post_pk)]['deleted'])
+        self.assertEqual(changes[('category', self.category.pk)]['data']['post_count'], 0)
+        self.assertEqual(self.changes_since(cursor), ({}, cursor))
+
+    def test_settle_window(self):
+        """
+        Ensure recent changes are held back, and votes within the window share one change per post.
+        """
+        _, cursor = self.changes_since(0)
+        Category.objects.create(name='Recent')
+        with override_settings(BLOG_CHANGE_FEED_SETTLE_SECONDS=60):
+            self.assertEqual(self.changes_since(cursor), ({}, cursor))
+        changes, _ = self.changes_since(cursor)
+        self.assertEqual([key[0] for key in changes], ['category'])
+
+        like_url = reverse('post-like', kwargs={'pk': self.post.pk})
+        settled = lambda: Change.objects.update(created_at=timezone.now() - datetime.timedelta(seconds=31))
+        with override_settings(BLOG_CHANGE_FEED_SETTLE_SECONDS=60):
+            settled()
+            before = Change.objects.count()
+            for _ in range(3):
+                self.client.post(like_url)
+            self.assertEqual(Change.objects.count(), before + 1)
+            # Once the pending change is past half the window, the next vote records again
+            settled()
+            self.client.post(like_url)
+            self.assertEqual(Change.objects.count(), before + 2)
+        changes, _ = self.changes_since(cursor)
+        self.assertEqual(changes[('post', self.post.pk)]['data']['likes'], 4)
+
+    def test_mirror_stays_in_sync(self):
+        """
+        Ensure a mirror kept up to date from the feed matches the API after every kind of write.
+        """
+        mirror = {}
+        cursor = self.sync(mirror)
+        self.assertEqual(mirror, self.current_state())
+
+        other = Category.objects.create(name='Other')
+        self.client.post(reverse('post-bulk'), [
+            {'title': f'Bulk {i}', 'content': '...', 'author': 'Loader', 'categories': [other.pk]} for i in range(4)
+        ], format='json')
+        self.client.post(reverse('comment-bulk', kwargs={'post_pk': self.post.pk}), [
+            {'content': f'Comment {i}', 'author': 'Reader'} for i in range(5)
+        ], format='json')
+        self.post.categories.add(self.category, other)
+        cursor = self.sync(mirror, cursor)
+        self.assertEqual(mirror, self.current_state())
+
+        bulk = Post.objects.filter(title__startswith='Bulk').first()
+        comments = list(self.post.comments.values_list('pk', flat=True))
+        self.client.delete(reverse('comment-bulk', kwargs={'post_pk': self.post.pk}), {'ids': comments[:2]}, format='json')
+        self.client.delete(reverse('post-detail', kwargs={'pk': self.post.pk}))
+        with self.settings(BLOG_VOTE_COUNTER='blog.counters.ShardedVoteCounter'):
+            self.client.post(reverse('post-dislike', kwargs={'pk': bulk.pk}))
+            call_command('fold_votes', stdout=io.StringIO())
+        other.posts.clear()
+        self.category.name = 'Renamed'
+        self.category.save()
+        Category.objects.create(name='Doomed').delete()
+        other.delete()
+        self.sync(mirror, cursor)
+        self.assertEqual(mirror, self.current_state())
+
+        # Pruning keeps the final state, and about one change per object plus tombstones
+        call_command('prune_changes', '--batch-size', '4', stdout=io.StringIO())
+        self.assertEqual(Change.objects.filter(deleted=False).count(), len(mirror))
+        resynced = {}
+        self.sync(resynced, limit=100)
+        self.assertEqual(resynced, mirror)
+
+    def test_invalid_parameters(self):
+        for params in ({'updated_since': -1}, {'updated_since': 'x'}, {'limit': 0}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(next(iter(params)), response.json())
+
+
+class LiveStream:
+    """
+    A client of GET /api/live/ calling an ASGI application directly, reading the body chunk by chunk.
+    """
+
+    def __init__(self, application, query, path=None, host='testserver', client='127.0.0.1'):
+        # As EventSource asks for the stream
+        accept = b'text/event-stream' if path is None else b'application/json'
+        path = path or reverse('live')
+        self.chunks = asyncio.Queue()
+        self.disconnected = asyncio.Event()
+        self.status = self.headers = None
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', host.encode()), (b'accept', accept)],
+            'client': (client, 0), 'server': ('testserver', 80),
+        }
+        self.task = asyncio.ensure_future(application(scope, self.receive, self.send))
+        self.sent_request = False
+
+    async def receive(self):
+        if not self.sent_request:
+            self.sent_request = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+            self.headers = {name.decode().lower(): value.decode() for name, value in message['headers']}
+        elif message.get('body'):
+            await self.chunks.put(message['body'])
+        if message['type'] == 'http.response.body' and not message.get('more_body'):
+            await self.chunks.put(None)
+
+    async def read(self):
+        return await asyncio.wait_for(self.chunks.get(), 5)
+
+    async def events(self):
+        """
+        The (event, data) pairs of the next chunk.
+        """
+        events = []
+        for block in (await self.read()).decode().split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if line.startswith(('event:', 'data:')))
+            if 'event' in fields:
+                events.append((fields['event'], json.loads(fields['data'])))
+        return events
+
+    async def close(self):
+        self.disconnected.set()
+        await asyncio.wait_for(self.task, 5)
+
+
+@override_settings(
+    BLOG_LIVE_BROKER='blog.live.LocalBroker', BLOG_LIVE_BROKER_OPTIONS={},
+    BLOG_LIVE_VOTE_INTERVAL=0.2, BLOG_LIVE_HEARTBEAT=5,
+)
+class LiveUpdateTests(BlogTransactionTestCase):
+    """
+    GET /api/live/ over the ASGI application (see blog/live.py). Transactional, so writes publish on commit.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.application = live.LiveApplication(ASGIHandler())
+        self.posts = [
+            Post.objects.create(title=f'Live {i}', content='...', author='Author', likes=2 * i) for i in range(3)
+        ]
+
+    def tearDown(self):
+        # The hub's event loop ended with the test; stop it listening to the broker
+        if live._hub is not None:
+            live._hub.close()
+
+    def run_live(self, scenario):
+        async_to_sync(scenario)()
+
+    def vote(self, post, likes=0, dislikes=0):
+        counter = AtomicVoteCounter()
+        for field, count in (('likes', likes), ('dislikes', dislikes)):
+            for _ in range(count):
+                counter.increment(post.pk, field)
+
+    def votes_event(self, post, likes, dislikes, delta=(0, 0)):
+        return ('votes', {
+            'post': post.pk, 'likes': likes, 'dislikes': dislikes, 'delta': {'likes': delta[0], 'dislikes': delta[1]},
+        })
+
+    def comment_event(self, comment):
+        return ('comment', json.loads(json.dumps(CommentSerializer(comment).data)))
+
+    def test_pushes_votes_and_comments(self):
+        """
+        Ensure a stream starts with the counts of its posts, then gets coalesced vote updates and new comments.
+        """
+        first, second, other = self.posts
+
+        async def scenario():
+            stream = LiveStream(self.application, f'posts={first.pk},{second.pk},{first.pk}')
+            self.assertEqual(await stream.events(), [self.votes_event(first, 0, 0), self.votes_event(second, 2, 0)])
+            self.assertEqual(stream.status, 200)
+            self.assertEqual(stream.headers['content-type'], 'text/event-stream')
+
+            # A burst of votes is one update per post, with the delta since the previous one
+            await sync_to_async(self.vote)(first, likes=5, dislikes=1)
+            await sync_to_async(self.vote)(other, likes=1)
+            self.assertEqual(await stream.events(), [self.votes_event(first, 5, 1, delta=(5, 1))])
+
+            await sync_to_async(Comment.objects.create)(post=other, content='Elsewhere', author='Reader')
+            comment = await sync_to_async(Comment.objects.create)(post=second, content='Hi', author='Reader')
+            self.assertEqual(await stream.events(), [self.comment_event(comment)])
+
+            await stream.close()
+            self.assertEqual(live._hub.subscriptions, {})
+
+        self.run_live(scenario)
+
+    def test_events_shared_through_sqlite_broker(self):
+        """
+        Ensure events published by another worker reach this worker's streams through the SQLite broker.
+        """
+        post = self.posts[0]
+        with tempfile.TemporaryDirectory() as directory, self.settings(
+            BLOG_LIVE_BROKER='blog.live.SQLiteBroker', BLOG_LIVE_BROKER_OPTIONS={'path': f'{directory}/live.sqlite3'},
+        ):
+            # Another worker's broker: its own connection to the file
+            other_worker = live.SQLiteBroker(f'{directory}/live.sqlite3')
+
+            async def scenario():
+                stream = LiveStream(self.application, f'posts={post.pk}')
+                self.assertEqual(await stream.events(), [self.votes_event(post, 0, 0)])
+
+                # Vote events name the posts whose counts changed; the counts come from the database
+                await sync_to_async(Post.objects.filter(pk=post.pk).update)(likes=3)
+                other_worker.publish({'type': 'comment', 'post': post.pk, 'data': {'id': 0, 'content': 'Remote'}})
+                other_worker.publish({'type': 'votes', 'posts': [post.pk]})
+                self.assertEqual(await stream.events(), [('comment', {'id': 0, 'content': 'Remote'})])
+                self.assertEqual(await stream.events(), [self.votes_event(post, 3, 0, delta=(3, 0))])
+
+                comment = await sync_to_async(Comment.objects.create)(post=post, content='Local', author='Reader')
+                self.assertEqual(await stream.events(), [self.comment_event(comment)])
+                await stream.close()
+
+            self.run_live(scenario)
+            live._hub.close()
+
+    def test_sqlite_broker_prunes_without_subscribers(self):
+        """
+        Ensure publishing alone deletes events past their retention.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            broker = live.SQLiteBroker(f'{directory}/live.sqlite3', retention=60)
+            broker.publish({'type': 'votes', 'posts': [1]})
+            broker.connection.execute('UPDATE live_event SET created = created - 120')
+            broker.swept -= 60
+            broker.publish({'type': 'votes', 'posts': [2]})
+            rows = broker.connection.execute('SELECT payload FROM live_event').fetchall()
+            self.assertEqual([json.loads(payload)['posts'] for payload, in rows], [[2]])
+            broker.connection.close()
+
+    def test_nothing_published_without_streams(self):
+        """
+        Ensure writes don't build events while no stream is open in the process.
+        """
+        with mock.patch.object(live.LocalBroker, 'publish') as publish, \
+                mock.patch('blog.serializers.CommentSerializer') as serializer:
+            Comment.objects.create(post=self.posts[0], content='Unseen', author='Reader')
+            self.vote(self.posts[0], likes=1)
+        publish.assert_not_called()
+        serializer.assert_not_called()
+
+    @override_settings(BLOG_LIVE_HEARTBEAT=0.05, BLOG_LIVE_MAX_PENDING=2)
+    def test_idle_and_slow_streams(self):
+        """
+        Ensure idle streams get keepalives, and streams too far behind are closed and unsubscribed.
+        """
+        post = self.posts[1]
+
+        async def scenario():
+            streams = [LiveStream(self.application, f'posts={post.pk}') for _ in range(3)]
+            for stream in streams:
+                self.assertEqual(await stream.events(), [self.votes_event(post, 2, 0)])
+            # The hub fans the post's events out to all three
+            self.assertEqual(len(live._hub.subscriptions[post.pk]), 3)
+            self.assertEqual(await streams[0].read(), b': keepalive\n\n')
+
+            # A batch of three events from the broker: more than the streams may hold
+            live._hub.dispatch([{'type': 'comment', 'post': post.pk, 'data': {'id': i}} for i in range(3)])
+            for stream in streams:
+                chunk = await stream.read()
+                while chunk == b': keepalive\n\n':
+                    chunk = await stream.read()
+                self.assertIsNone(chunk)
+                await stream.close()
+            self.assertEqual(live._hub.subscriptions, {})
+            self.assertEqual(live._hub.counts, {})
+
+        self.run_live(scenario)
+
+    @override_settings(BLOG_LIVE_MAX_CLIENT_STREAMS=2, BLOG_LIVE_MAX_STREAMS=3)
+    def test_stream_admission(self):
+        """
+        Ensure streams are refused for a bad Host, past the read throttle, and past the per-client and process caps.
+        """
+        query = f'posts={self.posts[0].pk}'
+
+        async def refused(stream):
+            body = await stream.read()
+            await stream.close()
+            return stream.status, json.loads(body)
+
+        async def scenario():
+            status_code, body = await refused(LiveStream(self.application, query, host='evil.example'))
+            self.assertEqual((status_code, body), (400, {'detail': 'Invalid Host header.'}))
+
+            streams = [LiveStream(self.application, query) for _ in range(2)]
+            for stream in streams:
+                await stream.events()
+            status_code, body = await refused(LiveStream(self.application, query))
+            self.assertEqual((status_code, body), (429, {'detail': 'At most 2 streams per client.'}))
+
+            streams.append(LiveStream(self.application, query, client='10.0.0.2'))
+            await streams[-1].events()
+            status_code, _ = await refused(LiveStream(self.application, query, client='10.0.0.3'))
+            self.assertEqual(status_code, 503)
+            self.assertEqual(live._hub.clients, {'127.0.0.1': 2, '10.0.0.2': 1})
+
+            for stream in streams:
+                await stream.close()
+            self.assertEqual(live._hub.clients, {})
+
+            # The API's read budget covers streams too
+            with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'read': '1/min'}}):
+                stream = LiveStream(self.application, query, client='10.0.0.4')
+                await stream.events()
+                await stream.close()
+                stream = LiveStream(self.application, query, client='10.0.0.4')
+                status_code, _ = await refused(stream)
+                self.assertEqual(status_code, 429)
+                self.assertIn('retry-after', stream.headers)
+
+        self.run_live(scenario)
+
+    def test_local_broker_deploy_warning(self):
+        """
+        Ensure the deployment checks point out a broker that doesn't reach other workers.
+        """
+        self.assertEqual([error.id for error in live.check_broker(None)], ['blog.W002'])
+        with self.settings(BLOG_LIVE_BROKER=None):
+            self.assertEqual(live.check_broker(None), [])
+
+    def test_invalid_requests(self):
+        """
+        Ensure bad post lists are rejected, and the endpoint only streams over ASGI.
+        """
+        async def request(query, path=None):
+            stream = LiveStream(self.application, query, path)
+            body = await stream.read()
+            await stream.close()
+            return stream.status, json.loads(body)
+
+        for query in ['', 'posts=', 'posts=1,x', 'posts=0', 'posts=' + ','.join(map(str, range(1, 102)))]:
+            with self.subTest(query=query):
+                status_code, body = async_to_sync(request)(query)
+                self.assertEqual(status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('posts', body)
+
+        # Other requests go on to Django
+        status_code, body = async_to_sync(request)('', reverse('post-detail', kwargs={'pk': self.posts[0].pk}))
+        self.assertEqual((status_code, body['title']), (status.HTTP_200_OK, 'Live 0'))
+
+        response = self.client.get(reverse('live'), {'posts': self.posts[0].pk})
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
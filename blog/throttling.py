@@ -0,0 +1,340 @@
+"""
+Request throttling for the blog API.
+
+BlogRateThrottle replaces DRF's UserRateThrottle, which keeps a list of request timestamps per
+client in the (per-process) cache and rewrites it on every request. Here each check is one
+atomic O(1) operation on a shared store, so limits hold across every worker on the host:
+
+- Algorithm (BLOG_THROTTLE_ALGORITHM):
+  'gcra' (default): generic cell rate algorithm; one stored timestamp per client and scope,
+  requests spread evenly over the period with bursts of up to the full rate.
+  'fixed': fixed-window counter; one stored count per client, scope and window.
+- Store (BLOG_THROTTLE_STORE, a dotted path, with BLOG_THROTTLE_STORE_OPTIONS as kwargs):
+  SQLiteThrottleStore: a small SQLite file shared by the processes on one host.
+  RedisThrottleStore: any Redis-compatible server (or in-process stand-in) via a redis-py client.
+  MemoryThrottleStore: per-process, for tests and single-process deployments.
+- Scopes: 'read' for safe methods, 'write' for the others, or the view's `throttle_scope`
+  (the like/dislike actions use 'vote'). Rates come from DEFAULT_THROTTLE_RATES.
+- Async views call aallow_request(), which reaches the store through its aincr()/agcra().
+"""
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import UserRateThrottle
+
+from .metrics import timer
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_throttle_store():
+    """
+    Returns the (shared, per-process) instance of the store configured by BLOG_THROTTLE_STORE.
+    """
+    path = getattr(settings, 'BLOG_THROTTLE_STORE', 'blog.throttling.MemoryThrottleStore')
+    options = getattr(settings, 'BLOG_THROTTLE_STORE_OPTIONS', {})
+    key = (path, repr(sorted(options.items())))
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = import_string(path)(**options)
+        return _stores[key]
+
+
+class BaseThrottleStore:
+    """
+    Interface shared by all throttle stores. Both operations must be atomic across clients of the store.
+    """
+
+    def incr(self, key, expires_at):
+        """
+        Adds one to the counter `key` (created at 0, dropped at `expires_at`) and returns the new value.
+        """
+        raise NotImplementedError('.incr() must be overridden.')
+
+    def gcra(self, key, now, interval, period):
+        """
+        One GCRA step for `key`: with tat = max(stored TAT, now), the request is allowed if
+        tat + interval - now <= period, and the TAT then becomes tat + interval.
+        Returns (allowed, tat) where tat is the stored TAT after the call.
+        """
+        raise NotImplementedError('.gcra() must be overridden.')
+
+    def clear(self):
+        """
+        Forgets every counter.
+        """
+        raise NotImplementedError('.clear() must be overridden.')
+
+    # Async views (see blog/async_views.py) call these. By default the blocking operation runs
+    # in a worker thread so the event loop never waits on the store's I/O.
+
+    async def aincr(self, key, expires_at):
+        return await sync_to_async(self.incr, thread_sensitive=False)(key, expires_at)
+
+    async def agcra(self, key, now, interval, period):
+        return await sync_to_async(self.gcra, thread_sensitive=False)(key, now, interval, period)
+
+
+class MemoryThrottleStore(BaseThrottleStore):
+    """
+    Counters in a dict of this process (not shared between workers).
+    """
+    # Expired entries are swept after this many writes
+    sweep_every = 10000
+
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    def incr(self, key, expires_at):
+        now = time.time()
+        with self.lock:
+            self.sweep(now)
+            value, expires = self.values.get(key, (0, expires_at))
+            if expires <= now:
+                value, expires = 0, expires_at
+            self.values[key] = (value + 1, expires)
+            return value + 1
+
+    def gcra(self, key, now, interval, period):
+        with self.lock:
+            self.sweep(now)
+            tat = max(self.values.get(key, (now, 0))[0], now)
+            if tat + interval - now > period:
+                return False, tat
+            self.values[key] = (tat + interval, tat + interval)
+            return True, tat + interval
+
+    async def aincr(self, key, expires_at):
+        # No I/O: cheaper to run inline than to hand off to a thread
+        return self.incr(key, expires_at)
+
+    async def agcra(self, key, now, interval, period):
+        return self.gcra(key, now, interval, period)
+
+    def sweep(self, now):
+        self.writes += 1
+        if self.writes % self.sweep_every == 0:
+            self.values = {key: entry for key, entry in self.values.items() if entry[1] > now}
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+class SQLiteThrottleStore(BaseThrottleStore):
+    """
+    Counters in their own SQLite file (WAL mode), shared by every process that opens it.
+
+    Each operation is a single UPSERT ... RETURNING statement on the primary key, so it is
+    atomic without an explicit transaction. The file is separate from the main database so
+    throttle writes never wait on (or hold) the application's write lock.
+    """
+    # Probability that a write also deletes expired rows
+    sweep_probability = 0.001
+
+    def __init__(self, path, timeout=5):
+        self.path = str(path)
+        self.timeout = timeout
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS throttle (key TEXT PRIMARY KEY, value REAL NOT NULL, expires REAL NOT NULL)'
+            ' WITHOUT ROWID'
+        )
+
+    @property
+    def connection(self):
+        # sqlite3 connections can't be shared between threads; keep one per thread
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Losing the last few counter updates on power loss is acceptable
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def incr(self, key, expires_at):
+        now = time.time()
+        self.sweep(now)
+        return self.connection.execute(
+            """
+            INSERT INTO throttle (key, value, expires) VALUES (:key, 1, :expires_at)
+            ON CONFLICT (key) DO UPDATE SET
+                value = CASE WHEN expires <= :now THEN 1 ELSE value + 1 END,
+                expires = CASE WHEN expires <= :now THEN :expires_at ELSE expires END
+            RETURNING value
+            """,
+            {'key': key, 'expires_at': expires_at, 'now': now},
+        ).fetchone()[0]
+
+    def gcra(self, key, now, interval, period):
+        self.sweep(now)
+        row = self.connection.execute(
+            """
+            INSERT INTO throttle (key, value, expires) VALUES (:key, :now + :interval, :now + :interval)
+            ON CONFLICT (key) DO UPDATE SET
+                value = max(value, :now) + :interval,
+                expires = max(value, :now) + :interval
+            WHERE max(value, :now) + :interval - :now <= :period
+            RETURNING value
+            """,
+            {'key': key, 'now': now, 'interval': interval, 'period': period},
+        ).fetchone()
+        if row is not None:
+            return True, row[0]
+        # Denied: nothing was written; read the TAT back for Retry-After
+        tat = self.connection.execute('SELECT value FROM throttle WHERE key = ?', (key,)).fetchone()
+        return False, max(tat[0] if tat else now, now)
+
+    def sweep(self, now):
+        if random.random() < self.sweep_probability:
+            self.connection.execute('DELETE FROM throttle WHERE expires <= ?', (now,))
+
+    def clear(self):
+        self.connection.execute('DELETE FROM throttle')
+
+
+class RedisThrottleStore(BaseThrottleStore):
+    """
+    Counters on a Redis-compatible server, each operation a server-side Lua script.
+
+    Options: `url` (default redis://localhost:6379/0), `client_class` (dotted path of a
+    redis-py compatible client with from_url(), e.g. an in-process stand-in for local runs)
+    and `prefix` for the keys. Requires the `redis` package unless another client_class is given.
+    """
+    INCR_SCRIPT = """
+        local value = redis.call('INCR', KEYS[1])
+        if value == 1 then redis.call('PEXPIREAT', KEYS[1], ARGV[1]) end
+        return value
+    """
+    GCRA_SCRIPT = """
+        local now, interval, period = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+        local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or ARGV[1]), now)
+        if tat + interval - now > period then return {0, tostring(tat)} end
+        tat = tat + interval
+        redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+        return {1, tostring(tat)}
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', client_class='redis.Redis', prefix='blog:throttle:'):
+        try:
+            client_class = import_string(client_class)
+        except ImportError as exc:
+            raise ImproperlyConfigured(f'RedisThrottleStore needs {client_class!r}: {exc}')
+        self.client = client_class.from_url(url)
+        self.prefix = prefix
+        self.incr_script = self.client.register_script(self.INCR_SCRIPT)
+        self.gcra_script = self.client.register_script(self.GCRA_SCRIPT)
+
+    def incr(self, key, expires_at):
+        return int(self.incr_script(keys=[self.prefix + key], args=[math.ceil(expires_at * 1000)]))
+
+    def gcra(self, key, now, interval, period):
+        allowed, tat = self.gcra_script(keys=[self.prefix + key], args=[repr(now), repr(interval), repr(period)])
+        return bool(int(allowed)), float(tat)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class BlogRateThrottle(UserRateThrottle):
+    """
+    UserRateThrottle (clients identified by user ID, or IP when anonymous) with O(1) checks
+    on a shared store and separate 'read' / 'write' / 'vote' scopes (see module docstring).
+    """
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def __init__(self):
+        # Rates depend on the request's scope; resolved in allow_request()
+        pass
+
+    def get_rate(self):
+        # Read the rates at request time (SimpleRateThrottle captures them at import)
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(f"No default throttle rate set for '{self.scope}' scope")
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def allow_request(self, request, view):
+        # Reported as the request's 'throttle' timing (see blog/metrics.py)
+        with timer('throttle'):
+            key = self.prepare(request, view)
+            if key is None:
+                return True
+            store, now = get_throttle_store(), self.timer()
+            if self.algorithm == 'fixed':
+                window_key, window_end = self.window(key, now)
+                return self.fixed_allowed(store.incr(window_key, window_end), window_end, now)
+            interval = self.duration / self.num_requests
+            return self.gcra_allowed(store.gcra(key, now, interval, self.duration), interval, now)
+
+    async def aallow_request(self, request, view):
+        """
+        allow_request() for async views: the same check, with the store called through its async methods.
+        """
+        with timer('throttle'):
+            key = self.prepare(request, view)
+            if key is None:
+                return True
+            store, now = get_throttle_store(), self.timer()
+            if self.algorithm == 'fixed':
+                window_key, window_end = self.window(key, now)
+                return self.fixed_allowed(await store.aincr(window_key, window_end), window_end, now)
+            interval = self.duration / self.num_requests
+            return self.gcra_allowed(await store.agcra(key, now, interval, self.duration), interval, now)
+
+    def prepare(self, request, view):
+        """
+        Resolves the request's scope and rate; returns the client's key, or None when not throttled.
+        """
+        self.scope = self.get_scope(request, view)
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.retry_after = None
+        self.algorithm = getattr(settings, 'BLOG_THROTTLE_ALGORITHM', 'gcra')
+        if self.rate is None:
+            return None
+        return self.get_cache_key(request, view)
+
+    def window(self, key, now):
+        """
+        Fixed window: the counter key for the current window and the time the window ends.
+        """
+        window = int(now // self.duration)
+        return f'{key}:{window}', (window + 1) * self.duration
+
+    def fixed_allowed(self, count, window_end, now):
+        allowed = count <= self.num_requests
+        self.retry_after = None if allowed else window_end - now
+        return allowed
+
+    def gcra_allowed(self, result, interval, now):
+        # GCRA: one request every `interval` seconds, with a burst of up to num_requests
+        allowed, tat = result
+        self.retry_after = None if allowed else tat + interval - self.duration - now
+        return allowed
+
+    def wait(self):
+        return self.retry_after
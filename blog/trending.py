@@ -0,0 +1,71 @@
+"""
+Trending ("hot") ranking of posts: GET /api/posts/trending/.
+
+Each post stores its score in Post.trending_score, read off the (trending_score, id) index
+highest first, so a trending page is an index range scan instead of a sort of the table:
+
+    engagement = likes - dislikes + BLOG_TRENDING_COMMENT_WEIGHT * comment_count
+    score = sign(engagement) * log10(max(|engagement|, 1)) + (created_at - EPOCH) / BLOG_TRENDING_TIME_SCALE
+
+The time term grows with the post's creation time, so newer posts rank higher and a post
+BLOG_TRENDING_TIME_SCALE seconds older needs ten times the engagement to stay level. That
+gives the decay of an age-based formula, but a score only changes when its post's counts do:
+nothing needs to be re-scored as time passes.
+
+Scores are refreshed in the same UPDATE that changes the counts (votes in blog/counters.py,
+comment counts in blog/counts.py) and by the receivers in blog/signals.py for new posts.
+`manage.py recompute_trending` recomputes them all (e.g. after changing the settings above).
+"""
+from django.conf import settings
+from django.db.models import F, FloatField, Func, IntegerField, Value
+from django.db.models.functions import Abs, Greatest, Log, Sign
+
+from .models import Post
+
+# Scores count time from here, keeping the time term small
+EPOCH = 1735689600 # 2025-01-01T00:00:00Z
+
+
+def get_comment_weight():
+    return getattr(settings, 'BLOG_TRENDING_COMMENT_WEIGHT', 2)
+
+
+def get_time_scale():
+    return getattr(settings, 'BLOG_TRENDING_TIME_SCALE', 45000) # seconds
+
+
+class Epoch(Func):
+    """
+    Whole seconds since 1970-01-01 UTC of a datetime column.
+    """
+    template = 'FLOOR(EXTRACT(EPOCH FROM %(expressions)s))'
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Datetimes are stored as UTC text
+        return self.as_sql(compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)")
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='FLOOR(UNIX_TIMESTAMP(%(expressions)s))')
+
+
+def score_expression(likes=F('likes'), dislikes=F('dislikes'), comment_count=F('comment_count')):
+    """
+    The trending score of the row being updated or selected. In an UPDATE that also changes
+    the counts, pass their new values (e.g. likes=F('likes') + 1): the SET expressions of an
+    UPDATE all see the old row.
+    """
+    engagement = likes - dislikes + Value(get_comment_weight()) * comment_count
+    magnitude = Log(Value(10.0), Greatest(Abs(engagement), Value(1), output_field=FloatField()))
+    age = (Epoch('created_at') - Value(EPOCH)) / Value(float(get_time_scale()))
+    return Sign(engagement) * magnitude + age
+
+
+def refresh_trending_scores(post_ids=None):
+    """
+    Recomputes Post.trending_score (of the given posts, or all). Returns the number of posts fixed.
+    """
+    if post_ids is not None and not post_ids:
+        return 0
+    posts = Post.objects.all() if post_ids is None else Post.objects.filter(pk__in=post_ids)
+    return posts.exclude(trending_score=score_expression()).update(trending_score=score_expression())
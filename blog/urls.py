@@ -7,7 +7,12 @@ from .views import (
     CategoryViewSet, 
     CommentListCreateView,
     CommentRetrieveDestroyView,
+    CommentBulkView,
+    CommentBatchView,
+    ChangeFeedView,
 )
+from .live import live_view
+from .metrics import metrics_view, profiles_view
 
 # 1. Create a router instance
 # DefaultRouter provides the standard routes plus a default API root view
@@ -30,6 +35,8 @@ urlpatterns = [
     # /api/posts/{pk}/
     # /api/posts/{pk}/like/
     # /api/posts/{pk}/dislike/
+    # /api/posts/trending/
+    # /api/posts/bulk/
     # /api/categories/
     # /api/categories/{pk}/
     path('', include(router.urls)),
@@ -37,6 +44,30 @@ urlpatterns = [
     
     
     path('posts/<int:post_pk>/comments/', CommentListCreateView.as_view(), name='comment-list-create'),
+    path('posts/<int:post_pk>/comments/bulk/', CommentBulkView.as_view(), name='comment-bulk'),
     path('posts/<int:post_pk>/comments/<int:comment_pk>/', CommentRetrieveDestroyView.as_view(), name='comment-detail'),
+    # The latest comments of many posts at once (see blog/batch.py)
+    path('comments/', CommentBatchView.as_view(), name='comment-batch'),
+    # What changed since a change sequence number, deletes included (see blog/changes.py)
+    path('changes/', ChangeFeedView.as_view(), name='change-feed'),
+
+    # Vote counts and new comments of the given posts as Server-Sent Events, over ASGI (see blog/live.py)
+    path('live/', live_view, name='live'),
+
+    # Request metrics in Prometheus text format, and profiles of slow requests (see blog/metrics.py)
+    path('metrics/', metrics_view, name='metrics'),
+    path('metrics/profiles/', profiles_view, name='metrics-profiles'),
 ]
 
+# Routes whose GETs have an async handler ({url name: action}), used for requests served
+# over ASGI (see blog/async_views.py and drf_assess/async_urls.py)
+async_routes = {
+    'post-list': 'list',
+    'post-detail': 'retrieve',
+    'post-trending': 'trending',
+    'category-list': 'list',
+    'category-detail': 'retrieve',
+    'comment-list-create': 'list',
+    'comment-batch': 'list',
+}
+
@@ -0,0 +1,246 @@
+"""
+Read-only fast path for list pages: serializing `.values()` rows instead of model instances.
+
+A ModelSerializer spends most of a large page in per-object, per-field dispatch
+(get_attribute() / to_representation() for every field of every row, plus building the
+model instances themselves). For serializers made only of plain fields, ValuesPlan reads
+what it needs with `.values()` and builds the same dicts directly:
+
+- CharField / IntegerField / BooleanField / ReadOnlyField values are used as returned by the database
+- DateTimeField values are formatted like DateTimeField.to_representation() (a fast
+  isoformat() when the field renders ISO 8601 in UTC, the field itself otherwise)
+- PrimaryKeyRelatedField: the foreign key column
+- many=True PrimaryKeyRelatedField over a ManyToManyField: the IDs of the whole page,
+  from one query on the through table (replacing prefetch_related())
+- EmbeddedField: data the view loads for the whole page (e.g. blog/include.py)
+
+The output is the same JSON as `serializer.data`. Views opt in with ValuesListMixin.
+"""
+import datetime
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import models
+from rest_framework import fields, relations, serializers
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+from .metrics import timer
+
+class EmbeddedField(serializers.Field):
+    """
+    Read-only field for data the view loads for a whole page at once, found by primary key in
+    context['embedded'][field name] (see blog/include.py).
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(source='pk', read_only=True, **kwargs)
+
+    def to_representation(self, pk):
+        return self.context['embedded'][self.field_name].get(pk, [])
+
+
+# Serializer fields whose to_representation() leaves database values unchanged
+PLAIN_FIELDS = (fields.CharField, fields.IntegerField, fields.BooleanField, fields.ReadOnlyField)
+
+
+def is_utc(tz):
+    return tz is datetime.timezone.utc or getattr(tz, 'key', None) == 'UTC'
+
+
+def datetime_converter(field):
+    """
+    Returns a function formatting datetimes exactly like `field.to_representation()`.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if (
+        output_format is None or output_format.lower() != ISO_8601
+        or hasattr(field, 'timezone') or not is_utc(field.default_timezone())
+    ):
+        return field.to_representation
+
+    def convert(value):
+        # Aware UTC datetimes (what the database backends return) need no conversion
+        if value.tzinfo is not datetime.timezone.utc:
+            return field.to_representation(value)
+        return value.isoformat()[:-6] + 'Z'
+
+    return convert
+
+
+class ValuesPlan:
+    """
+    How to build a serializer's output from `.values()` rows (see module docstring), for the
+    fields of the given serializer instance. Raises ImproperlyConfigured for serializers with
+    fields it can't reproduce.
+    """
+
+    def __init__(self, serializer):
+        serializer_class = type(serializer)
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.pk_name = self.model._meta.pk.name
+        # [(output name, values() key, serializer field or None), ...] in output order
+        self.columns = []
+        # {output name: (through model, owner column, target column)}
+        self.many = {}
+
+        for field in serializer._readable_fields:
+            source = field.source
+            if '.' in source or source == '*':
+                raise self.unsupported(field)
+            if isinstance(field, EmbeddedField):
+                # Supplied with the many-to-many IDs (see ValuesListMixin.get_values_related())
+                self.columns.append((field.field_name, None, None))
+            elif isinstance(field, relations.ManyRelatedField):
+                self.add_many(field)
+            elif isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+                self.columns.append((field.field_name, source, None))
+            elif isinstance(field, fields.DateTimeField):
+                self.columns.append((field.field_name, source, field))
+            elif type(field) in PLAIN_FIELDS:
+                self.columns.append((field.field_name, source, None))
+            else:
+                raise self.unsupported(field)
+
+    def add_many(self, field):
+        child = field.child_relation
+        try:
+            model_field = self.model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            model_field = None
+        if (
+            not isinstance(child, relations.PrimaryKeyRelatedField) or child.pk_field is not None
+            or not isinstance(model_field, models.ManyToManyField)
+        ):
+            raise self.unsupported(field)
+        through = model_field.remote_field.through
+        owner = through._meta.get_field(model_field.m2m_field_name()).attname
+        target = through._meta.get_field(model_field.m2m_reverse_field_name()).attname
+        self.columns.append((field.field_name, None, None))
+        self.many[field.field_name] = (through, owner, target)
+
+    def unsupported(self, field):
+        return ImproperlyConfigured(
+            f'{self.serializer_class.__name__}.{field.field_name} ({type(field).__name__}) '
+            f'cannot be serialized from .values() rows.'
+        )
+
+    def get_queryset(self, queryset):
+        """
+        `queryset` as .values() rows with every column the output and the ordering need
+        (keyset pagination builds its cursors from the ordering columns).
+        """
+        names = [self.pk_name, *(source for _, source, _ in self.columns if source is not None)]
+        names += [
+            name.lstrip('-') for name in queryset.query.order_by
+            if isinstance(name, str) and name != '?'
+        ]
+        return queryset.prefetch_related(None).values(*dict.fromkeys(names))
+
+    # --- Many-to-many IDs ---
+
+    def related_queries(self, rows):
+        pks = [row[self.pk_name] for row in rows]
+        for name, (through, owner, target) in self.many.items():
+            # Walks the through table's (owner, target) unique index, like the prefetch it replaces
+            query = through.objects.filter(**{f'{owner}__in': pks}).order_by(owner, target)
+            yield name, query.values_list(owner, target)
+
+    def load_related(self, rows):
+        """
+        Returns {field name: {owner pk: [target pks]}} for the many-to-many fields of `rows`.
+        """
+        related = {}
+        for name, query in self.related_queries(rows) if rows else ():
+            related[name] = self.group(query)
+        return related
+
+    async def aload_related(self, rows):
+        """
+        load_related() through the async ORM.
+        """
+        related = {}
+        for name, query in self.related_queries(rows) if rows else ():
+            related[name] = self.group([pair async for pair in query])
+        return related
+
+    def group(self, pairs):
+        grouped = defaultdict(list)
+        for owner, target in pairs:
+            grouped[owner].append(target)
+        return grouped
+
+    # --- Output ---
+
+    def serialize(self, rows, related):
+        """
+        The serializer's output for `rows`, with many-to-many IDs from load_related() (and the
+        data of any EmbeddedField) in `related`.
+        """
+        pk_name = self.pk_name
+        columns = [
+            (name, source, datetime_converter(field) if field is not None else None, related.get(name))
+            for name, source, field in self.columns
+        ]
+        data = []
+        with timer('serializer'):
+            for row in rows:
+                item = {}
+                for name, source, convert, many in columns:
+                    if many is not None:
+                        item[name] = many.get(row[pk_name], [])
+                        continue
+                    value = row[source]
+                    item[name] = value if convert is None or value is None else convert(value)
+                data.append(item)
+        return data
+
+
+class ValuesListMixin:
+    """
+    View mixin serving `list` from `.values()` rows (see module docstring) when
+    `list_from_values` is set. Goes after CachedResponseMixin, so the responses are cached
+    as usual, and before AsyncReadMixin, whose async handlers it also replaces.
+    """
+    list_from_values = True
+    # {(serializer class, (field name, source), ...): ValuesPlan}, shared by every view using
+    # this mixin; a serializer can give several field sets (see blog/sparse.py)
+    _values_plans = {}
+
+    def get_values_plan(self):
+        serializer = self.get_serializer()
+        key = (type(serializer), *((field.field_name, field.source) for field in serializer._readable_fields))
+        plan = self._values_plans.get(key)
+        if plan is None:
+            plan = self._values_plans[key] = ValuesPlan(serializer)
+        return plan
+
+    def list(self, request, *args, **kwargs):
+        if not self.list_from_values:
+            return super().list(request, *args, **kwargs)
+        plan = self.get_values_plan()
+        queryset = plan.get_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        data = plan.serialize(rows, self.get_values_related(plan, rows))
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+    async def alist(self, request, *args, **kwargs):
+        if not self.list_from_values:
+            return await super().alist(request, *args, **kwargs)
+        plan = self.get_values_plan()
+        queryset = plan.get_queryset(await self.afilter_queryset(self.get_queryset()))
+        page = await self.apaginate_queryset(queryset)
+        rows = [row async for row in queryset.aiterator()] if page is None else page
+        data = plan.serialize(rows, await self.aget_values_related(plan, rows))
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+    def get_values_related(self, plan, rows):
+        """
+        Data loaded for the page besides the rows: {field name: {pk: value}}.
+        """
+        return plan.load_related(rows)
+
+    async def aget_values_related(self, plan, rows):
+        return await plan.aload_related(rows)
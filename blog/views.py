@@ -1,14 +1,102 @@
+from django.http import Http404, StreamingHttpResponse
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, status, viewsets, filters
 from rest_framework.response import Response
 from rest_framework.exceptions import NotFound
 from rest_framework.decorators import action
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle # Import throttle classes
 from .models import Post, Comment, Category 
 from .serializers import PostSerializer, CommentSerializer, CategorySerializer 
+from .serializers import PostBulkListSerializer, CommentBulkListSerializer
+from .counters import get_vote_counter
+from .pagination import FeedPagination, KeysetPagination
+from .filters import PostSearchFilter
+from .cache import CachedResponseMixin
+from .async_views import AsyncReadMixin
+from .values import ValuesListMixin
+from .registry import RegistryReadMixin, category_registry
+from .batch import CommentBatchMixin
+from .changes import ChangeFeedMixin
+from .sparse import SparseFieldsMixin
+from .include import IncludeMixin
+from .throttling import BlogRateThrottle
+from .export import post_rows, comment_rows, POST_EXPORT_FIELDS, COMMENT_EXPORT_FIELDS
+from .renderers import NDJSONRenderer, CSVRenderer
 
 
+class BulkWriteMixin:
+    """
+    Helpers for batch write endpoints.
 
-class PostViewSet(viewsets.ModelViewSet):
+    Items are validated one by one (see BulkListSerializer) and the valid ones saved with a
+    handful of bulk queries. Invalid items are reported as {'index': i, 'errors': {...}} and
+    don't stop the rest unless the client asks for ?atomic=true, in which case nothing is
+    saved unless every item is valid.
+    """
+    bulk_serializer_class = None
+
+    def is_atomic_bulk(self, request):
+        return request.query_params.get('atomic', '').lower() in ('1', 'true', 'yes')
+
+    def get_bulk_output(self, objects):
+        """
+        Objects to serialize in the response for the saved items.
+        """
+        return objects
+
+    def bulk_save(self, request, instances=None, **save_kwargs):
+        """
+        Creates (instances=None) or updates ({pk: object}) one object per item in request.data.
+        """
+        partial = instances is not None
+        serializer = self.bulk_serializer_class(
+            instance=instances,
+            data=request.data,
+            child=self.get_serializer_class()(partial=partial),
+            partial=partial,
+            context=self.get_serializer_context(),
+        )
+        # Only list-level problems (not a list, too many items) fail here
+        serializer.is_valid(raise_exception=True)
+        errors = serializer.errors_list
+        if errors and (self.is_atomic_bulk(request) or not serializer.validated_data):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        saved = serializer.save(**save_kwargs)
+        data = self.get_serializer(self.get_bulk_output(saved), many=True).data
+        key = 'updated' if partial else 'created'
+        if errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_200_OK if partial else status.HTTP_201_CREATED
+        return Response({key: data, 'errors': errors}, status=response_status)
+
+    def bulk_destroy(self, request, queryset):
+        """
+        Deletes the objects of `queryset` listed in request.data['ids'].
+        """
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            return Response({'ids': ['Expected a list of integer IDs.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        found = set(queryset.filter(pk__in=ids).values_list('pk', flat=True))
+        name = queryset.model.__name__
+        errors = [
+            {'index': index, 'errors': {'id': [f'{name} with ID {pk} not found.']}}
+            for index, pk in enumerate(ids) if pk not in found
+        ]
+        if errors and (self.is_atomic_bulk(request) or not found):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One DELETE ... WHERE id IN (...) (plus cascades) for the whole batch
+        queryset.filter(pk__in=found).delete()
+        response_status = status.HTTP_207_MULTI_STATUS if errors else status.HTTP_200_OK
+        return Response({'deleted': sorted(found), 'errors': errors}, status=response_status)
+
+
+class PostViewSet(
+    CachedResponseMixin, SparseFieldsMixin, IncludeMixin, ValuesListMixin, AsyncReadMixin, BulkWriteMixin,
+    viewsets.ModelViewSet,
+):
     """
     ViewSet providing complete CRUD operations for Posts, plus like/dislike actions.
 
@@ -20,22 +108,47 @@ class PostViewSet(viewsets.ModelViewSet):
     - Delete a Post (DELETE /api/posts/{pk}/)
     - Like a Post (POST /api/posts/{pk}/like/)
     - Dislike a Post (POST /api/posts/{pk}/dislike/)
+    - Trending Posts, highest score first (GET /api/posts/trending/, see blog/trending.py)
+    - Batch create/update/delete Posts (POST/PATCH/DELETE /api/posts/bulk/)
+    - Export Posts / their Comments as NDJSON or CSV (GET /api/posts/export/, GET /api/posts/export/comments/)
 
     Supports filtering, searching, and ordering:
     - Filter by author: ?author=<author_name>
     - Filter by category ID: ?categories=<category_id>
-    - Search title/content: ?search=<search_term>
+    - Search title/content: ?search=<search_term> (full-text, best matches first)
     - Order results: ?ordering=<field_name> (e.g., likes, -created_at)
+
+    List/detail responses can leave fields out (see blog/sparse.py):
+    - Only some fields: ?fields=id,title or all but some: ?exclude=content
+    - Truncated content: ?content_preview=<n> (first n characters)
+
+    ...or embed related objects (see blog/include.py):
+    - ?include=categories: category objects instead of IDs
+    - ?include=comments: each post's latest comments (?comments_limit=<n>, default 5)
+
+    Supports page-number and keyset pagination (see blog.pagination.FeedPagination):
+    - Page size: ?page_size=<n> (capped at 100)
+    - Keyset pages: ?pagination=cursor, then follow 'next'/'previous' (?cursor=...)
+    - Skip the total count in keyset mode: ?count=false
+
+    List/detail responses are cached (see blog/cache.py); detail responses carry
+    ETag/Last-Modified and answer conditional requests with 304 Not Modified.
+    Lists are serialized straight from .values() rows (see blog/values.py).
+    Under ASGI, list/detail GETs are served by async handlers (see blog/async_views.py).
     """
     # --- Basic ViewSet Configuration ---
-    queryset = Post.objects.all().order_by('-created_at') # Default ordering
+    # Default ordering; categories are fetched for the whole page in one extra query
+    queryset = Post.objects.prefetch_related('categories').order_by('-created_at')
     serializer_class = PostSerializer
+    bulk_serializer_class = PostBulkListSerializer
+    # Page-number pages by default, keyset pages over (-created_at, -id) on request
+    pagination_class = FeedPagination
 
     # --- Throttling Configuration ---
-    # Apply throttling (adjust class based on auth: UserRateThrottle or AnonRateThrottle)
-    #  'user' or 'anon' scope is defined in settings.DEFAULT_THROTTLE_RATES
-    throttle_classes = [UserRateThrottle]
-    # throttle_scope = 'user' # Explicit scope (optional if using default 'user'/'anon')
+    # Per user (or IP): 'read' scope for GETs, 'write' for other methods, 'vote' for like/dislike
+    # Rates are defined in settings.DEFAULT_THROTTLE_RATES (see blog/throttling.py)
+    throttle_classes = [BlogRateThrottle]
+    throttle_scope = None # Overridden per action (e.g. like/dislike), otherwise read/write by method
 
   
 
@@ -44,94 +157,254 @@ class PostViewSet(viewsets.ModelViewSet):
         'author': ['exact'], # Allow filtering like ?author=JohnDoe
         'categories': ['exact'] # Allow filtering like ?categories=1 (by Category ID)
     }
-    # Fields available for ?search=term searching (requires SearchFilter)
+    # Field filtering, indexed full-text search (see blog/search.py) and ordering
+    filter_backends = [DjangoFilterBackend, PostSearchFilter, filters.OrderingFilter]
+    # Fields available for ?search=term searching (used as-is by the non-indexed search backend)
     search_fields = ['title', 'content']
     # Fields available for ?ordering=field sorting (requires OrderingFilter)
-    ordering_fields = ['created_at', 'updated_at', 'likes', 'dislikes', 'author', 'title']
+    ordering_fields = ['created_at', 'updated_at', 'likes', 'dislikes', 'comment_count', 'author', 'title']
     # ordering = ['-created_at'] # Set default ordering via queryset is often preferred
 
+    # --- Sparse Fieldsets and Embedded Relations (?fields=, ?include=) ---
+    sparse_actions = ('list', 'retrieve', 'trending')
+    include_actions = ('list', 'retrieve', 'trending')
+    include_serializers = {'categories': CategorySerializer, 'comments': CommentSerializer}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'trending':
+            # Read backwards off blog_post_trending_idx: no sort, whatever the table size
+            queryset = queryset.order_by('-trending_score', '-id')
+        return queryset
+
+    # --- Response Caching ---
+    conditional_cache = True # ETag/Last-Modified on GET /api/posts/{pk}/
+
+    def get_cache_scopes(self):
+        scopes = [f"post:{self.kwargs.get('pk')}"] if self.action == 'retrieve' else ['posts']
+        # Comment writes bump their post's scopes; category changes only bump 'categories'
+        if 'categories' in self.get_includes():
+            scopes.append('categories')
+        return scopes
+
 
     # --- Custom Actions for Like/Dislike ---
 
-    @action(detail=True, methods=['post'], url_path='like')
+    @action(detail=True, methods=['post'], url_path='like', throttle_scope='vote')
     def like(self, request, pk=None):
         """
         Action to increment the like count for a specific post.
         Accessible via POST request to /api/posts/{pk}/like/
         """
-        # Retrieve the specific Post instance using the primary key from the URL
-        post = self.get_object()
-        # Increment the likes field
-        post.likes += 1
-        # Save only the 'likes' field for efficiency
-        post.save(update_fields=['likes'])
+        # Increment through the configured vote counter (atomic, no read-modify-write)
+        likes = self._vote('likes')
         # Return a success response with the updated like count
         return Response(
-            {'status': 'post liked', 'likes': post.likes},
+            {'status': 'post liked', 'likes': likes},
             status=status.HTTP_200_OK
         )
 
-    @action(detail=True, methods=['post'], url_path='dislike')
+    @action(detail=True, methods=['post'], url_path='dislike', throttle_scope='vote')
     def dislike(self, request, pk=None):
         """
         Action to increment the dislike count for a specific post.
         Accessible via POST request to /api/posts/{pk}/dislike/
         """
-        # Retrieve the specific Post instance
-        post = self.get_object()
-        # Increment the dislikes field
-        post.dislikes += 1
-        # Save only the 'dislikes' field for efficiency
-        post.save(update_fields=['dislikes'])
+        # Increment through the configured vote counter
+        dislikes = self._vote('dislikes')
         # Return a success response with the updated dislike count
         return Response(
-            {'status': 'post disliked', 'dislikes': post.dislikes},
+            {'status': 'post disliked', 'dislikes': dislikes},
             status=status.HTTP_200_OK
         )
 
+    def _vote(self, field):
+        """
+        Records a vote on the post from the URL and returns the new count.
+        The counter's UPDATE doubles as the existence check, so the post row is never fetched.
+        """
+        post_id = self.kwargs.get('pk')
+        try:
+            return get_vote_counter().increment(int(post_id), field)
+        except (Post.DoesNotExist, ValueError):
+            raise NotFound(detail=f"Post with ID {post_id} not found.")
+
+    # --- Trending ---
+
+    @action(detail=False, methods=['get'], url_path='trending', filter_backends=[], pagination_class=KeysetPagination)
+    def trending(self, request):
+        """
+        Action to list posts by trending score (see blog/trending.py), highest first, in keyset
+        pages (?page_size=<n>, follow 'next'/'previous'; ?count=false skips the total).
+        Accessible via GET /api/posts/trending/
+        """
+        return self.list(request)
+
+    async def atrending(self, request):
+        return await self.alist(request)
+
+    # --- Batch Writes ---
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Action to create, update or delete many posts in one request.
+        Accessible via /api/posts/bulk/
+        - POST   [{"title": ..., "content": ..., "author": ..., "categories": [...]}, ...]
+        - PATCH  [{"id": 1, <fields to change>}, ...]
+        - DELETE {"ids": [1, 2, ...]}
+        Add ?atomic=true to save nothing unless every item is valid.
+        """
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request, Post.objects.all())
+        if request.method == 'PATCH':
+            ids = [item.get('id') for item in request.data if isinstance(item, dict)] if isinstance(request.data, list) else []
+            pks = [pk for pk in ids if isinstance(pk, int) and not isinstance(pk, bool)]
+            return self.bulk_save(request, instances=Post.objects.in_bulk(pks))
+        return self.bulk_save(request)
+
+    def get_bulk_output(self, posts):
+        # Re-read the saved posts with their categories prefetched (two queries for the batch)
+        return self.get_queryset().filter(pk__in=[post.pk for post in posts]).order_by('pk')
 
+    # --- Streaming Exports ---
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """
+        Action to stream every post matching the list filters (?author=, ?categories=, ?search=,
+        ?ordering=), unpaginated, with category IDs/names and comment counts.
+        Accessible via GET /api/posts/export/ (NDJSON; ?format=csv for CSV)
+        """
+        posts = self.filter_queryset(self.get_queryset())
+        return self.stream_export(post_rows(posts), POST_EXPORT_FIELDS, 'posts')
+
+    @action(detail=False, methods=['get'], url_path='export/comments', renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export_comments(self, request):
+        """
+        Action to stream the comments of every post matching the list filters, grouped by post.
+        Accessible via GET /api/posts/export/comments/ (NDJSON; ?format=csv for CSV)
+        """
+        posts = self.filter_queryset(self.get_queryset())
+        comments = Comment.objects.filter(post__in=posts.values('pk')).order_by('post_id', 'pk')
+        return self.stream_export(comment_rows(comments), COMMENT_EXPORT_FIELDS, 'comments')
+
+    def stream_export(self, rows, fields, name):
+        """
+        Streams `rows` with the negotiated renderer; nothing is fetched until the client reads.
+        """
+        renderer = self.request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(rows, fields),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{name}.{renderer.format}"'
+        return response
+
+
+
+class CategoryViewSet(CachedResponseMixin, RegistryReadMixin, AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     Read-only ViewSet for listing and retrieving Categories.
 
     Includes:
     - List Categories (GET /api/categories/)
     - Retrieve a Category (GET /api/categories/{pk}/)
+
+    Both are served from the in-process category registry, with no query while categories
+    don't change (see blog/registry.py).
+    Under ASGI, both are served by async handlers (see blog/async_views.py).
     """
+    registry = category_registry
     queryset = Category.objects.all().order_by('name')
     serializer_class = CategorySerializer
-    
-    throttle_classes = [UserRateThrottle]
+    # ?ordering=-post_count lists the busiest categories first
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['name', 'post_count']
+
+    throttle_classes = [BlogRateThrottle]
+
+    def get_cache_scopes(self):
+        return ['categories']
 
 # ==============================================================================
 # Comment Views (Using Generic Views for Nested Structure)
 # ==============================================================================
 
-class CommentListCreateView(generics.ListCreateAPIView):
+class NestedCommentMixin:
+    """
+    Shared by the views nested under /api/posts/{post_pk}/comments/.
+
+    The parent post is never fetched: comment queries filter on post_id directly, and the post's
+    existence is only checked (with a cheap EXISTS) when a lookup comes back empty or before a
+    write, so a missing post still gets its 404 "Post with ID ... not found." response.
+    """
+
+    def get_post_id(self):
+        return self.kwargs.get('post_pk')
+
+    def check_post_exists(self):
+        """
+        Raises 404 if the parent post doesn't exist (checked at most once per request).
+        """
+        if getattr(self, '_post_exists', False):
+            return
+        post_id = self.get_post_id()
+        if not Post.objects.filter(pk=post_id).exists():
+            raise NotFound(detail=f"Post with ID {post_id} not found.")
+        self._post_exists = True
+
+    async def acheck_post_exists(self):
+        """
+        check_post_exists() for async views.
+        """
+        if getattr(self, '_post_exists', False):
+            return
+        post_id = self.get_post_id()
+        if not await Post.objects.filter(pk=post_id).aexists():
+            raise NotFound(detail=f"Post with ID {post_id} not found.")
+        self._post_exists = True
+
+
+class CommentListCreateView(NestedCommentMixin, CachedResponseMixin, SparseFieldsMixin, ValuesListMixin, AsyncReadMixin, generics.ListCreateAPIView):
     """
     API endpoint that allows comments for a specific post to be viewed or created.
     Handles GET (list) and POST (create) for /api/posts/{post_pk}/comments/
+    Lists support ?page_size=<n>, keyset pages via ?pagination=cursor and ?fields=, ?exclude=
+    and ?content_preview=<n> (see PostViewSet), and are serialized straight from .values()
+    rows (see blog/values.py).
+    Under ASGI, GETs are served by an async handler (see blog/async_views.py).
     """
     serializer_class = CommentSerializer
-    # Apply throttling (adjust class based on auth)
-    throttle_classes = [UserRateThrottle]
+    pagination_class = FeedPagination
+    # Apply throttling ('read' / 'write' scopes, see blog/throttling.py)
+    throttle_classes = [BlogRateThrottle]
+
+    def get_cache_scopes(self):
+        return [f"comments:{self.get_post_id()}"]
 
     def get_queryset(self):
         """
         Overrides default queryset to filter comments based on the 'post_pk'
         captured from the URL. Ensures comments shown belong only to the specified post.
-        Also handles 404 if the post itself doesn't exist.
         """
-        # Get the post primary key from the URL kwargs
-        post_id = self.kwargs.get('post_pk')
-        # Verify the parent Post exists, otherwise raise 404
-        try:
-            Post.objects.get(pk=post_id)
-        except Post.DoesNotExist:
-            raise NotFound(detail=f"Post with ID {post_id} not found.")
-        # Return only comments related to the specific post
-        return Comment.objects.filter(post_id=post_id).order_by('-created_at')
+        # Return only comments related to the specific post (no query for the post itself)
+        return Comment.objects.filter(post_id=self.get_post_id()).order_by('-created_at')
+
+    def paginate_queryset(self, queryset):
+        """
+        An empty page may mean the post doesn't exist: only then is the post looked up (404 if missing).
+        """
+        page = super().paginate_queryset(queryset)
+        if not page:
+            self.check_post_exists()
+        return page
+
+    async def apaginate_queryset(self, queryset):
+        page = await super().apaginate_queryset(queryset)
+        if not page:
+            await self.acheck_post_exists()
+        return page
 
     def perform_create(self, serializer):
         """
@@ -140,46 +413,101 @@ class CommentListCreateView(generics.ListCreateAPIView):
         identified by 'post_pk' in the URL, removing the need to send 'post' in the request body.
         Handles 404 if the post doesn't exist.
         """
-        # Get the post primary key from the URL kwargs
-        post_id = self.kwargs.get('post_pk')
-        # Retrieve the parent Post instance
-        try:
-            post = Post.objects.get(pk=post_id)
-        except Post.DoesNotExist:
-            # Should not happen if get_queryset logic is sound, but good practice to check
-            raise NotFound(detail=f"Post with ID {post_id} not found.")
-        # Save the comment instance, injecting the parent post relationship
-        serializer.save(post=post)
+        # Check the parent Post exists without fetching it, then save by ID
+        self.check_post_exists()
+        serializer.save(post_id=self.get_post_id())
 
 
-class CommentRetrieveDestroyView(generics.RetrieveDestroyAPIView):
+class CommentRetrieveDestroyView(NestedCommentMixin, CachedResponseMixin, SparseFieldsMixin, generics.RetrieveDestroyAPIView):
     """
     API endpoint that allows a specific comment to be retrieved or deleted.
     Handles GET (retrieve) and DELETE (destroy) for /api/posts/{post_pk}/comments/{comment_pk}/
+    GETs support ?fields=, ?exclude= and ?content_preview=<n> (see blog/sparse.py).
     """
     serializer_class = CommentSerializer
-    # Apply throttling (adjust class based on auth)
-    throttle_classes = [UserRateThrottle]
+    # Apply throttling ('read' / 'write' scopes, see blog/throttling.py)
+    throttle_classes = [BlogRateThrottle]
     # Specify which URL kwarg contains the primary key for *this* view's object (the comment)
     lookup_url_kwarg = 'comment_pk'
 
+    def get_cache_scopes(self):
+        return [f"comments:{self.get_post_id()}"]
+
     def get_queryset(self):
         """
         Overrides default queryset to ensure the retrieved/deleted comment
         belongs to the specific post identified by 'post_pk' in the URL.
         Prevents accessing a comment through the wrong post's URL.
-        Handles 404 if the post or the specific comment doesn't exist for that post.
         """
-        # Get keys from the URL kwargs
-        post_id = self.kwargs.get('post_pk')
-        comment_id = self.kwargs.get('comment_pk') # The ID for the comment itself
+        # Filter comments matching both the post ID and the comment ID
+        # This ensures the comment actually belongs to the specified post
+        return Comment.objects.filter(post_id=self.get_post_id(), pk=self.kwargs.get('comment_pk'))
 
-        # Optional: Verify the parent Post exists first (improves clarity of 404s)
+    def get_object(self):
+        """
+        One query when the comment exists; on a miss, 404s for a missing post keep their own message.
+        """
         try:
-            Post.objects.get(pk=post_id)
-        except Post.DoesNotExist:
-            raise NotFound(detail=f"Post with ID {post_id} not found.")
+            return super().get_object()
+        except Http404:
+            self.check_post_exists()
+            raise
 
-        # Filter comments matching both the post ID and the comment ID
-        # This ensures the comment actually belongs to the specified post
-        return Comment.objects.filter(post_id=post_id, pk=comment_id)
\ No newline at end of file
+
+class CommentBatchView(CachedResponseMixin, SparseFieldsMixin, CommentBatchMixin, ValuesListMixin, AsyncReadMixin, generics.ListAPIView):
+    """
+    API endpoint returning the latest comments of many posts at once, grouped by post.
+    Handles GET for /api/comments/?posts=1,2,3&limit=<n>, with a keyset cursor per post for
+    loading more (?posts=1:<cursor>), from one query (see blog/batch.py).
+    Supports ?fields=, ?exclude= and ?content_preview=<n> (see blog/sparse.py).
+    Under ASGI, GETs are served by an async handler (see blog/async_views.py).
+    """
+    serializer_class = CommentSerializer
+    filter_backends = []
+    pagination_class = None
+    # Apply throttling ('read' / 'write' scopes, see blog/throttling.py)
+    throttle_classes = [BlogRateThrottle]
+
+    def get_cache_scopes(self):
+        return [f"comments:{pk}" for pk, _ in self.get_batch()]
+
+    def get_queryset(self):
+        # Same order as the nested comment lists, so their cursors carry over
+        return Comment.objects.order_by('-created_at')
+
+
+
+class ChangeFeedView(ChangeFeedMixin, generics.GenericAPIView):
+    """
+    API endpoint listing the posts, comments and categories changed since a change sequence
+    number, with tombstones for deleted ones, for consumers keeping a mirror in sync.
+    Handles GET for /api/changes/?updated_since=<seq>&limit=<n> (see blog/changes.py).
+    """
+    feed_serializers = {'post': PostSerializer, 'comment': CommentSerializer, 'category': CategorySerializer}
+    # Apply throttling ('read' / 'write' scopes, see blog/throttling.py)
+    throttle_classes = [BlogRateThrottle]
+
+
+class CommentBulkView(NestedCommentMixin, BulkWriteMixin, generics.GenericAPIView):
+    """
+    API endpoint that creates or deletes many comments of a specific post in one request.
+    Handles POST (create) and DELETE (destroy) for /api/posts/{post_pk}/comments/bulk/
+    - POST   [{"content": ..., "author": ...}, ...]
+    - DELETE {"ids": [1, 2, ...]} (only comments of this post)
+    Add ?atomic=true to save nothing unless every item is valid.
+    """
+    serializer_class = CommentSerializer
+    bulk_serializer_class = CommentBulkListSerializer
+    # Apply throttling ('read' / 'write' scopes, see blog/throttling.py)
+    throttle_classes = [BlogRateThrottle]
+
+    def get_queryset(self):
+        return Comment.objects.filter(post_id=self.get_post_id())
+
+    def post(self, request, *args, **kwargs):
+        self.check_post_exists()
+        return self.bulk_save(request, post_id=self.get_post_id())
+
+    def delete(self, request, *args, **kwargs):
+        self.check_post_exists()
+        return self.bulk_destroy(request, self.get_queryset())
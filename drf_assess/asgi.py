@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "drf_assess.settings")
+# Read by the settings: no persistent database connections under ASGI
+os.environ.setdefault("BLOG_SERVER", "asgi")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Live update streams (GET /api/live/) are served in front of Django (see blog/live.py)
+from blog.live import LiveApplication  # noqa: E402
+
+application = LiveApplication(django_application)
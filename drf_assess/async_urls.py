@@ -0,0 +1,13 @@
+"""
+URL configuration for requests served over ASGI.
+
+The same URLs as drf_assess.urls, with the blog's read endpoints routed to their async views
+(see blog/async_views.py). Selected per request by blog.async_views.AsyncURLConfMiddleware.
+"""
+
+from blog.async_views import async_urlpatterns
+from blog.urls import async_routes
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = async_urlpatterns(sync_urlpatterns, async_routes)
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +47,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole stack (see blog/metrics.py)
+    "blog.metrics.RequestMetricsMiddleware",
+    # ASGI only: routes the blog's read endpoints to async views (see blog/async_views.py)
+    "blog.async_views.AsyncURLConfMiddleware",
+    # With BLOG_READ_REPLICAS: routes reads to replicas, pins writers to the primary (see blog/replicas.py)
+    "blog.replicas.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -54,6 +63,8 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = "drf_assess.urls"
+# URL configuration for requests served over ASGI (None: the sync views serve everything)
+BLOG_ASYNC_URLCONF = "drf_assess.async_urls"
 
 TEMPLATES = [
     {
@@ -76,12 +87,53 @@ WSGI_APPLICATION = "drf_assess.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuned for serving (see blog/sqlite.py): transactions that take the write lock as they
+# begin, and connection lifetimes picked by profile, with the BLOG_DB_PROFILE environment variable:
+# - "development" (default, also used by tests): a connection per request
+# - "production": connections kept open between requests (checked before reuse), except under
+#   ASGI (drf_assess/asgi.py), where each request gets its own thread and a kept connection
+#   would never be reused
+DATABASE_PROFILES = {
+    "development": {"CONN_MAX_AGE": 0},
+    "production": {"CONN_MAX_AGE": 600}, # seconds
+}
+BLOG_DB_PROFILE = os.environ.get("BLOG_DB_PROFILE", "development")
+if BLOG_DB_PROFILE not in DATABASE_PROFILES:
+    raise ImproperlyConfigured(
+        f"Unknown BLOG_DB_PROFILE {BLOG_DB_PROFILE!r}; choose one of: {', '.join(DATABASE_PROFILES)}."
+    )
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+        },
+        **DATABASE_PROFILES[BLOG_DB_PROFILE],
     }
 }
+if os.environ.get("BLOG_SERVER") == "asgi":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+
+# Read replicas (see blog/replicas.py): aliases in DATABASES holding replicated copies of
+# "default", e.g. "replica1": {"ENGINE": ..., "NAME": ...}. [] sends everything to "default".
+DATABASE_ROUTERS = ["blog.replicas.ReplicaRouter"]
+BLOG_READ_REPLICAS = []
+# After a write, the client's reads stay on the primary this long (read-your-own-writes)
+BLOG_REPLICA_STICKY_SECONDS = 5
+# Cached responses built from replica reads expire this soon (replication lag bound)
+BLOG_REPLICA_CACHE_TIMEOUT = 5 # seconds
+
+# PRAGMAs run on every new SQLite connection (see blog/sqlite.py); {} keeps SQLite's defaults
+BLOG_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000, # KiB (negative), i.e. 64 MB of page cache per connection
+    "mmap_size": 268435456, # 256 MB
+    "busy_timeout": 10000, # milliseconds
+    "temp_store": "MEMORY",
+}
 
 
 
@@ -89,9 +141,20 @@ REST_FRAMEWORK = {
 
     
     # pagination settings
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # DRF's PageNumberPagination, with an async variant for the async read path
+    'DEFAULT_PAGINATION_CLASS': 'blog.pagination.AsyncPageNumberPagination',
     'PAGE_SIZE': 4, # Show 4 items per page
 
+    # JSON through orjson when installed, same output as DRF's (see blog/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'blog.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'blog.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 
 
 
@@ -105,19 +168,113 @@ REST_FRAMEWORK = {
 
 
       'DEFAULT_THROTTLE_CLASSES': [
-        # Add UserRateThrottle here
-        'rest_framework.throttling.UserRateThrottle',
+        # Per user (or IP) limits with separate read/write/vote scopes (see blog/throttling.py)
+        'blog.throttling.BlogRateThrottle',
         # AnonRateThrottle for unauthenticated users if you have mixed access
         # 'rest_framework.throttling.AnonRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         # Define a scope named 'user' that UserRateThrottle uses by default
         'user': '100/day',  #  100 requests per user per day
+        # Scopes used by BlogRateThrottle, each with its own budget per user. Together they
+        # add up to the single 100/day budget every request used to share.
+        'read': '60/day',   # GET/HEAD/OPTIONS
+        'write': '20/day',  # POST/PUT/PATCH/DELETE
+        'vote': '20/day',   # like/dislike
         # 'anon': '10/min'   # Example: Define 'anon' scope if using AnonRateThrottle too
     }
     
 }
 
+# Throttle counters (see blog/throttling.py)
+# Algorithm: 'gcra' (smooth, one timestamp per client) or 'fixed' (fixed-window counters).
+BLOG_THROTTLE_ALGORITHM = "gcra"
+# Store shared by every worker: a SQLite file here; 'blog.throttling.RedisThrottleStore'
+# (options: url, client_class) for Redis, 'blog.throttling.MemoryThrottleStore' for one process.
+BLOG_THROTTLE_STORE = "blog.throttling.SQLiteThrottleStore"
+BLOG_THROTTLE_STORE_OPTIONS = {"path": BASE_DIR / "throttle.sqlite3"}
+
+
+# Blog like/dislike counters (see blog/counters.py)
+# 'blog.counters.AtomicVoteCounter' updates Post.likes/dislikes in place with one atomic UPDATE.
+# 'blog.counters.ShardedVoteCounter' spreads votes over PostVoteShard rows; run
+# `python manage.py fold_votes` (e.g. with --interval) to fold them into Post in batches.
+# 'blog.counters.BufferedVoteCounter' appends votes to a buffer file and acknowledges them
+# without writing to the database; Post catches up within BLOG_VOTE_BUFFER_MAX_DELAY seconds,
+# flushed by a thread in each process (BLOG_VOTE_BUFFER_FLUSH_THREAD) and/or `fold_votes --interval`.
+BLOG_VOTE_COUNTER = "blog.counters.AtomicVoteCounter"
+BLOG_VOTE_COUNTER_SHARDS = 8
+BLOG_VOTE_BUFFER_PATH = BASE_DIR / "votes.sqlite3"
+BLOG_VOTE_BUFFER_MAX_DELAY = 5 # seconds
+BLOG_VOTE_BUFFER_FLUSH_THREAD = True
+
+# Change feed (see blog/changes.py): only changes at least this old are served, so none can
+# commit behind a consumer's cursor; votes within the window share one change per post
+BLOG_CHANGE_FEED_SETTLE_SECONDS = 5
+
+# Live vote counts and comments over ASGI: GET /api/live/?posts=1,2 (see blog/live.py)
+# Broker carrying events to the streams: 'blog.live.LocalBroker' within one process (costs
+# nothing while no stream is open), or 'blog.live.SQLiteBroker' with
+# {"path": BASE_DIR / "live.sqlite3"} to share events between the ASGI workers on this host
+# (`manage.py check --deploy` warns while it's LocalBroker). None turns live updates off.
+BLOG_LIVE_BROKER = "blog.live.LocalBroker"
+BLOG_LIVE_BROKER_OPTIONS = {}
+# Vote bursts are coalesced into at most one count update per post this often
+BLOG_LIVE_VOTE_INTERVAL = 1 # seconds
+# Open streams allowed per client address, and per process
+BLOG_LIVE_MAX_CLIENT_STREAMS = 10
+BLOG_LIVE_MAX_STREAMS = 10000
+# Idle streams get a keepalive this often
+BLOG_LIVE_HEARTBEAT = 15 # seconds
+# Clients this many events behind are disconnected (they reconnect)
+BLOG_LIVE_MAX_PENDING = 100
+
+# Trending ranking of GET /api/posts/trending/ (see blog/trending.py)
+# A comment counts as much as this many net likes; a post this many seconds older needs ten
+# times the engagement to rank level. Run `python manage.py recompute_trending` after changing them.
+BLOG_TRENDING_COMMENT_WEIGHT = 2
+BLOG_TRENDING_TIME_SCALE = 45000 # seconds
+
+# Blog full-text search used by ?search= on /api/posts/ (see blog/search.py)
+# 'blog.search.SQLiteFTS5SearchBackend' (SQLite), 'blog.search.PostgresSearchBackend' (PostgreSQL)
+# or 'blog.search.IcontainsSearchBackend' for DRF's unindexed LIKE filtering.
+BLOG_SEARCH_BACKEND = "blog.search.SQLiteFTS5SearchBackend"
+
+
+# Blog request metrics (see blog/metrics.py): Server-Timing headers and GET /api/metrics/
+BLOG_METRICS = False
+# Besides staff users, the client addresses allowed to read /api/metrics/ (e.g. the scraper's)
+BLOG_METRICS_ALLOWED_IPS = []
+# Profile a sample of requests and keep the profiles of those slower than the threshold
+# (milliseconds; None disables profiling), listed at GET /api/metrics/profiles/
+BLOG_METRICS_PROFILE_THRESHOLD = None
+BLOG_METRICS_PROFILE_SAMPLE_RATE = 0.01
+BLOG_METRICS_PROFILE_KEEP = 20
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    # Per-process memory
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # On-disk cache shared by every worker on the host
+    "files": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+    },
+}
+
+# Blog response cache for list/detail endpoints (see blog/cache.py)
+# Name of a CACHES alias shared by every worker, or None to disable. "default" (per-process
+# memory) only suits a single process: other workers would miss its invalidations.
+BLOG_RESPONSE_CACHE = "files"
+BLOG_RESPONSE_CACHE_TIMEOUT = 300 # seconds
+# Votes refresh cached post lists at most this often (their detail right away)
+BLOG_VOTE_LIST_INTERVAL = 10 # seconds
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators